@@ -0,0 +1,121 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Time packaging a blueprint folder for upload.
+
+Compares, on a generated blueprint folder (or the one given):
+  - the single-threaded tarfile "w:gz" archive of the whole folder,
+  - scanning the folder (what the upload size validation does),
+  - tar_blueprint, with its threaded gzip,
+  - tar_blueprint with a warm archive cache.
+
+    python benchmarks/blueprint_archive.py [--files N] [--size MB] [PATH]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from cloudify_rest_client import utils  # noqa: E402
+
+
+def _generate(directory, files, total_size):
+    """A blueprint folder with `files` files, compressible like text"""
+    os.makedirs(os.path.join(directory, 'resources'))
+    with open(os.path.join(directory, 'blueprint.yaml'), 'w') as f:
+        f.write('tosca_definitions_version: cloudify_dsl_1_3\n')
+    words = [os.urandom(4).hex() if hasattr(bytes, 'hex')
+             else os.urandom(4).encode('hex') for _ in range(2000)]
+    file_size = total_size // files
+    for i in range(files):
+        path = os.path.join(directory, 'resources', 'dir_{0}'.format(i % 20),
+                            'file_{0}.txt'.format(i))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            written = 0
+            index = i
+            while written < file_size:
+                word = words[index % len(words)]
+                f.write(word + ' ')
+                written += len(word) + 1
+                index = index * 31 + 7
+    return os.path.join(directory, 'blueprint.yaml')
+
+
+def _timed(func):
+    start = time.time()
+    result = func()
+    return time.time() - start, result
+
+
+def _tarfile_gz(blueprint_path, dest_dir):
+    directory = os.path.dirname(blueprint_path)
+    path = os.path.join(dest_dir, 'plain.tar.gz')
+    with tarfile.open(path, 'w:gz', dereference=True) as tar:
+        tar.add(directory, arcname='blueprint')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', nargs='?',
+                        help='main blueprint yaml of an existing blueprint')
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=100,
+                        help='total size of the generated files, in MB')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        blueprint_path = args.path or _generate(
+            os.path.join(workdir, 'blueprint'), args.files,
+            args.size * 1024 * 1024)
+        cache_dir = os.path.join(workdir, 'cache')
+        results = []
+
+        dest = tempfile.mkdtemp(dir=workdir)
+        seconds, path = _timed(lambda: _tarfile_gz(blueprint_path, dest))
+        results.append(('tarfile w:gz', seconds, os.path.getsize(path)))
+
+        seconds, folder = _timed(lambda: utils.scan_folder(
+            os.path.dirname(blueprint_path)))
+        results.append(('scan_folder', seconds, None))
+
+        for name in ['tar_blueprint', 'tar_blueprint (cache miss)',
+                     'tar_blueprint (cache hit)']:
+            dest = tempfile.mkdtemp(dir=workdir)
+            seconds, path = _timed(lambda: utils.tar_blueprint(
+                blueprint_path, dest,
+                cache_dir=cache_dir if 'cache' in name else ''))
+            results.append((name, seconds, os.path.getsize(path)))
+
+        print('{0:<28} {1:>10} {2:>12}'.format('', 'seconds', 'bytes'))
+        for name, seconds, size in results:
+            print('{0:<28} {1:>10.3f} {2:>12}'.format(
+                name, seconds, '' if size is None else size))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
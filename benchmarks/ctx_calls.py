@@ -0,0 +1,111 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure the ctx calls per second of a python script using the ctx-py
+wrapper: running `ctx` for each call, and sending the requests from the
+script's process.
+
+The proxy is served like script_runner does, from a mock context; `ctx`
+is run as `python -m cloudify.proxy.client`, with this checkout.
+
+    python benchmarks/ctx_calls.py [-n CALLS] [--proxy unix|tcp|http]
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cloudify.mocks import MockCloudifyContext  # noqa: E402
+from cloudify.proxy.server import (UnixCtxProxy,  # noqa: E402
+                                   TCPCtxProxy,
+                                   HTTPCtxProxy)
+
+PROXIES = {
+    'unix': UnixCtxProxy,
+    'tcp': TCPCtxProxy,
+    'http': HTTPCtxProxy,
+}
+
+
+def _serve(proxy, stop):
+    # like script_runner's loop, serving the requests as they arrive
+    while not stop.is_set():
+        proxy.poll_and_process(timeout=0.1)
+
+
+def _install(tempdir):
+    """Import the ctx-py wrapper, with a `ctx` executable on the PATH"""
+    shutil.copy(os.path.join(ROOT, 'cloudify', 'ctx_wrappers', 'ctx-py.py'),
+                os.path.join(tempdir, 'ctxwrapper.py'))
+    ctx_path = os.path.join(tempdir, 'ctx')
+    with open(ctx_path, 'w') as f:
+        f.write('#!/bin/sh\nexec "{0}" -m cloudify.proxy.client "$@"\n'
+                .format(sys.executable))
+    os.chmod(ctx_path, os.stat(ctx_path).st_mode | stat.S_IEXEC)
+    os.environ['PATH'] = tempdir + os.pathsep + os.environ['PATH']
+    os.environ['PYTHONPATH'] = ROOT
+    sys.path.insert(0, tempdir)
+    import ctxwrapper
+    return ctxwrapper
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--calls', type=int, default=100)
+    parser.add_argument('--proxy', choices=sorted(PROXIES), default='unix')
+    args = parser.parse_args()
+
+    ctx = MockCloudifyContext(node_id='node_1', properties={
+        'port': 8080, 'config': {'users': ['a', 'b']}})
+    proxy = PROXIES[args.proxy](ctx)
+    stop = threading.Event()
+    thread = None
+    if args.proxy != 'http':
+        thread = threading.Thread(target=_serve, args=(proxy, stop))
+        thread.daemon = True
+        thread.start()
+    os.environ['CTX_SOCKET_URL'] = proxy.socket_url
+    tempdir = tempfile.mkdtemp()
+    try:
+        ctxwrapper = _install(tempdir)
+        print('{0:<12} {1:>8} {2:>10} {3:>14}'.format(
+            'client', 'calls', 'seconds', 'calls per sec'))
+        for name, in_process in [('subprocess', False),
+                                 ('in-process', True)]:
+            ctxwrapper.IN_PROCESS = in_process
+            start = time.time()
+            for _ in range(args.calls):
+                ctxwrapper.ctx.node.properties['port']
+            seconds = time.time() - start
+            print('{0:<12} {1:>8} {2:>10.3f} {3:>14.1f}'.format(
+                name, args.calls, seconds, args.calls / seconds))
+    finally:
+        stop.set()
+        if thread is not None:
+            thread.join()
+        proxy.close()
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure the effect of hedging GETs on the cluster client's latency.
+
+Starts fake managers on 127.0.0.1, 127.0.0.2, ..., that answer in a few
+milliseconds, except for a fraction of the requests, which stall (like
+a manager that's busy, eg. in a GC pause or behind a slow DB query).
+Then sends the same GETs with and without hedging, and prints the
+response time percentiles.
+
+    python benchmarks/hedged_requests.py [-n REQUESTS] [--stall-rate 0.02]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from cloudify import cluster  # noqa: E402
+from cloudify.tests.mocks.fake_manager import FakeManager  # noqa: E402
+
+
+def _start_managers(count, stall_rate, stall, latency):
+    rng = random.Random(0)
+
+    def _respond(request):
+        time.sleep(stall if rng.random() < stall_rate else latency)
+        return 200, {'id': 'bp1'}
+
+    managers = []
+    port = 0
+    for index in range(count):
+        manager = FakeManager('127.0.0.{0}'.format(index + 1), port)
+        port = manager.port
+        manager.route('GET', '/blueprints/bp1', _respond)
+        manager.start()
+        managers.append(manager)
+    return managers
+
+
+def _percentile(values, percentile):
+    values = sorted(values)
+    return values[int(round((len(values) - 1) * percentile / 100.0))]
+
+
+def _run(managers, requests_count, hedging):
+    cluster.reset_hosts_health()
+    client = cluster.CloudifyClusterClient(
+        host=[m.host for m in managers], port=managers[0].port,
+        hedging=hedging)
+    times = []
+    for _ in range(requests_count):
+        started = time.time()
+        client.blueprints.get('bp1')
+        times.append(time.time() - started)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--requests', type=int, default=500)
+    parser.add_argument('--managers', type=int, default=3)
+    parser.add_argument('--stall-rate', type=float, default=0.02,
+                        help='fraction of the requests that stall; hedging '
+                             'only helps with stalls rarer than the p95')
+    parser.add_argument('--stall', type=float, default=0.5,
+                        help='seconds a stalled request takes')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds a normal request takes')
+    args = parser.parse_args()
+
+    managers = _start_managers(
+        args.managers, args.stall_rate, args.stall, args.latency)
+    try:
+        print('{0:<24} {1:>8} {2:>8} {3:>8} {4:>8} {5:>12}'.format(
+            '', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'hedges/won'))
+        for name, hedging in [('no hedging', None),
+                              ('hedging (p95, 10%)', cluster.Hedging())]:
+            times = _run(managers, args.requests, hedging)
+            print('{0:<24} {1:>8.1f} {2:>8.1f} {3:>8.1f} {4:>8.1f} '
+                  '{5:>12}'.format(
+                      name,
+                      _percentile(times, 50) * 1000,
+                      _percentile(times, 90) * 1000,
+                      _percentile(times, 99) * 1000,
+                      max(times) * 1000,
+                      '{0}/{1}'.format(hedging.sent, hedging.won)
+                      if hedging else '-'))
+    finally:
+        for manager in managers:
+            manager.stop()
+
+
+if __name__ == '__main__':
+    main()
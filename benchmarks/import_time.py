@@ -0,0 +1,86 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure the import time of the modules loaded on every task/ctx call.
+
+Uses `python -X importtime` (python 3.7+), and reports the total
+cumulative import time of each module, and the slowest dependencies.
+
+    python benchmarks/import_time.py [-n RUNS] [--top N] [module ...]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    'cloudify.proxy.client',
+    'cloudify.context',
+    'cloudify.dispatch',
+]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_importtime(output):
+    """Parse -X importtime output into a {module: cumulative usec} dict"""
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+        except ValueError:
+            # the header line
+            continue
+    return times
+
+
+def measure(module):
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import {0}'.format(module)],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError('Importing {0} failed: {1}'.format(module, err))
+    return _parse_importtime(err.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    args = parser.parse_args()
+    if sys.version_info < (3, 7):
+        parser.error('-X importtime requires python 3.7 or newer')
+
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda times: times[module])
+        print('{0}: {1:.1f} ms (best of {2}), {3} modules'.format(
+            module, best[module] / 1000.0, args.runs, len(best)))
+        slowest = sorted(
+            ((t, name) for name, t in best.items()
+             if name != module and '.' not in name),
+            reverse=True)[:args.top]
+        for usec, name in slowest:
+            print('    {0:>8.1f} ms  {1}'.format(usec / 1000.0, name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Compare the JSON codecs on payloads like the ones the manager sends.
+
+Runs each of the available codecs (see cloudify_rest_client.codec) over:
+  - a page of 1000 node instances, as returned by the REST service,
+  - a deployment plan with 200 nodes,
+  - an operation task message, as sent over AMQP.
+
+    python benchmarks/json_codec.py [-n RUNS]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from cloudify_rest_client import codec  # noqa: E402
+
+
+def _node_instances(count):
+    return {
+        'items': [{
+            'id': 'vm_{0:06x}'.format(i),
+            'node_id': 'vm',
+            'deployment_id': 'd1',
+            'host_id': 'vm_{0:06x}'.format(i),
+            'state': 'started',
+            'version': 3,
+            'runtime_properties': {
+                'ip': '10.0.{0}.{1}'.format(i // 250, i % 250),
+                'resource_id': 'i-{0:016x}'.format(i),
+                'tags': ['web', 'prod'],
+            },
+            'relationships': [{
+                'target_id': 'network_{0:06x}'.format(i % 10),
+                'target_name': 'network',
+                'type': 'cloudify.relationships.connected_to',
+            }],
+            'scaling_groups': [],
+            'visibility': 'tenant',
+            'created_by': 'admin',
+            'tenant_name': 'default_tenant',
+        } for i in range(count)],
+        'metadata': {'pagination': {
+            'offset': 0, 'size': count, 'total': count}},
+    }
+
+
+def _operation(name):
+    return {
+        'implementation': 'cloudify_plugin.tasks.{0}'.format(name),
+        'inputs': {'timeout': 30, 'retries': [1, 2, 5]},
+        'executor': 'central_deployment_agent',
+        'max_retries': -1,
+        'retry_interval': 30,
+        'timeout': None,
+        'plugin': 'cloudify-plugin',
+    }
+
+
+def _plan(node_count):
+    operations = dict(
+        ('cloudify.interfaces.lifecycle.{0}'.format(op), _operation(op))
+        for op in ['create', 'configure', 'start', 'stop', 'delete'])
+    return {
+        'nodes': [{
+            'id': 'node_{0}'.format(i),
+            'type': 'cloudify.nodes.Compute',
+            'type_hierarchy': ['cloudify.nodes.Root',
+                               'cloudify.nodes.Compute'],
+            'properties': {
+                'ip': '',
+                'agent_config': {'install_method': 'none'},
+                'description': 'x' * 200,
+            },
+            'operations': operations,
+            'relationships': [{
+                'target_id': 'node_{0}'.format(i - 1),
+                'type': 'cloudify.relationships.depends_on',
+                'source_operations': operations,
+            }] if i else [],
+            'plugins': [{'name': 'cloudify-plugin', 'package_version': '1.0'}],
+        } for i in range(node_count)],
+        'inputs': dict(('input_{0}'.format(i), {'default': i})
+                       for i in range(50)),
+        'outputs': {},
+        'workflows': {'install': {'operation': 'cloudify.plugins.install'}},
+    }
+
+
+def _task():
+    return {
+        'id': '2b6a2d05-0a54-43c5-9a4e-a8b1f3d1f7a4',
+        'cloudify_task': {
+            'kwargs': {
+                'resource_id': 'i-0123456789abcdef',
+                '__cloudify_context': {
+                    'task_name': 'cloudify_plugin.tasks.create',
+                    'deployment_id': 'd1',
+                    'node_id': 'vm',
+                    'node_name': 'vm',
+                    'execution_id': 'e1',
+                    'workflow_id': 'install',
+                    'tenant': {'name': 'default_tenant'},
+                    'rest_token': 'x' * 64,
+                    'execution_token': 'y' * 64,
+                    'plugin': {'name': 'cloudify-plugin',
+                               'package_version': '1.0'},
+                },
+            },
+        },
+    }
+
+
+PAYLOADS = [
+    ('node instances page', _node_instances(1000)),
+    ('deployment plan', _plan(200)),
+    ('task message', _task()),
+]
+
+
+def available_codecs():
+    codecs = [codec.JSONCodec()]
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        codecs.append(codec.OrjsonCodec(orjson))
+    return codecs
+
+
+def _best_time(func, runs):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange() if hasattr(timer, 'autorange') else (10, 0)
+    return min(timer.repeat(repeat=runs, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = available_codecs()
+    print('{0:<22} {1:>9} {2:>9} {3:>12} {4:>12}'.format(
+        'payload', 'codec', 'bytes', 'dumps (ms)', 'loads (ms)'))
+    for payload_name, payload in PAYLOADS:
+        for json_codec in codecs:
+            encoded = json_codec.dumps(payload).encode('utf-8')
+            dumps_time = _best_time(
+                lambda: json_codec.dumps(payload), args.runs)
+            loads_time = _best_time(
+                lambda: json_codec.loads(encoded), args.runs)
+            print('{0:<22} {1:>9} {2:>9} {3:>12.3f} {4:>12.3f}'.format(
+                payload_name, json_codec.name, len(encoded),
+                dumps_time * 1000, loads_time * 1000))
+    if len(codecs) == 1:
+        print('(install orjson to compare it with the stdlib json)')
+
+
+if __name__ == '__main__':
+    main()
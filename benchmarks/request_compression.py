@@ -0,0 +1,170 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Time sending large REST payloads over a slow link, with and without
+request compression.
+
+The requests go through a local proxy that forwards the client's bytes
+at the given bandwidth, to a fake manager. The payloads are a tasks
+graph with many operations, and a batch of node instances.
+
+    python benchmarks/request_compression.py [--bandwidth MBIT] [-n OPS]
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from cloudify_rest_client import CloudifyClient  # noqa: E402
+from cloudify.tests.mocks.fake_manager import FakeManager  # noqa: E402
+
+
+def _forward(source, destination, bytes_per_second):
+    chunk_size = 16 * 1024
+    try:
+        while True:
+            data = source.recv(chunk_size)
+            if not data:
+                break
+            if bytes_per_second:
+                time.sleep(float(len(data)) / bytes_per_second)
+            destination.sendall(data)
+    except socket.error:
+        pass
+    finally:
+        destination.close()
+
+
+class ThrottlingProxy(object):
+    """Forwards connections to address, limiting the upload bandwidth"""
+
+    def __init__(self, address, bytes_per_second):
+        self.address = address
+        self.bytes_per_second = bytes_per_second
+        self._socket = socket.socket()
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+
+    def _serve(self):
+        while True:
+            client, _ = self._socket.accept()
+            upstream = socket.create_connection(self.address)
+            for args in [(client, upstream, self.bytes_per_second),
+                         (upstream, client, None)]:
+                thread = threading.Thread(target=_forward, args=args)
+                thread.daemon = True
+                thread.start()
+
+    def start(self):
+        thread = threading.Thread(target=self._serve)
+        thread.daemon = True
+        thread.start()
+
+
+def _operations(count):
+    return [{
+        'id': 'op-{0}'.format(i),
+        'name': 'cloudify.interfaces.lifecycle.create',
+        'type': 'RemoteWorkflowTask',
+        'dependencies': ['op-{0}'.format(i - 1)] if i else [],
+        'parameters': {
+            'current_retries': 0,
+            'send_task_events': True,
+            'info': 'node_{0}_abc123'.format(i % 50),
+            'task_kwargs': {
+                'kwargs': {'__cloudify_context': {
+                    'deployment_id': 'dep1',
+                    'node_id': 'node_{0}'.format(i % 50),
+                    'node_name': 'node_{0}'.format(i % 50),
+                    'operation': {
+                        'name': 'cloudify.interfaces.lifecycle.create',
+                        'retry_number': 0,
+                        'max_retries': 60,
+                    },
+                    'plugin': {'name': 'script', 'package_name': None},
+                    'task_name': 'script_runner.tasks.run',
+                    'task_queue': 'dep1',
+                }},
+            },
+        },
+    } for i in range(count)]
+
+
+def _node_instances(count):
+    return [{
+        'id': 'node_{0}_{1:06x}'.format(i % 50, i),
+        'node_id': 'node_{0}'.format(i % 50),
+        'state': 'uninitialized',
+        'runtime_properties': {},
+        'relationships': [{
+            'target_id': 'node_{0}_{1:06x}'.format((i + 1) % 50, i + 1),
+            'target_name': 'node_{0}'.format((i + 1) % 50),
+            'type': 'cloudify.relationships.depends_on',
+        }],
+        'scaling_groups': [],
+        'version': 1,
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bandwidth', type=float, default=10,
+                        help='upload bandwidth, in Mbit/s')
+    parser.add_argument('-n', '--operations', type=int, default=5000)
+    args = parser.parse_args()
+
+    manager = FakeManager()
+    manager.route('POST', '/tasks_graphs/tasks_graphs', lambda request: (
+        201, {'id': 'tg1', 'execution_id': 'e1', 'name': 'install',
+              'operations': len(request.json()['operations'])}))
+    manager.route('POST', '/node-instances', lambda request: (
+        201, {'created': len(request.json()['node_instances'])}))
+    manager.start()
+    proxy = ThrottlingProxy((manager.host, manager.port),
+                            args.bandwidth * 1000 * 1000 / 8)
+    proxy.start()
+    operations = _operations(args.operations)
+    node_instances = _node_instances(args.operations)
+    try:
+        print('{0:<16} {1:<14} {2:>10} {3:>12}'.format(
+            'payload', 'compression', 'seconds', 'bytes sent'))
+        for compress in [None, True]:
+            client = CloudifyClient(host='127.0.0.1', port=proxy.port,
+                                    compress_requests=compress)
+            for name, send in [
+                ('tasks graph', lambda: client.tasks_graphs.create(
+                    'e1', 'install', operations=operations)),
+                ('node instances', lambda: client.node_instances.create_many(
+                    'dep1', node_instances)),
+            ]:
+                start = time.time()
+                send()
+                seconds = time.time() - start
+                print('{0:<16} {1:<14} {2:>10.3f} {3:>12}'.format(
+                    name, 'gzip' if compress else 'none', seconds,
+                    len(manager.requests[-1].body)))
+    finally:
+        manager.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Time rendering the same config template repeatedly, like
+ctx.get_resource_and_render does for each node instance: compiling the
+template on every render, and using the compiled template cache.
+
+    python benchmarks/template_render.py [-n RENDERS] [--sections 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import jinja2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from cloudify import endpoint  # noqa: E402
+
+SECTION = u'''
+[server_{i}]
+listen = {{{{ ctx.node.properties.host }}}}:{{{{ port + {i} }}}}
+{{% for name, value in settings.items() | sort %}}
+{{{{ name }}}} = {{{{ value | default('none') }}}}
+{{% endfor %}}
+{{% if ctx.node.properties.tls %}}
+ssl_certificate = /etc/ssl/{{{{ ctx.instance.id }}}}_{i}.crt
+{{% endif %}}
+'''
+
+
+class _Context(object):
+    class node(object):
+        properties = {'host': '10.0.0.1', 'tls': True}
+
+    class instance(object):
+        id = 'server_abc123'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--renders', type=int, default=100)
+    parser.add_argument('--sections', type=int, default=50,
+                        help='size of the template')
+    args = parser.parse_args()
+
+    resource = u''.join(
+        SECTION.format(i=i) for i in range(args.sections)).encode('utf-8')
+    variables = {
+        'ctx': _Context(),
+        'port': 8000,
+        'settings': dict(('option_{0}'.format(i), i) for i in range(10)),
+    }
+
+    def _uncached():
+        jinja2.Template(resource.decode('utf-8')).render(variables)
+
+    def _cached():
+        endpoint.get_template(resource).render(variables)
+
+    print('{0:<10} {1:>10} {2:>14}'.format(
+        'template', 'seconds', 'ms per render'))
+    for name, render in [('uncached', _uncached), ('cached', _cached)]:
+        start = time.time()
+        for _ in range(args.renders):
+            render()
+        seconds = time.time() - start
+        print('{0:<10} {1:>10.3f} {2:>14.3f}'.format(
+            name, seconds, seconds * 1000 / args.renders))
+
+
+if __name__ == '__main__':
+    main()
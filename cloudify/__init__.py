@@ -15,7 +15,6 @@
 
 import json
 import os
-import ssl
 
 from cloudify.constants import BROKER_PORT_SSL, BROKER_PORT_NO_SSL
 
@@ -72,6 +71,7 @@ class _BrokerConfig(object):
     @property
     def broker_ssl_options(self):
         if self.broker_ssl_enabled:
+            import ssl
             return {
                 'ca_certs': self.broker_cert_path,
                 'cert_reqs': ssl.CERT_REQUIRED,
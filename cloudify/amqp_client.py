@@ -15,7 +15,6 @@
 
 from collections import deque
 import copy
-import json
 import logging
 import os
 import random
@@ -28,6 +27,8 @@ import uuid
 import pika
 import pika.exceptions
 
+from cloudify_rest_client import codec
+
 from cloudify import exceptions
 from cloudify import broker_config
 from cloudify._compat import queue
@@ -402,7 +403,7 @@ class TaskConsumer(object):
 
     def process(self, channel, method, properties, body):
         try:
-            full_task = json.loads(body.decode('utf-8'))
+            full_task = codec.loads(body)
         except ValueError:
             logger.error('Error parsing task: {0}'.format(body))
             return
@@ -431,9 +432,9 @@ class TaskConsumer(object):
                 self.delete_queue(properties.reply_to)
             else:
                 if result is STOP_AGENT:
-                    body = json.dumps({'ok': True})
+                    body = codec.dumps({'ok': True})
                 else:
-                    body = json.dumps(result)
+                    body = codec.dumps(result)
                 self._connection.publish({
                     'exchange': self.exchange,
                     'routing_key': properties.reply_to,
@@ -498,7 +499,7 @@ class SendHandler(object):
     def publish(self, message, **kwargs):
         self._connection.publish({
             'exchange': self.exchange,
-            'body': json.dumps(message),
+            'body': codec.dumps(message),
             'routing_key': self.routing_key
         }, wait=self.wait_for_publish)
 
@@ -548,7 +549,7 @@ class BlockingRequestResponseHandler(TaskConsumer):
             expiration = '{0}'.format(expiration)
         self._connection.publish({
             'exchange': self.exchange,
-            'body': json.dumps(message),
+            'body': codec.dumps(message),
             'properties': pika.BasicProperties(
                 reply_to=self._queue_name(correlation_id),
                 correlation_id=correlation_id,
@@ -557,9 +558,7 @@ class BlockingRequestResponseHandler(TaskConsumer):
         })
 
         try:
-            return json.loads(
-                self._response.get(timeout=timeout).decode('utf-8')
-            )
+            return codec.loads(self._response.get(timeout=timeout))
         except queue.Empty:
             raise RuntimeError('No response received for task {0}'
                                .format(correlation_id))
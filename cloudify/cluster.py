@@ -14,16 +14,185 @@
 #    * limitations under the License.
 
 import re
+import time
 import types
 import random
 import requests
 import itertools
+import threading
+import collections
 
 from cloudify.utils import ipv6_url_compat
 
 from cloudify_rest_client import CloudifyClient
+from cloudify_rest_client._compat import queue
 from cloudify_rest_client.client import HTTPClient
 from cloudify_rest_client.exceptions import CloudifyClientError
+from cloudify_rest_client.hooks import RequestInfo
+
+
+# after this many consecutive failures, a host is not tried for
+# HEALTH_COOLDOWN seconds, unless all the other hosts are failing too
+HEALTH_FAILURE_THRESHOLD = 3
+HEALTH_COOLDOWN = 30
+# weight of the newest response time, in the hosts' average response time
+LATENCY_SMOOTHING = 0.3
+
+
+class HostHealth(object):
+    """A circuit breaker and the average response time, of a manager.
+
+    The circuit is closed while the host is responding. After
+    HEALTH_FAILURE_THRESHOLD consecutive failures it opens, and the host
+    is avoided. Once HEALTH_COOLDOWN seconds passed, the circuit is
+    half-open: a single request is let through, and the circuit closes
+    if it succeeds, or opens again if it fails.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.latency = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Can a request be sent to this host now?
+
+        When the circuit is half-open, this returns True only once, for
+        the probe request.
+        """
+        with self._lock:
+            now = time.time()
+            if self.state == self.OPEN and \
+                    now - self.opened_at >= HEALTH_COOLDOWN:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN:
+                if self._probe_started is not None and \
+                        now - self._probe_started < HEALTH_COOLDOWN:
+                    # the probe is still in progress
+                    return False
+                self._probe_started = now
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self, latency):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_started = None
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency = (LATENCY_SMOOTHING * latency +
+                                (1 - LATENCY_SMOOTHING) * self.latency)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or \
+                    self.failures >= HEALTH_FAILURE_THRESHOLD:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+            self._probe_started = None
+
+
+# health of the hosts by (host, port), shared by all the clients in
+# the process
+_hosts_health = {}
+_hosts_health_lock = threading.Lock()
+
+
+def get_host_health(host, port):
+    with _hosts_health_lock:
+        if (host, port) not in _hosts_health:
+            _hosts_health[host, port] = HostHealth()
+        return _hosts_health[host, port]
+
+
+def reset_hosts_health():
+    with _hosts_health_lock:
+        _hosts_health.clear()
+
+
+def choose_host(hosts, port, tried=()):
+    """The host to send the next request to.
+
+    Hosts not tried yet for this request come first: the ones that
+    responded to their last request, by their average response time
+    (hosts that weren't measured yet count as the fastest), and then the
+    ones that failed. Hosts with an open circuit are skipped, unless
+    there's nothing else to try.
+    """
+    candidates = [h for h in hosts if h not in tried] or hosts
+    healths = dict((h, get_host_health(h, port)) for h in candidates)
+    candidates = sorted(candidates, key=lambda h: (
+        healths[h].failures > 0, healths[h].latency or 0))
+    for host in candidates:
+        if healths[host].available():
+            return host
+    # all of them are failing: try the one that failed the longest ago
+    return min(candidates, key=lambda h: healths[h].opened_at or 0)
+
+
+class Hedging(object):
+    """When to also send a GET to a second manager ("hedged requests").
+
+    If a GET wasn't answered after the `percentile` of the recent response
+    times, the same request is sent to another healthy manager, and the
+    response that arrives first is used.
+
+    :param percentile: percentile of the recent response times to wait
+    :param min_delay: wait at least this many seconds before hedging
+    :param budget: the extra requests are at most this fraction of the
+                   requests (with bursts of up to max_burst requests)
+    :param window: how many recent response times to keep
+    :param min_samples: don't hedge until this many response times are known
+    """
+    def __init__(self, percentile=95, min_delay=0.01, budget=0.1,
+                 max_burst=10, window=100, min_samples=10):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.max_burst = max_burst
+        self.min_samples = min_samples
+        self.sent = 0
+        self.won = 0
+        self._latencies = collections.deque(maxlen=window)
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self):
+        """Seconds to wait before hedging, or None to not hedge at all"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = int(round(
+            (len(latencies) - 1) * self.percentile / 100.0))
+        return max(latencies[index], self.min_delay)
+
+    def request_started(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.budget, self.max_burst)
+
+    def take(self):
+        """Reserve the budget for sending a hedge request"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.sent += 1
+            return True
 
 
 class ClusterHTTPClient(HTTPClient):
@@ -36,45 +205,92 @@ class ClusterHTTPClient(HTTPClient):
         hosts = list(host) if isinstance(host, list) else [host]
         hosts = [ipv6_url_compat(h) for h in hosts]
         random.shuffle(hosts)
-        self.hosts = itertools.cycle(hosts)
+        self.hosts = hosts
+        # the client is shared by threads, each sending its own requests:
+        # the manager a request is sent to, and how many times it was
+        # retried, are kept per thread
+        self._local = threading.local()
+        self._last_host = hosts[0]
         super(ClusterHTTPClient, self).__init__(hosts[0], *args, **kwargs)
         self.default_timeout_sec = self.default_timeout_sec or (5, None)
         self.retries = 30
         self.retry_interval = 3
+        self.hedging = None
+
+    @property
+    def host(self):
+        """The manager this thread is sending its requests to"""
+        return getattr(self._local, 'host', None) or self._last_host
+
+    @host.setter
+    def host(self, host):
+        self._local.host = host
+        self._last_host = host
+
+    @property
+    def _retries(self):
+        return getattr(self._local, 'retries', 0)
+
+    @_retries.setter
+    def _retries(self, retries):
+        self._local.retries = retries
 
     def do_request(self, method, url, *args, **kwargs):
         kwargs.setdefault('timeout', self.default_timeout_sec)
 
+        data = kwargs.get('data')
         copied_data = None
-        if isinstance(kwargs.get('data'), types.GeneratorType):
+        if isinstance(data, types.GeneratorType):
+            # a generator can only be sent once, so this keeps all of its
+            # chunks in memory, for the retries. Use a re-openable body,
+            # eg. bytes_stream_utils.FileBody, to avoid that.
             copied_data = itertools.tee(kwargs.pop('data'), self.retries)
+        hedge = (self.hedging is not None and len(self.hosts) > 1 and
+                 method.__name__ == 'get' and data is None and
+                 not kwargs.get('stream'))
 
         errors = {}
+        tried = set()
         for retry in range(self.retries):
-            manager_to_try = next(self.hosts)
-            self.host = manager_to_try
+            manager_to_try = choose_host(self.hosts, self.port, tried)
+            tried.add(manager_to_try)
             if copied_data is not None:
                 kwargs['data'] = copied_data[retry]
+            elif hasattr(data, 'rewind'):
+                # the previous attempt might have failed mid-upload
+                data.rewind()
 
+            self._retries = retry
             try:
-                return super(ClusterHTTPClient, self).do_request(
-                    method, url, *args, **kwargs)
+                if hedge:
+                    response = self._hedged_request(
+                        manager_to_try, tried, method, url, args, kwargs)
+                else:
+                    self.host = manager_to_try
+                    response = self._send(method, url, *args, **kwargs)
             except (requests.exceptions.ConnectionError) as error:
                 self.logger.debug(
                     'Connection error when trying to connect to '
                     'manager {0}'.format(error)
                 )
                 errors[manager_to_try] = error
+                self._retrying(method.__name__.upper(), url, manager_to_try,
+                               retry, error)
                 continue
             except CloudifyClientError as e:
                 errors[manager_to_try] = e.status_code
-                if e.response.status_code == 502:
+                if e.response.status_code == 502 or (
+                        e.response.status_code == 404 and
+                        self._is_fileserver_download(e.response)):
+                    self._retrying(method.__name__.upper(), url,
+                                   manager_to_try, retry, e)
                     continue
-                if e.response.status_code == 404 and \
-                        self._is_fileserver_download(e.response):
-                    continue
-                else:
-                    raise
+                raise
+            finally:
+                self._retries = 0
+                if len(tried) >= len(self.hosts):
+                    tried = set()
+            return response
 
         raise CloudifyClientError(
             'HTTP Client error: {0} {1} ({2})'.format(
@@ -85,7 +301,112 @@ class ClusterHTTPClient(HTTPClient):
                 )
             ))
 
-    def _is_fileserver_download(self, response):
+    def _retrying(self, method, uri, host, retry, error):
+        """Call the on_retry hooks, if the request will be sent again"""
+        if not self.hooks or retry + 1 >= self.retries:
+            return
+        request_info = RequestInfo(method, uri, host, retries=retry)
+        request_info.status_code = getattr(error, 'status_code', None)
+        request_info.error = error
+        self._call_hooks('on_retry', request_info, error)
+
+    def _send(self, method, url, *args, **kwargs):
+        """Send the request to self.host, recording the host's health"""
+        health = get_host_health(self.host, self.port)
+        started = time.time()
+        try:
+            response = super(ClusterHTTPClient, self).do_request(
+                method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            health.record_failure()
+            raise
+        except CloudifyClientError as e:
+            if e.status_code == 502:
+                health.record_failure()
+            else:
+                health.record_success(time.time() - started)
+            raise
+        latency = time.time() - started
+        health.record_success(latency)
+        if self.hedging is not None:
+            self.hedging.record(latency)
+        return response
+
+    def _hedged_request(self, host, tried, method, url, args, kwargs):
+        """Send the request to host, and after the hedging delay, to
+        another host too. Return the first response.
+        """
+        self.hedging.request_started()
+        delay = self.hedging.delay()
+        if delay is None:
+            # not enough response times known yet
+            self.host = host
+            return self._send(method, url, *args, **kwargs)
+        results = queue.Queue()
+        retries = self._retries
+
+        def _request(host):
+            # .host and ._retries are per thread, so this thread's
+            # request goes to its own host
+            self.host = host
+            self._retries = retries
+            try:
+                response = self._send(method, url, *args, **kwargs)
+            except Exception as e:
+                results.put((host, None, e))
+            else:
+                results.put((host, response, None))
+
+        def _start(host):
+            thread = threading.Thread(target=_request, args=(host, ))
+            thread.daemon = True
+            thread.start()
+
+        _start(host)
+        pending = 1
+        result = None
+        try:
+            result = results.get(timeout=delay)
+        except queue.Empty:
+            other = self._hedge_host(host, tried)
+            if other is not None and self.hedging.take():
+                self.logger.debug(
+                    'No response from %s after %.3fs, also sending '
+                    'the request to %s', host, delay, other)
+                tried.add(other)
+                _start(other)
+                pending += 1
+
+        errors = []
+        while True:
+            sent_to, response, error = result or results.get()
+            result = None
+            pending -= 1
+            if error is None:
+                if sent_to != host:
+                    self.hedging.won += 1
+                self.host = sent_to
+                return response
+            errors.append((sent_to, error))
+            if not pending:
+                # prefer the error of the first host, that the retries
+                # are based on
+                errors.sort(key=lambda e: e[0] != host)
+                raise errors[0][1]
+
+    def _hedge_host(self, host, tried):
+        """A healthy host to send a hedge request to, if there is one"""
+        candidates = [h for h in self.hosts if h != host and h not in tried]
+        if not candidates:
+            return None
+        other = choose_host(candidates, self.port)
+        health = get_host_health(other, self.port)
+        if health.state == HostHealth.OPEN or health.failures:
+            return None
+        return other
+
+    @staticmethod
+    def _is_fileserver_download(response):
         """Is this response a file-download response?
 
         404 responses to requests that download files, need to be retried
@@ -103,4 +424,17 @@ class ClusterHTTPClient(HTTPClient):
 
 
 class CloudifyClusterClient(CloudifyClient):
+    """A CloudifyClient that fails over between the managers of a cluster.
+
+    Takes the same arguments as the CloudifyClient, with `host` being a
+    list of the managers' addresses, and `hedging`: a Hedging to hedge GET
+    requests with, or True for the default Hedging.
+    """
     client_class = ClusterHTTPClient
+
+    def __init__(self, *args, **kwargs):
+        hedging = kwargs.pop('hedging', None)
+        super(CloudifyClusterClient, self).__init__(*args, **kwargs)
+        if hedging is True:
+            hedging = Hedging()
+        self._client.hedging = hedging or None
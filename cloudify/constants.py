@@ -16,6 +16,10 @@
 REST_HOST_KEY = 'REST_HOST'
 REST_PORT_KEY = 'REST_PORT'
 AGENT_WORK_DIR_KEY = 'AGENT_WORK_DIR'
+RESOURCE_CACHE_DIR_KEY = 'CLOUDIFY_RESOURCE_CACHE_DIR'
+RESOURCE_CACHE_SIZE_KEY = 'CLOUDIFY_RESOURCE_CACHE_SIZE'
+RESOURCE_MEMORY_LIMIT_KEY = 'CLOUDIFY_RESOURCE_MEMORY_LIMIT'
+LOCAL_EVALUATION_KEY = 'CLOUDIFY_LOCAL_EVALUATION'
 MANAGER_FILE_SERVER_URL_KEY = 'MANAGER_FILE_SERVER_URL'
 MANAGER_FILE_SERVER_ROOT_KEY = 'MANAGER_FILE_SERVER_ROOT'
 MANAGER_FILE_SERVER_SCHEME = 'MANAGER_FILE_SERVER_SCHEME'
@@ -26,6 +26,10 @@ from cloudify import exceptions
 from cloudify import utils
 from cloudify.constants import DEPLOYMENT, NODE_INSTANCE, RELATIONSHIP_INSTANCE
 
+# how many times update() applies the changes to a newer version of the
+# node instance, when storing them conflicted with a concurrent update
+UPDATE_CONFLICT_RETRIES = 10
+
 
 class ContextCapabilities(object):
     """Maps from instance relationship target ids to their respective
@@ -293,8 +297,12 @@ class NodeContext(EntityContext):
 
     def _get_node_if_needed(self):
         if self._node is None:
-            self._node = self._endpoint.get_node(self.id)
-            props = self._node.get('properties', {})
+            self._set_node(self._endpoint.get_node(self.id))
+
+    def _set_node(self, node):
+        self._node = node
+        props = self._node.get('properties', {})
+        if not isinstance(props, ImmutableProperties):
             self._node['properties'] = ImmutableProperties(props)
 
     @property
@@ -339,7 +347,10 @@ class NodeInstanceContext(EntityContext):
         self._relationships = None
 
     def _get_node_instance(self):
-        self._node_instance = self._endpoint.get_node_instance(self.id)
+        self._set_node_instance(self._endpoint.get_node_instance(self.id))
+
+    def _set_node_instance(self, node_instance):
+        self._node_instance = node_instance
         self._node_instance.runtime_properties.modifiable = \
             self._modifiable
 
@@ -420,9 +431,33 @@ class NodeInstanceContext(EntityContext):
                     break
         else:
             if self._node_instance is not None and self._node_instance.dirty:
-                self._endpoint.update_node_instance(self._node_instance)
+                self._update_merging()
         self._node_instance = None
 
+    def _update_merging(self):
+        """Store the node instance, and if there's a version conflict,
+        apply the local changes to the stored version and try again.
+
+        The changes can only be applied if the stored version doesn't
+        have any of the same runtime properties changed; if it does, the
+        conflict error is raised.
+        """
+        attempts = 0
+        while True:
+            try:
+                self._endpoint.update_node_instance(self._node_instance)
+                return
+            except CloudifyClientError as e:
+                attempts += 1
+                if e.status_code != 409 or \
+                        attempts > UPDATE_CONFLICT_RETRIES:
+                    raise
+                conflict = e
+            latest = self._endpoint.get_node_instance(self.id)
+            if not self._node_instance.rebase(latest):
+                raise conflict
+            self._set_node_instance(latest)
+
     def refresh(self, force=False):
         """Force fetching up-to-date instance data.
 
@@ -687,6 +722,40 @@ class CloudifyContext(CommonContext):
         """
         return self._context['type']
 
+    def _prefetch(self):
+        """Get the nodes and node instances that the operation is likely
+        to use all at once, instead of each one when it is first used.
+
+        Those are the node instance and its node, or in a relationship
+        operation, the source and target instances and their nodes. If
+        getting them fails, they're still gotten when used.
+        """
+        if self.type == NODE_INSTANCE:
+            subjects = [(self._node, self._instance)]
+        elif self.type == RELATIONSHIP_INSTANCE:
+            subjects = [(self._source.node, self._source.instance),
+                        (self._target.node, self._target.instance)]
+        else:
+            return
+        subjects = [(node, instance) for node, instance in subjects
+                    if node.id and instance.id]
+        if not subjects:
+            return
+        try:
+            nodes, node_instances = self._endpoint.prefetch(
+                node_ids=[node.id for node, _ in subjects],
+                node_instance_ids=[instance.id for _, instance in subjects])
+        except Exception as e:
+            # eg. a connection error: the operation might not use them
+            self.logger.debug('Prefetching the node instances failed: %s', e)
+            return
+        for node, instance in subjects:
+            if node._node is None and node.id in nodes:
+                node._set_node(nodes[node.id])
+            if instance._node_instance is None and \
+                    instance.id in node_instances:
+                instance._set_node_instance(node_instances[instance.id])
+
     @property
     def type(self):
         """The type of this context.
@@ -1,17 +1,30 @@
 #!/usr/bin/env python
 
+import os
 import sys
 import json
 import shlex
+import threading
 import subprocess
-from collections import MutableMapping, Mapping
+try:
+    from collections.abc import MutableMapping, Mapping
+except ImportError:
+    from collections import MutableMapping, Mapping
 
 PY2 = sys.version_info[0] == 2
 
 if PY2:
     text_type = unicode  # NOQA
+    from httplib import HTTPConnection
 else:
     text_type = str
+    from http.client import HTTPConnection
+
+# the requests are sent to the proxy at CTX_SOCKET_URL from this process,
+# when it can reach it; set IN_PROCESS to False to run `ctx` instead
+IN_PROCESS = True
+CTX_SOCKET_URL = 'CTX_SOCKET_URL'
+REQUEST_TIMEOUT = 30
 
 
 def check_output(*popenargs, **kwargs):
@@ -42,6 +55,12 @@ def check_output(*popenargs, **kwargs):
     return output
 
 
+def _catch_non_serializable(obj):
+    if '__non_json_serializable_repr__' in obj:
+        return obj['__non_json_serializable_repr__']
+    return obj
+
+
 def unicode_to_string(text):
     if isinstance(text, text_type):
         return text
@@ -55,10 +74,175 @@ def unicode_to_string(text):
     return text
 
 
+class RequestError(subprocess.CalledProcessError):
+    """The proxy failed to process the request.
+
+    It is the CalledProcessError that running `ctx` would raise, so that
+    scripts catching that keep working: returncode, cmd and stderr are
+    set like `ctx` would have set them.
+    """
+    def __init__(self, ex_message, ex_type, ex_traceback, cmd=None):
+        super(RequestError, self).__init__(1, cmd or ['ctx'], '')
+        self.stderr = ex_traceback
+        self.ex_type = ex_type
+        self.ex_message = ex_message
+        self.ex_traceback = ex_traceback
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.ex_type, self.ex_message)
+
+
+class ProxyClient(object):
+    """Sends requests to the ctx proxy, like the `ctx` client does, but
+    from this process, over a connection kept between the requests.
+
+    The zmq socket (ipc:// and tcp:// urls) stays open. The http proxy
+    closes the connection after each response, so with http, the
+    connection is opened again for each request.
+    """
+    def __init__(self, socket_url, timeout=REQUEST_TIMEOUT):
+        self.socket_url = socket_url
+        self.timeout = timeout
+        schema, _, self._address = socket_url.partition('://')
+        self._http = schema == 'http'
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._zmq_context = None
+
+    def request(self, args):
+        """The result of the request for args.
+
+        :raise RequestError: the proxy failed to process the request
+        :raise SystemExit: the request stopped the operation,
+                           eg. abort_operation
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked: the connection belongs to the parent
+                self._connection = self._zmq_context = None
+                self._pid = os.getpid()
+            if self._http:
+                response = self._http_request({'args': args})
+            else:
+                response = self._zmq_request({'args': args})
+        payload = response['payload']
+        response_type = response.get('type')
+        if response_type == 'error':
+            raise RequestError(payload['message'], payload['type'],
+                               payload['traceback'], _ctx_command(args))
+        elif response_type == 'stop_operation':
+            raise SystemExit(payload['message'])
+        return payload
+
+    def _http_request(self, request):
+        if self._connection is None:
+            self._connection = HTTPConnection(
+                self._address, timeout=self.timeout)
+        try:
+            self._connection.request(
+                'POST', '/', json.dumps(request).encode('utf-8'),
+                {'Content-Type': 'application/json'})
+            response = self._connection.getresponse()
+            body = response.read()
+        except Exception:
+            self._connection.close()
+            self._connection = None
+            raise
+        if response.status != 200:
+            raise RuntimeError('Request failed: {0} {1}'.format(
+                response.status, response.reason))
+        return json.loads(body.decode('utf-8'))
+
+    def _zmq_request(self, request):
+        import zmq
+        if self._connection is None:
+            if self._zmq_context is None:
+                self._zmq_context = zmq.Context()
+            self._connection = self._zmq_context.socket(zmq.REQ)
+            self._connection.connect(self.socket_url)
+        self._connection.send_json(request)
+        if self._connection.poll(1000 * self.timeout):
+            return self._connection.recv_json()
+        # a REQ socket can't send another request before it gets the
+        # response, so start over with a new one
+        self._connection.close(linger=0)
+        self._connection = None
+        raise RuntimeError('Timed out while waiting for response')
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    """The ProxyClient for CTX_SOCKET_URL, or None if the requests need
+    to be made by running `ctx`
+    """
+    global _client
+    if not IN_PROCESS:
+        return None
+    with _client_lock:
+        if _client is None:
+            socket_url = os.environ.get(CTX_SOCKET_URL, '')
+            schema = socket_url.partition('://')[0]
+            if schema in ('ipc', 'tcp'):
+                try:
+                    import zmq  # NOQA
+                except ImportError:
+                    # not installed for the python running the script
+                    schema = None
+            _client = ProxyClient(socket_url) \
+                if schema in ('http', 'ipc', 'tcp') else False
+        return _client or None
+
+
+def _ctx_command(args, json_output=False):
+    """The `ctx` command making the request for args"""
+    cmd = ['ctx']
+    if json_output:
+        cmd.append('-j')
+    for arg in args:
+        if not isinstance(arg, text_type) or arg.startswith('@'):
+            arg = '@{0}'.format(json.dumps(arg))
+        cmd.append(arg)
+    return cmd
+
+
+def _ctx(args, json_output=False, suppress_err_output=False):
+    """Make the ctx request for args, and return its result.
+
+    :param json_output: return the result; otherwise, return what
+                        `ctx` would print, like `ctx` without -j
+    """
+    client = _get_client()
+    if client is None:
+        output = check_output(_ctx_command(args, json_output),
+                              suppress_err_output=suppress_err_output)
+        return json.loads(output) if json_output else output
+    result = client.request(args)
+    if json_output:
+        return result
+    return text_type(result) if result else ''
+
+
+def _get_property(args, property_name):
+    """Like _ctx, but raise KeyError if the property doesn't exist"""
+    try:
+        # suppressing key error output that is displayed even if
+        # the error is not raised
+        result = _ctx(args, json_output=True, suppress_err_output=True)
+    except subprocess.CalledProcessError as e:
+        # also a RequestError, when the request was sent in-process
+        if 'illegal path:' in e.stderr:
+            raise KeyError(property_name)
+        raise
+    return unicode_to_string(result)
+
+
 class CtxLogger(object):
     def _logger(self, message, level):
-        cmd = ['ctx', 'logger', level, message]
-        return check_output(cmd)
+        return _ctx(['logger', level, message])
 
     def debug(self, message):
         return self._logger(level='debug', message=message)
@@ -82,23 +266,13 @@ class CtxNodeProperties(Mapping):
         self.relationship = relationship
 
     def __getitem__(self, property_name):
-        cmd = ['ctx', '-j', 'node', 'properties', property_name]
+        args = ['node', 'properties', property_name]
         if self.relationship:
-            cmd.insert(2, self.relationship)
-        try:
-            # suppressing key error output that is displayed even if
-            # the error is not raised
-            result = json.loads(check_output(cmd, suppress_err_output=True))
-        except subprocess.CalledProcessError as ex:
-            if 'illegal path:' in ex.stderr:
-                raise KeyError(property_name)
-            else:
-                raise
-        return unicode_to_string(result)
+            args.insert(0, self.relationship)
+        return _get_property(args, property_name)
 
     def get_all(self):
-        cmd = ['ctx', '-j', 'node', 'properties']
-        result = json.loads(check_output(cmd))
+        result = _ctx(['node', 'properties'], json_output=True)
         return unicode_to_string(result)
 
     def __len__(self):
@@ -116,8 +290,7 @@ class CtxNode(object):
         self.relationship = relationship
 
     def _node(self, prop):
-        cmd = ['ctx', '-j', 'node', prop]
-        result = json.loads(check_output(cmd))
+        result = _ctx(['node', prop], json_output=True)
         return unicode_to_string(result)
 
     @property
@@ -142,31 +315,22 @@ class CtxInstanceRuntimeProperties(MutableMapping):
         self.relationship = relationship
 
     def __getitem__(self, property_name):
-        cmd = ['ctx', '-j', 'instance', 'runtime_properties', property_name]
+        args = ['instance', 'runtime_properties', property_name]
         if self.relationship:
-            cmd.insert(2, self.relationship)
-        try:
-            result = json.loads(check_output(cmd, suppress_err_output=True))
-        except subprocess.CalledProcessError as e:
-            if 'illegal path:' in e.stderr:
-                raise KeyError(property_name)
-            else:
-                raise
-        return unicode_to_string(result)
+            args.insert(0, self.relationship)
+        return _get_property(args, property_name)
 
     def __setitem__(self, property_name, value):
-        cmd = ['ctx', 'instance', 'runtime_properties', property_name,
-               '@{0}'.format(json.dumps(value))]
+        args = ['instance', 'runtime_properties', property_name, value]
         if self.relationship:
-            cmd.insert(1, self.relationship)
-        return check_output(cmd)
+            args.insert(0, self.relationship)
+        return _ctx(args)
 
     def __delitem__(self, property_name):
         self[property_name] = None
 
     def get_all(self):
-        cmd = ['ctx', '-j', 'instance', 'runtime_properties']
-        result = json.loads(check_output(cmd))
+        result = _ctx(['instance', 'runtime_properties'], json_output=True)
         return unicode_to_string(result)
 
     def __len__(self):
@@ -184,10 +348,10 @@ class CtxNodeInstance(object):
         self.relationship = relationship
 
     def _instance(self, prop):
-        cmd = ['ctx', '-j', 'instance', prop]
+        args = ['instance', prop]
         if self.relationship:
-            cmd.insert(2, self.relationship)
-        result = json.loads(check_output(cmd))
+            args.insert(0, self.relationship)
+        result = _ctx(args, json_output=True)
         return unicode_to_string(result)
 
     @property
@@ -229,53 +393,65 @@ class Ctx(object):
         self.source = CtxRelationshipInstance('source')
 
     def __call__(self, command_ref):
-        ctx_command = shlex.split(command_ref)
-        ctx_command.insert(0, 'ctx')
-        return check_output(ctx_command)
+        args = []
+        for arg in shlex.split(command_ref):
+            if arg.startswith('@'):
+                arg = json.loads(arg[1:], object_hook=_catch_non_serializable)
+            args.append(arg)
+        return _ctx(args)
 
     def returns(self, data):
         try:
-            data = json.dumps(data)
+            json.dumps(data)
         except (TypeError, ValueError):
-            data = json.dumps({
-                '__non_json_serializable_repr__': repr(data)
-            })
+            data = repr(data)
         # also pass an empty dict to be used as **kwargs, because if data
         # was a dict, then ctxproxy would attempt to use that as **kwargs
-        cmd = ['ctx', '-j', 'returns', '@' + data, '@{}']
-        return json.loads(check_output(cmd))
+        return _ctx(['returns', data, {}], json_output=True)
 
     def abort_operation(self, message=''):
-        cmd = ['ctx', 'abort_operation']
+        args = ['abort_operation']
         if message:
-            cmd.append(message)
-        subprocess.check_call(cmd)
+            args.append(message)
+        self._stop_operation(args)
 
     def retry_operation(self, message=''):
-        cmd = ['ctx', 'retry_operation']
+        args = ['retry_operation']
         if message:
-            cmd.append(message)
-        subprocess.check_call(cmd)
+            args.append(message)
+        self._stop_operation(args)
+
+    def _stop_operation(self, args):
+        if _get_client() is None:
+            subprocess.check_call(['ctx'] + args)
+            return
+        try:
+            _ctx(args)
+        except SystemExit as e:
+            # like `ctx` does, so that the script exits with an error,
+            # unless it catches the CalledProcessError
+            sys.stderr.write('{0}\n'.format(e))
+            raise subprocess.CalledProcessError(1, ['ctx'] + args)
 
     # TODO: support kwargs for both download_resource and ..render
     def download_resource(self, source, destination=''):
-        cmd = ['ctx', 'download-resource', source]
+        args = ['download-resource', source]
         if destination:
-            cmd.append(destination)
-        return check_output(cmd)
+            args.append(destination)
+        return _ctx(args)
 
     def download_resource_and_render(self, source, destination='',
                                      params=None):
-        cmd = ['ctx', 'download-resource-and-render', source]
+        args = ['download-resource-and-render', source]
         if destination:
-            cmd.append(destination)
+            args.append(destination)
         if params:
             kwargs = {'template_variables': params}
             if not isinstance(params, dict):
                 self.abort_operation('Expecting params to be in the form of '
                                      'dict.')
-            cmd.append('@{0}'.format(json.dumps(kwargs)))
-        return check_output(cmd)
+            args.append(kwargs)
+        return _ctx(args)
 
 
 ctx = Ctx()
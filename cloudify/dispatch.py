@@ -36,12 +36,11 @@ from cloudify.manager import update_execution_status, get_rest_client
 from cloudify.constants import LOGGING_CONFIG_FILE
 from cloudify.error_handling import serialize_known_exception
 
-try:
-    from cloudify.workflows import api
-    from cloudify.workflows import workflow_context
-except ImportError:
-    workflow_context = None
-    api = None
+# the workflow modules are only needed for handling workflows, and they are
+# expensive to import (networkx, pika), so they're imported lazily: see
+# _import_workflow_modules
+workflow_context = None
+api = None
 
 
 DISPATCH_LOGGER_FORMATTER = logging.Formatter(
@@ -135,6 +134,7 @@ class OperationHandler(TaskHandler):
             kwargs = copy.deepcopy(kwargs)
 
         with state.current_ctx.push(ctx, kwargs):
+            ctx._prefetch()
             if self.cloudify_context.get('has_intrinsic_functions'):
                 kwargs = ctx._endpoint.evaluate_functions(payload=kwargs)
 
@@ -160,11 +160,21 @@ class OperationHandler(TaskHandler):
                 ctx.target.instance.update()
 
 
+def _import_workflow_modules():
+    global workflow_context, api
+    if workflow_context is not None and api is not None:
+        return
+    try:
+        from cloudify.workflows import api
+        from cloudify.workflows import workflow_context
+    except ImportError:
+        raise RuntimeError('Dispatcher not installed')
+
+
 class WorkflowHandler(TaskHandler):
 
     def __init__(self, *args, **kwargs):
-        if workflow_context is None or api is None:
-            raise RuntimeError('Dispatcher not installed')
+        _import_workflow_modules()
         super(WorkflowHandler, self).__init__(*args, **kwargs)
         self.execution_parameters = copy.deepcopy(self.kwargs)
 
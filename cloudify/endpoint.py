@@ -14,10 +14,18 @@
 #    * limitations under the License.
 
 import os
+import copy
+import hashlib
+import functools
+import threading
 
-import jinja2
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
 
 from cloudify import constants
+from cloudify import evaluation
 from cloudify import manager
 from cloudify import logs
 from cloudify.logs import CloudifyPluginLoggingHandler
@@ -25,6 +33,41 @@ from cloudify.exceptions import NonRecoverableError
 
 from cloudify_rest_client.manager import RabbitMQBrokerItem, ManagerItem
 from cloudify_rest_client.executions import Execution
+from cloudify_rest_client.utils import map_concurrently
+
+
+TEMPLATE_CACHE_SIZE = 128
+_template_environment = None
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def get_template(resource):
+    """The compiled jinja template of the resource.
+
+    Templates are compiled once per process, by a shared sandboxed
+    environment, and cached by the hash of the resource, so that rendering
+    the same template again (eg. for every node instance) is cheap.
+    The TEMPLATE_CACHE_SIZE most recently used templates are kept.
+
+    :param resource: the template source, as bytes
+    """
+    global _template_environment
+    key = hashlib.sha256(resource).hexdigest()
+    with _templates_lock:
+        template = _templates.pop(key, None)
+        if template is not None:
+            _templates[key] = template
+            return template
+        if _template_environment is None:
+            from jinja2.sandbox import SandboxedEnvironment
+            _template_environment = SandboxedEnvironment()
+    template = _template_environment.from_string(resource.decode('utf-8'))
+    with _templates_lock:
+        _templates[key] = template
+        while len(_templates) > TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return template
 
 
 class Endpoint(object):
@@ -73,7 +116,7 @@ class Endpoint(object):
             with open(resource_path, 'rb') as f:
                 resource = f.read()
 
-        template = jinja2.Template(resource.decode('utf-8'))
+        template = get_template(resource)
         rendered_resource = template.render(template_variables).encode('utf-8')
 
         if download:
@@ -98,6 +141,15 @@ class Endpoint(object):
                           additional_context=None):
         raise NotImplementedError('Implemented by subclasses')
 
+    def prefetch(self, node_ids, node_instance_ids):
+        """Get the nodes and the node instances, if that is faster than
+        getting each one separately.
+
+        :returns: dicts of the nodes, and of the node instances, by id;
+                  the ones missing will be gotten when used
+        """
+        return {}, {}
+
     def get_host_node_instance_ip(self,
                                   host_id,
                                   properties=None,
@@ -173,6 +225,28 @@ class ManagerEndpoint(Endpoint):
                                          evaluate_functions=True,
                                          client=self.rest_client)
 
+    def prefetch(self, node_ids, node_instance_ids):
+        """Get all the nodes in one request, and at the same time, each
+        of the node instances.
+
+        The node instances are still gotten one by one, because only
+        that evaluates the intrinsic functions in their runtime properties.
+        """
+        node_ids = sorted(set(node_ids))
+        requests = [lambda: self.rest_client.nodes.list(
+            deployment_id=self.ctx.deployment.id,
+            id=node_ids,
+            evaluate_functions=True)]
+        for node_instance_id in node_instance_ids:
+            requests.append(functools.partial(
+                self.get_node_instance, node_instance_id))
+        results = map_concurrently(
+            lambda request: request(), requests, len(requests))
+        nodes = dict((node.id, node) for node in results[0])
+        node_instances = dict(
+            (node_instance.id, node_instance) for node_instance in results[1:])
+        return nodes, node_instances
+
     def get_managers(self, network='default'):
         return [m for m in self.rest_client.manager.get_managers()
                 if network in m.networks]
@@ -239,11 +313,23 @@ class ManagerEndpoint(Endpoint):
 
     def evaluate_functions(self, payload):
         def evaluate_functions_method(deployment_id, context, payload):
+            if evaluation.local_evaluation_enabled():
+                try:
+                    return evaluation.evaluate_functions(
+                        self.rest_client, deployment_id, context,
+                        copy.deepcopy(payload), node_ids=self._node_ids())
+                except evaluation.EvaluateOnManager:
+                    pass
             return self.rest_client.evaluate.functions(
                 deployment_id, context, payload)['payload']
         return self._evaluate_functions_impl(payload,
                                              evaluate_functions_method)
 
+    def _node_ids(self):
+        if self.ctx.type == constants.NODE_INSTANCE:
+            return [self.ctx.node.id]
+        return []
+
     def get_workdir(self):
         if not self.ctx.deployment.id:
             raise NonRecoverableError(
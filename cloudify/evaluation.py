@@ -0,0 +1,243 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Evaluate the intrinsic functions of operation inputs on the agent.
+
+Instead of asking the manager to evaluate the functions (a request per
+operation), dsl_parser.functions evaluates them here, over a storage
+that gets what the functions refer to with the REST client. The nodes,
+node instances and secrets the inputs refer to are gotten up front, all
+at the same time, and then shared by all the inputs.
+
+Only the functions in LOCAL_FUNCTIONS are evaluated on the agent; the
+others (eg. get_capability, get_label) need more of the manager's state,
+so inputs using them are still evaluated by the manager.
+"""
+
+import os
+
+from cloudify import constants
+from cloudify_rest_client.utils import map_concurrently
+
+LOCAL_FUNCTIONS = frozenset([
+    'get_input',
+    'get_property',
+    'get_attribute',
+    'get_attributes_list',
+    'get_attributes_dict',
+    'get_secret',
+    'concat',
+    'merge_dicts',
+])
+# functions whose first argument is a node name, or SELF/SOURCE/TARGET
+_NODE_FUNCTIONS = frozenset([
+    'get_property',
+    'get_attribute',
+    'get_attributes_list',
+    'get_attributes_dict',
+])
+_CONTEXT_REFS = ('SELF', 'SOURCE', 'TARGET')
+PREFETCH_WORKERS = 10
+
+
+class EvaluateOnManager(Exception):
+    """The functions can't be evaluated on the agent, and need to be
+    evaluated by the manager instead
+    """
+
+
+def local_evaluation_enabled():
+    return os.environ.get(
+        constants.LOCAL_EVALUATION_KEY, '').lower() == 'true'
+
+
+def _references(payload, context):
+    """The functions used in payload, and the names of the nodes, the
+    ids of the node instances, and the keys of the secrets they refer to.
+
+    The node instances of the context are always included when nodes are
+    referred to, because get_attribute uses them to pick one of a node's
+    instances.
+    """
+    from dsl_parser.functions import is_function
+
+    functions, nodes, node_instances, secrets = set(), set(), set(), set()
+    values = [payload]
+    while values:
+        value = values.pop()
+        if isinstance(value, list):
+            values.extend(value)
+            continue
+        if not isinstance(value, dict):
+            continue
+        values.extend(value.values())
+        if not is_function(value):
+            continue
+        name, args = list(value.items())[0]
+        functions.add(name)
+        if not isinstance(args, list):
+            args = [args]
+        if not args or isinstance(args[0], (dict, list)):
+            # a nested function, evaluated later
+            continue
+        if name in _NODE_FUNCTIONS and args[0] not in _CONTEXT_REFS:
+            nodes.add(args[0])
+        elif name == 'get_secret':
+            secrets.add(args[0])
+    if functions & _NODE_FUNCTIONS:
+        node_instances.update(context[ref.lower()] for ref in _CONTEXT_REFS
+                              if context.get(ref.lower()))
+    return functions, nodes, node_instances, secrets
+
+
+class RestStorage(object):
+    """The storage dsl_parser.functions evaluates functions over, for
+    the deployment, using the REST client.
+
+    Everything gotten is kept, so that each node, node instance or secret
+    is only gotten once.
+    """
+    def __init__(self, client, deployment_id):
+        self._client = client
+        self._deployment_id = deployment_id
+        self._inputs = None
+        self._nodes = {}
+        self._node_instances = {}
+        self._instances_by_node = {}
+        self._secrets = {}
+
+    def prefetch(self, node_ids=(), node_instance_ids=(),
+                 instances_of=(), secret_keys=()):
+        """Get the nodes, the node instances, all the instances of the
+        nodes in instances_of, and the secrets, with concurrent requests
+        """
+        requests = []
+        node_ids = sorted(set(node_ids) | set(instances_of))
+        if node_ids:
+            requests.append(lambda: self._add_nodes(
+                self._client.nodes.iter(
+                    deployment_id=self._deployment_id, id=node_ids)))
+        if node_instance_ids:
+            ids = sorted(node_instance_ids)
+            requests.append(lambda: self._add_node_instances(
+                self._client.node_instances.iter(
+                    deployment_id=self._deployment_id, id=ids)))
+        if instances_of:
+            names = sorted(instances_of)
+            requests.append(lambda: self._add_instances_of(
+                names,
+                self._client.node_instances.iter(
+                    deployment_id=self._deployment_id, node_id=names)))
+        for key in sorted(secret_keys):
+            requests.append(lambda key=key: self._secrets.__setitem__(
+                key, self._client.secrets.get(key)))
+        map_concurrently(lambda request: request(), requests, PREFETCH_WORKERS)
+
+    def _add_nodes(self, nodes):
+        for node in nodes:
+            # error messages refer to the node by its name
+            node.setdefault('name', node.id)
+            self._nodes[node.id] = node
+
+    def _add_node_instances(self, node_instances):
+        for node_instance in node_instances:
+            self._node_instances[node_instance.id] = node_instance
+
+    def _add_instances_of(self, node_ids, node_instances):
+        instances_by_node = dict((node_id, []) for node_id in node_ids)
+        for node_instance in node_instances:
+            instances_by_node[node_instance.node_id].append(node_instance)
+            self._node_instances[node_instance.id] = node_instance
+        self._instances_by_node.update(instances_by_node)
+
+    def get_input(self, input_name):
+        from dsl_parser.exceptions import UnknownInputError
+
+        if self._inputs is None:
+            self._inputs = self._client.deployments.get(
+                self._deployment_id, _include=['inputs']).get('inputs') or {}
+        try:
+            return self._inputs[input_name]
+        except KeyError:
+            raise UnknownInputError(
+                "get_input function references an "
+                "unknown input '{0}'.".format(input_name))
+
+    def get_node(self, node_id):
+        if node_id not in self._nodes:
+            self._add_nodes([self._client.nodes.get(
+                self._deployment_id, node_id)])
+        return self._nodes[node_id]
+
+    def get_node_instances(self, node_id):
+        if node_id not in self._instances_by_node:
+            self._add_instances_of([node_id], self._client.node_instances.iter(
+                deployment_id=self._deployment_id, node_id=node_id))
+        return self._instances_by_node[node_id]
+
+    def get_node_instance(self, node_instance_id):
+        if node_instance_id not in self._node_instances:
+            self._add_node_instances([
+                self._client.node_instances.get(node_instance_id)])
+        return self._node_instances[node_instance_id]
+
+    def get_secret(self, secret_key):
+        if secret_key not in self._secrets:
+            self._secrets[secret_key] = self._client.secrets.get(secret_key)
+        return self._secrets[secret_key]
+
+    def get_capability(self, capability_path):
+        raise EvaluateOnManager('get_capability')
+
+    def get_group_capability(self, capability_path):
+        raise EvaluateOnManager('get_group_capability')
+
+    def get_label(self, label_key, values_list_index):
+        raise EvaluateOnManager('get_label')
+
+    def get_environment_capability(self, capability_path):
+        raise EvaluateOnManager('get_environment_capability')
+
+
+def evaluate_functions(client, deployment_id, context, payload,
+                       node_ids=()):
+    """Evaluate the functions in payload, like the manager's
+    evaluate/functions endpoint does.
+
+    The payload is changed in place. The nodes and node instances that
+    are likely to be used (the ones the functions name, the ones in the
+    context, and node_ids) are gotten first, in one go.
+
+    :raise EvaluateOnManager: the payload uses functions that are not
+                              in LOCAL_FUNCTIONS
+    """
+    from dsl_parser.functions import evaluate_functions as dsl_evaluate
+
+    functions, instances_of, node_instance_ids, secret_keys = \
+        _references(payload, context)
+    unsupported = functions - LOCAL_FUNCTIONS
+    if unsupported:
+        raise EvaluateOnManager(', '.join(sorted(unsupported)))
+    if not functions:
+        return payload
+    node_ids = set(node_ids)
+    node_ids.update(context[key] for key in ('source_node', 'target_node')
+                    if context.get(key))
+    storage = RestStorage(client, deployment_id)
+    storage.prefetch(node_ids=node_ids,
+                     node_instance_ids=node_instance_ids,
+                     instances_of=instances_of,
+                     secret_keys=secret_keys)
+    return dsl_evaluate(payload, dict(context), storage)
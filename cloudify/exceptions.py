@@ -84,6 +84,12 @@ class HttpException(NonRecoverableError):
         return "{0} ({1}) : {2}".format(self.code, self.url, self.message)
 
 
+class ResourceTooLargeError(NonRecoverableError):
+    """A resource is too large to be read into memory, and can only be
+    downloaded to a file.
+    """
+
+
 class CommandExecutionError(RuntimeError):
 
     """
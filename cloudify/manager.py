@@ -14,15 +14,28 @@
 #    * limitations under the License.
 
 import os
+import copy
+import tempfile
+import threading
 import requests
+from contextlib import contextmanager
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
 
 from cloudify_rest_client.constants import VisibilityState
 
 from cloudify import constants, utils
 from cloudify.state import ctx, workflow_ctx, NotInContext
 from cloudify.exceptions import (HttpException,
-                                 NonRecoverableError)
+                                 NonRecoverableError,
+                                 ResourceTooLargeError)
 from cloudify.cluster import CloudifyClusterClient
+from cloudify.resource_cache import (ResourceCache,
+                                     DEFAULT_MAX_SIZE,
+                                     replace_file)
 
 
 class NodeInstance(object):
@@ -44,6 +57,10 @@ class NodeInstance(object):
         self._node_id = node_id
         self._runtime_properties = \
             DirtyTrackingDict((runtime_properties or {}).copy())
+        # the runtime properties as they were stored, to find the changes
+        # made to them, including changes of nested values
+        self._stored_runtime_properties = \
+            copy.deepcopy(runtime_properties or {})
         self._state = state
         self._version = version
         self._host_id = host_id
@@ -106,7 +123,34 @@ class NodeInstance(object):
 
     @property
     def dirty(self):
-        return self._runtime_properties.dirty
+        return self._runtime_properties.dirty or \
+            bool(self.runtime_properties_patch)
+
+    @property
+    def runtime_properties_patch(self):
+        """The changes made to the runtime properties since they were
+        fetched: a list of ('set', path, value) and ('delete', path),
+        where path is a tuple of the keys leading to the changed value.
+        """
+        return _properties_patch(self._stored_runtime_properties,
+                                 self._runtime_properties)
+
+    def rebase(self, latest):
+        """Apply the changes made to the runtime properties onto latest,
+        a newer NodeInstance of the same node instance.
+
+        That is only done if latest has none of the same properties
+        changed, or one of their parents, or children.
+
+        :returns: whether the changes were applied
+        """
+        patch = self.runtime_properties_patch
+        stored_patch = _properties_patch(self._stored_runtime_properties,
+                                         latest.runtime_properties)
+        if _patches_overlap(patch, stored_patch):
+            return False
+        _apply_properties_patch(latest.runtime_properties, patch)
+        return True
 
     @property
     def host_id(self):
@@ -125,12 +169,29 @@ class NodeInstance(object):
         return self._index
 
 
+# REST clients are reused between get_rest_client calls that would create
+# identically-configured clients, so that their connection pools (and
+# established TLS connections) are reused as well. Clients are keyed by
+# all their settings, including the credentials, so that a client created
+# with credentials that are no longer used, is never returned.
+REST_CLIENT_CACHE_SIZE = 32
+_rest_clients = OrderedDict()
+_rest_clients_lock = threading.Lock()
+
+
+def clear_rest_client_cache():
+    """Forget all the REST clients cached by get_rest_client"""
+    with _rest_clients_lock:
+        _rest_clients.clear()
+
+
 def get_rest_client(tenant=None, api_token=None):
     """
     :param tenant: optional tenant name to connect as
     :param api_token: optional api_token to authenticate with (instead of
             using REST token)
-    :returns: A REST client configured to connect to the manager in context
+    :returns: A REST client configured to connect to the manager in context.
+              Clients are shared by all callers using the same settings.
     :rtype: cloudify_rest_client.CloudifyClient
     """
 
@@ -152,26 +213,40 @@ def get_rest_client(tenant=None, api_token=None):
     else:
         token = utils.get_rest_token()
 
-    return CloudifyClusterClient(
-        headers=headers,
-        host=utils.get_manager_rest_service_host(),
-        port=utils.get_manager_rest_service_port(),
-        tenant=tenant,
-        token=token,
-        protocol=constants.SECURED_PROTOCOL,
-        cert=utils.get_local_rest_certificate(),
-        kerberos_env=utils.get_kerberos_indication(
-            os.environ.get(constants.KERBEROS_ENV_KEY))
-    )
-
-
-def _save_resource(logger, resource, resource_path, target_path):
+    host = utils.get_manager_rest_service_host()
+    port = utils.get_manager_rest_service_port()
+    cert = utils.get_local_rest_certificate()
+    kerberos_env = utils.get_kerberos_indication(
+        os.environ.get(constants.KERBEROS_ENV_KEY))
+
+    # the pid is a part of the key, because connections must not be
+    # shared with forked child processes
+    key = (os.getpid(), tenant, token, tuple(sorted(headers.items())),
+           tuple(host) if isinstance(host, list) else host,
+           port, cert, kerberos_env)
+    with _rest_clients_lock:
+        client = _rest_clients.pop(key, None)
+        if client is None:
+            client = CloudifyClusterClient(
+                headers=headers,
+                host=host,
+                port=port,
+                tenant=tenant,
+                token=token,
+                protocol=constants.SECURED_PROTOCOL,
+                cert=cert,
+                kerberos_env=kerberos_env
+            )
+        _rest_clients[key] = client
+        while len(_rest_clients) > REST_CLIENT_CACHE_SIZE:
+            _rest_clients.popitem(last=False)
+    return client
+
+
+def _target_path(resource_path, target_path):
     if not target_path:
         target_path = os.path.join(utils.create_temp_folder(),
                                    os.path.basename(resource_path))
-    with open(target_path, 'wb') as f:
-        f.write(resource)
-    logger.info("Downloaded %s to %s" % (resource_path, target_path))
     return target_path
 
 
@@ -184,8 +259,10 @@ def download_resource_from_manager(resource_path, logger, target_path=None):
     :param target_path: optional target path for the resource
     :returns: path to the downloaded resource
     """
-    resource = get_resource_from_manager(resource_path)
-    return _save_resource(logger, resource, resource_path, target_path)
+    target_path = _target_path(resource_path, target_path)
+    _download_from_manager(resource_path, target_path)
+    logger.info('Downloaded %s to %s', resource_path, target_path)
+    return target_path
 
 
 def download_resource(blueprint_id,
@@ -224,11 +301,12 @@ def download_resource(blueprint_id,
         if namespace in namespaces_mapping:
             blueprint_id = namespaces_mapping[namespace]
 
-    resource = get_resource(blueprint_id,
-                            deployment_id,
-                            tenant_name,
-                            resource_path)
-    return _save_resource(logger, resource, resource_path, target_path)
+    target_path = _target_path(resource_path, target_path)
+    _try_resource_paths(
+        blueprint_id, deployment_id, tenant_name, resource_path,
+        lambda path: _download_from_manager(path, target_path))
+    logger.info('Downloaded %s to %s', resource_path, target_path)
+    return target_path
 
 
 def _is_resource_origin_from_imported_blueprint(resource_path):
@@ -247,30 +325,85 @@ def _extract_resource_parts(resource_path):
     return namespace, resource_path
 
 
-def get_resource_from_manager(resource_path,
-                              base_url=None,
-                              base_urls=None):
-    """Get resource from the manager file server.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# resources larger than this (in bytes) can't be gotten into memory with
+# get_resource, only downloaded to a file
+RESOURCE_MEMORY_LIMIT = 256 * 1024 * 1024
+_resource_caches = {}
+_resource_caches_lock = threading.Lock()
 
-    :param resource_path: path to resource on the file server
-    :param base_url: The base URL to manager file server. Deprecated.
-    :param base_urls: A list of base URL to cluster manager file servers.
-    :param resource_path: path to resource on the file server.
-    :returns: resource content
+
+def get_resource_cache():
+    """The cache of the files downloaded from the file server, shared by
+    all the processes of this agent.
+
+    The cache is stored in $CLOUDIFY_RESOURCE_CACHE_DIR, or else in the
+    agent's work dir. Its size is $CLOUDIFY_RESOURCE_CACHE_SIZE megabytes;
+    set it to 0 to disable the cache.
+
+    :returns: a ResourceCache, or None if there's no cache
     """
+    directory = os.environ.get(constants.RESOURCE_CACHE_DIR_KEY)
+    if not directory:
+        work_dir = os.environ.get(constants.AGENT_WORK_DIR_KEY)
+        if not work_dir:
+            return None
+        directory = os.path.join(work_dir, 'resource_cache')
+    size = os.environ.get(constants.RESOURCE_CACHE_SIZE_KEY)
+    max_size = DEFAULT_MAX_SIZE if size is None \
+        else int(float(size) * 1024 * 1024)
+    if max_size <= 0:
+        return None
+    with _resource_caches_lock:
+        key = (directory, max_size)
+        if key not in _resource_caches:
+            _resource_caches[key] = ResourceCache(directory, max_size)
+        return _resource_caches[key]
+
+
+class _NoCache(object):
+    """Used instead of a ResourceCache when there's no cache"""
+    @contextmanager
+    def lock(self, key):
+        yield
+
+    def get(self, key):
+        return None
+
+    def put(self, key, etag, content):
+        pass
+
+    def put_file(self, key, etag, path):
+        pass
+
+
+_file_server_session = None
+_file_server_session_pid = None
+_file_server_session_lock = threading.Lock()
+
+
+def _get_file_server_session():
+    """The requests session used for the file server, so that connections
+    are kept alive, and reused by all the downloads of this process.
+    """
+    global _file_server_session, _file_server_session_pid
+    with _file_server_session_lock:
+        # connections must not be shared with forked child processes
+        if _file_server_session_pid != os.getpid():
+            _file_server_session = requests.Session()
+            _file_server_session_pid = os.getpid()
+        return _file_server_session
+
+
+def _file_server_urls(base_url=None, base_urls=None):
     base_urls = base_urls or []
     base_urls += utils.get_manager_file_server_url()
     if base_url is not None:
         base_urls.insert(0, base_url)
+    return base_urls
 
-    # if we have multiple managers to try, set connect_timeout so that
-    # we're not waiting forever for a single non-responding manager
-    if len(base_urls) > 1:
-        timeout = (10, None)
-    else:
-        timeout = None
 
-    verify = utils.get_local_rest_certificate()
+def _file_server_headers():
     headers = {}
     try:
         headers[constants.CLOUDIFY_EXECUTION_TOKEN_HEADER] = \
@@ -278,15 +411,32 @@ def get_resource_from_manager(resource_path,
     except NotInContext:
         headers[constants.CLOUDIFY_EXECUTION_TOKEN_HEADER] = \
             workflow_ctx.execution_token
+    return headers
+
+
+def _request_resource(resource_path, base_urls, headers):
+    """GET the resource, streamed, from the first manager that has it.
+
+    :returns: the response; the caller must close it
+    """
+    # if we have multiple managers to try, set connect_timeout so that
+    # we're not waiting forever for a single non-responding manager
+    if len(base_urls) > 1:
+        timeout = (10, None)
+    else:
+        timeout = None
 
+    verify = utils.get_local_rest_certificate()
+    session = _get_file_server_session()
     for ix, next_url in enumerate(base_urls):
         url = '{0}/{1}'.format(next_url.rstrip('/'), resource_path.lstrip('/'))
         try:
-            response = requests.get(
-                url, verify=verify, headers=headers, timeout=timeout)
+            response = session.get(url, verify=verify, headers=headers,
+                                   timeout=timeout, stream=True)
         except requests.ConnectionError:
             continue
         if not response.ok:
+            response.close()
             is_last = (ix == len(base_urls) - 1)
             if not is_last:
                 # if there's more managers to try, try them: due to filesystem
@@ -294,7 +444,7 @@ def get_resource_from_manager(resource_path,
                 # manager didn't
                 continue
             raise HttpException(url, response.status_code, response.reason)
-        return response.content
+        return response
 
     raise NonRecoverableError(
         'Failed to download {0}: unable to connect to any manager (tried: {1})'
@@ -302,6 +452,147 @@ def get_resource_from_manager(resource_path,
     )
 
 
+def _resource_memory_limit():
+    limit = os.environ.get(constants.RESOURCE_MEMORY_LIMIT_KEY)
+    if limit is None:
+        return RESOURCE_MEMORY_LIMIT
+    return int(float(limit) * 1024 * 1024)
+
+
+def _read_resource(response, resource_path):
+    limit = _resource_memory_limit()
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > limit:
+            raise ResourceTooLargeError(
+                'Resource {0} is larger than {1} bytes, so it can only be '
+                'downloaded to a file, eg. with ctx.download_resource'
+                .format(resource_path, limit))
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def _save_stream(response, target_path):
+    """Write the response to target_path, atomically"""
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(target_path)), prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+        replace_file(temp_path, target_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def get_resource_from_manager(resource_path,
+                              base_url=None,
+                              base_urls=None):
+    """Get resource from the manager file server.
+
+    The resource is read into memory, so resources larger than
+    $CLOUDIFY_RESOURCE_MEMORY_LIMIT megabytes (RESOURCE_MEMORY_LIMIT by
+    default) can't be gotten, only downloaded.
+
+    If there's a resource cache, the file is only downloaded when it
+    changed since it was cached: the file server is sent the cached ETag,
+    and replies 304 Not Modified if it still matches.
+
+    :param resource_path: path to resource on the file server
+    :param base_url: The base URL to manager file server. Deprecated.
+    :param base_urls: A list of base URL to cluster manager file servers.
+    :param resource_path: path to resource on the file server.
+    :returns: resource content
+    """
+    base_urls = _file_server_urls(base_url, base_urls)
+    headers = _file_server_headers()
+    # the path contains the tenant, and the blueprint or deployment id
+    cache_key = resource_path.lstrip('/')
+    cache = get_resource_cache() or _NoCache()
+    # while this process downloads the file, others wanting it wait, and
+    # then find it in the cache
+    with cache.lock(cache_key):
+        cached = cache.get(cache_key)
+        if cached is not None:
+            headers['If-None-Match'] = cached.etag
+        response = _request_resource(resource_path, base_urls, headers)
+        try:
+            if cached is not None and response.status_code == 304:
+                return cached.read()
+            content = _read_resource(response, resource_path)
+        finally:
+            response.close()
+        cache.put(cache_key, response.headers.get('ETag'), content)
+    return content
+
+
+def _download_from_manager(resource_path, target_path,
+                           base_url=None, base_urls=None):
+    """Like get_resource_from_manager, but stream the resource to a file,
+    so that it is never held in memory
+    """
+    base_urls = _file_server_urls(base_url, base_urls)
+    headers = _file_server_headers()
+    cache_key = resource_path.lstrip('/')
+    cache = get_resource_cache() or _NoCache()
+    with cache.lock(cache_key):
+        cached = cache.get(cache_key)
+        if cached is not None:
+            headers['If-None-Match'] = cached.etag
+        response = _request_resource(resource_path, base_urls, headers)
+        try:
+            if cached is not None and response.status_code == 304:
+                cached.copy_to(target_path)
+                return
+            _save_stream(response, target_path)
+        finally:
+            response.close()
+        cache.put_file(cache_key, response.headers.get('ETag'), target_path)
+
+
+BLUEPRINT_TENANTS_CACHE_SIZE = 1000
+_blueprint_tenants = OrderedDict()
+_blueprint_tenants_lock = threading.Lock()
+
+
+def _blueprint_tenant(blueprint_id, tenant_name, refresh=False):
+    """The tenant whose file server folder has the blueprint's files.
+
+    That's the blueprint's own tenant, which differs from tenant_name if
+    the blueprint is global. It is memoized, so that it is only looked up
+    once per blueprint; with refresh, it is looked up again.
+    """
+    key = (tenant_name, blueprint_id)
+    with _blueprint_tenants_lock:
+        if refresh:
+            _blueprint_tenants.pop(key, None)
+        elif key in _blueprint_tenants:
+            return _blueprint_tenants[key]
+
+    client = get_rest_client()
+    blueprint = client.blueprints.get(blueprint_id)
+    if blueprint['visibility'] == VisibilityState.GLOBAL:
+        tenant_name = blueprint['tenant_name']
+
+    with _blueprint_tenants_lock:
+        _blueprint_tenants[key] = tenant_name
+        while len(_blueprint_tenants) > BLUEPRINT_TENANTS_CACHE_SIZE:
+            _blueprint_tenants.popitem(last=False)
+    return tenant_name
+
+
+def _blueprint_resource_path(blueprint_tenant, blueprint_id, resource_path):
+    return os.path.join(
+        constants.FILE_SERVER_BLUEPRINTS_FOLDER,
+        blueprint_tenant,
+        blueprint_id,
+        resource_path
+    ).replace('\\', '/')
+
+
 def _resource_paths(blueprint_id, deployment_id, tenant_name, resource_path):
     """For the given resource_path, generate all firesever paths to try.
 
@@ -318,17 +609,19 @@ def _resource_paths(blueprint_id, deployment_id, tenant_name, resource_path):
             resource_path
         ).replace('\\', '/')
 
-    client = get_rest_client()
-    blueprint = client.blueprints.get(blueprint_id)
-    if blueprint['visibility'] == VisibilityState.GLOBAL:
-        tenant_name = blueprint['tenant_name']
-
-    yield os.path.join(
-        constants.FILE_SERVER_BLUEPRINTS_FOLDER,
-        tenant_name,
-        blueprint_id,
-        resource_path
-    ).replace('\\', '/')
+    with _blueprint_tenants_lock:
+        memoized = (tenant_name, blueprint_id) in _blueprint_tenants
+    blueprint_tenant = _blueprint_tenant(blueprint_id, tenant_name)
+    yield _blueprint_resource_path(
+        blueprint_tenant, blueprint_id, resource_path)
+    if memoized:
+        # not found: the blueprint might have been deleted since its
+        # tenant was memoized, and uploaded again by another tenant
+        refreshed_tenant = _blueprint_tenant(
+            blueprint_id, tenant_name, refresh=True)
+        if refreshed_tenant != blueprint_tenant:
+            yield _blueprint_resource_path(
+                refreshed_tenant, blueprint_id, resource_path)
 
     yield resource_path
 
@@ -351,11 +644,24 @@ def get_resource(blueprint_id, deployment_id, tenant_name, resource_path):
     :param resource_path: path to resource relative to blueprint folder
     :returns: resource content
     """
+    return _try_resource_paths(
+        blueprint_id, deployment_id, tenant_name, resource_path,
+        get_resource_from_manager)
+
+
+def _try_resource_paths(blueprint_id, deployment_id, tenant_name,
+                        resource_path, func):
+    """Call func with each of the resource's _resource_paths, until one
+    isn't a 404
+    """
     tried_paths = []
     for path in _resource_paths(
             blueprint_id, deployment_id, tenant_name, resource_path):
         try:
-            return get_resource_from_manager(path)
+            return func(path)
+        except ResourceTooLargeError:
+            # the resource is at this path
+            raise
         except NonRecoverableError:
             tried_paths.append(path)
         except HttpException as e:
@@ -462,6 +768,52 @@ def get_provider_context(client=None):
     return context['context']
 
 
+def _properties_patch(old, new, path=()):
+    """The changes from old to new; see NodeInstance.runtime_properties_patch
+
+    Dicts are compared key by key, and all other values, eg. lists, are
+    set whole when they changed.
+    """
+    patch = []
+    for key, value in new.items():
+        key_path = path + (key,)
+        if key not in old:
+            patch.append(('set', key_path, value))
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            patch += _properties_patch(old[key], value, key_path)
+        elif value != old[key] or \
+                isinstance(value, bool) != isinstance(old[key], bool):
+            # True == 1, but that's still a change
+            patch.append(('set', key_path, value))
+    for key in old:
+        if key not in new:
+            patch.append(('delete', path + (key,)))
+    return patch
+
+
+def _apply_properties_patch(properties, patch):
+    for operation in patch:
+        path = operation[1]
+        target = properties
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        if operation[0] == 'set':
+            target[path[-1]] = copy.deepcopy(operation[2])
+        else:
+            target.pop(path[-1], None)
+
+
+def _patches_overlap(patch, other):
+    other_paths = [operation[1] for operation in other]
+    for operation in patch:
+        path = operation[1]
+        for other_path in other_paths:
+            length = min(len(path), len(other_path))
+            if path[:length] == other_path[:length]:
+                return True
+    return False
+
+
 class DirtyTrackingDict(dict):
 
     def __init__(self, *args, **kwargs):
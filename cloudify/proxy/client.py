@@ -15,20 +15,16 @@
 
 import os
 import json
+import shlex
 import argparse
 import sys
 
 
-try:
-    from urllib.request import urlopen
-except ImportError:
-    # py2
-    from urllib2 import urlopen
-
-
 # Environment variable for the socket url
 # (used by clients to locate the socket [http, zmq(unix, tcp)])
 CTX_SOCKET_URL = 'CTX_SOCKET_URL'
+# how long the --daemon waits for the script to open its fifos
+DAEMON_CONNECT_TIMEOUT = 60
 
 
 class ScriptException(Exception):
@@ -65,6 +61,13 @@ def zmq_client_req(socket_url, request, timeout):
 
 
 def http_client_req(socket_url, request, timeout):
+    # imported here, because urllib is slow to import, and this module is
+    # imported on every `ctx` call, even if the zmq transport is used
+    try:
+        from urllib.request import urlopen
+    except ImportError:
+        # py2
+        from urllib2 import urlopen
     response = urlopen(
         socket_url, data=json.dumps(request).encode('utf-8'), timeout=timeout)
     if response.code != 200:
@@ -72,20 +75,76 @@ def http_client_req(socket_url, request, timeout):
     return json.loads(response.read())
 
 
-def client_req(socket_url, args, timeout=5):
-    request = {
-        'args': args
-    }
+class Connection(object):
+    """Makes requests to the proxy at socket_url, like client_req.
 
-    schema, _ = socket_url.split('://')
-    if schema in ['ipc', 'tcp']:
-        request_method = zmq_client_req
-    elif schema in ['http']:
-        request_method = http_client_req
-    else:
-        raise RuntimeError('Unsupported protocol: {0}'.format(schema))
+    With zmq, the socket is kept open between the requests. The http
+    proxy closes the connection after each response, so with http,
+    each request is sent over a new connection.
+    """
+    def __init__(self, socket_url, timeout=5):
+        schema, _ = socket_url.split('://')
+        if schema not in ['ipc', 'tcp', 'http']:
+            raise RuntimeError('Unsupported protocol: {0}'.format(schema))
+        self.socket_url = socket_url
+        self.timeout = timeout
+        self._http = schema == 'http'
+        self._zmq_context = None
+        self._sock = None
+
+    def send(self, request):
+        """Send the request, and return the response, as is"""
+        if self._http:
+            return http_client_req(self.socket_url, request, self.timeout)
+        import zmq
+        if self._sock is None:
+            if self._zmq_context is None:
+                self._zmq_context = zmq.Context()
+            self._sock = self._zmq_context.socket(zmq.REQ)
+            self._sock.connect(self.socket_url)
+        self._sock.send_json(request)
+        if self._sock.poll(1000 * self.timeout):
+            return self._sock.recv_json()
+        # a REQ socket can't send another request before it gets the
+        # response, so start over with a new one
+        self._sock.close(linger=0)
+        self._sock = None
+        raise RuntimeError('Timed out while waiting for response')
 
-    response = request_method(socket_url, request, timeout)
+    def request(self, args):
+        return get_payload(self.send({'args': args}))
+
+    def batch(self, requests_args):
+        """Send all the requests in one go.
+
+        :param requests_args: the args of each request
+        :return: the responses (see get_payload); the requests after one
+                 that failed, or stopped the operation, are not processed,
+                 and have no response
+        """
+        response = self.send({
+            'requests': [{'args': args} for args in requests_args]
+        })
+        if response.get('type') != 'batch':
+            # the request itself was invalid
+            get_payload(response)
+        return response['payload']
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close(linger=0)
+            self._sock = None
+        if self._zmq_context is not None:
+            self._zmq_context.term()
+            self._zmq_context = None
+
+
+def get_payload(response):
+    """The payload of the proxy's response.
+
+    :raise RequestError: the request failed
+    :raise SystemExit: the request stopped the operation, eg. ctx abort
+    """
     payload = response['payload']
     response_type = response.get('type')
     if response_type == 'error':
@@ -101,12 +160,35 @@ def client_req(socket_url, args, timeout=5):
         return payload
 
 
+def client_req(socket_url, args, timeout=5):
+    request = {
+        'args': args
+    }
+
+    schema, _ = socket_url.split('://')
+    if schema in ['ipc', 'tcp']:
+        request_method = zmq_client_req
+    elif schema in ['http']:
+        request_method = http_client_req
+    else:
+        raise RuntimeError('Unsupported protocol: {0}'.format(schema))
+
+    return get_payload(request_method(socket_url, request, timeout))
+
+
 def parse_args(args=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('-t', '--timeout', type=int, default=30)
     parser.add_argument('--socket-url', default=os.environ.get(CTX_SOCKET_URL))
     parser.add_argument('--json-arg-prefix', default='@')
     parser.add_argument('-j', '--json-output', action='store_true')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true',
+                      help='read requests from stdin, one per line, and '
+                           'print their results as JSON, one per line')
+    mode.add_argument('--daemon', action='store_true',
+                      help='serve requests over a pair of fifos, until '
+                           'the script closes them')
     parser.add_argument('args', nargs='*')
     args = parser.parse_args(args)
     if not args.socket_url:
@@ -130,19 +212,135 @@ def process_args(json_prefix, args):
     return processed_args
 
 
+def parse_request_line(line, json_prefix):
+    """The args of a request line of --batch and --daemon: a JSON list,
+    or the arguments as they would be passed to ctx, eg.
+    `instance runtime-properties port @8080`
+    """
+    line = line.strip()
+    if line.startswith('['):
+        return json.loads(line, object_hook=_catch_non_serializable)
+    return process_args(json_prefix, shlex.split(line))
+
+
+def _format_output(response, json_output):
+    if json_output:
+        return json.dumps(response)
+    if not response:
+        return ''
+    return str(response)
+
+
+def run_batch(args):
+    """Send the requests read from stdin in one go, and print the result
+    of each on its own line, as JSON (whether or not -j was passed: a
+    result printed as text can take more than one line).
+
+    Requests after one that fails are not processed; the error is raised
+    once the results before it were printed.
+    """
+    requests_args = [parse_request_line(line, args.json_arg_prefix)
+                     for line in sys.stdin if line.strip()]
+    connection = Connection(args.socket_url, args.timeout)
+    try:
+        responses = connection.batch(requests_args)
+    finally:
+        connection.close()
+    for response in responses:
+        sys.stdout.write(json.dumps(get_payload(response)) + '\n')
+
+
+def serve(connection, requests_file, responses_file, json_prefix='@'):
+    """Answer the requests read from requests_file, until its end.
+
+    Each request is a line (see parse_request_line), and each response
+    is a line written to responses_file:
+        ok <the result, as JSON>
+        error <the error type>: <the error message>
+        stop <the message>, when the request stops the operation
+    """
+    # not `for line in requests_file`: on py2 that reads ahead, and
+    # blocks until the fifo has more than the current request
+    for line in iter(requests_file.readline, ''):
+        if not line.strip():
+            continue
+        try:
+            result = connection.request(
+                parse_request_line(line, json_prefix))
+            response = 'ok {0}'.format(json.dumps(result))
+        except RequestError as e:
+            response = 'error {0}: {1}'.format(e.ex_type, e.ex_message)
+        except SystemExit as e:
+            response = 'stop {0}'.format(e)
+        except Exception as e:
+            response = 'error {0}: {1}'.format(type(e).__name__, e)
+        responses_file.write(response.replace('\n', ' ') + '\n')
+        responses_file.flush()
+
+
+def run_daemon(args):
+    """Print the paths of two fifos, and serve the requests written to
+    the first one in the background, writing the responses to the second.
+
+    A shell script can then make requests without starting ctx again:
+        read -r ctx_in ctx_out <<< "$(ctx --daemon)"
+        exec 3>"$ctx_in" 4<"$ctx_out"
+        echo 'node properties port' >&3
+        read -r status port <&4
+        exec 3>&- 4<&-
+
+    The daemon exits when the script closes the first fifo (or exits).
+    """
+    import shutil
+    import signal
+    import tempfile
+    if not hasattr(os, 'mkfifo'):
+        raise RuntimeError('--daemon is not supported on this platform')
+    fifo_dir = tempfile.mkdtemp(prefix='ctx-')
+    requests_path = os.path.join(fifo_dir, 'requests')
+    responses_path = os.path.join(fifo_dir, 'responses')
+    os.mkfifo(requests_path, 0o600)
+    os.mkfifo(responses_path, 0o600)
+    sys.stdout.write('{0} {1}\n'.format(requests_path, responses_path))
+    sys.stdout.flush()
+    if os.fork():
+        return
+
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in range(3):
+        os.dup2(devnull, fd)
+
+    def _connect_timeout(*_):
+        raise RuntimeError('The fifos were not opened')
+
+    connection = Connection(args.socket_url, args.timeout)
+    try:
+        signal.signal(signal.SIGALRM, _connect_timeout)
+        signal.alarm(DAEMON_CONNECT_TIMEOUT)
+        # in the order the script opens them, or both would block
+        requests_file = open(requests_path)
+        responses_file = open(responses_path, 'w')
+        signal.alarm(0)
+        serve(connection, requests_file, responses_file,
+              args.json_arg_prefix)
+    finally:
+        connection.close()
+        shutil.rmtree(fifo_dir, ignore_errors=True)
+        os._exit(0)
+
+
 def main(args=None):
     args = parse_args(args)
+    if args.batch:
+        return run_batch(args)
+    if args.daemon:
+        return run_daemon(args)
     response = client_req(args.socket_url,
                           process_args(args.json_arg_prefix,
                                        args.args),
                           args.timeout)
-    if args.json_output:
-        response = json.dumps(response)
-    else:
-        if not response:
-            response = ''
-        response = str(response)
-    sys.stdout.write(response)
+    sys.stdout.write(_format_output(response, args.json_output))
 
 
 if __name__ == '__main__':
@@ -37,9 +37,36 @@ class CtxProxy(object):
         self.socket_url = socket_url
 
     def process(self, request):
+        """The JSON response to the JSON request.
+
+        A request is either {'args': [...]}, or a batch of them:
+        {'requests': [{'args': [...]}, ...]}. The requests of a batch are
+        processed in order, up to the first one that fails or stops the
+        operation, and the response's payload is the list of their
+        responses.
+        """
         try:
             typed_request = json.loads(request)
+            if 'requests' in typed_request:
+                responses = []
+                for item in typed_request['requests']:
+                    response, ok = self._process_args(item['args'])
+                    responses.append(response)
+                    if not ok:
+                        break
+                return '{{"type": "batch", "payload": [{0}]}}'.format(
+                    ', '.join(responses))
             args = typed_request['args']
+        except Exception as e:
+            return self._error_response(e)
+        response, _ = self._process_args(args)
+        return response
+
+    def _process_args(self, args):
+        """The JSON response to the request for args, and whether it
+        succeeded
+        """
+        try:
             payload = process_ctx_request(self.ctx, args)
             result_type = 'result'
             if isinstance(payload, ScriptException):
@@ -50,18 +77,21 @@ class CtxProxy(object):
                 'payload': payload
             })
         except Exception as e:
-            tb = StringIO()
-            traceback.print_exc(file=tb)
-            payload = {
-                'type': type(e).__name__,
-                'message': str(e),
-                'traceback': tb.getvalue()
-            }
-            result = json.dumps({
-                'type': 'error',
-                'payload': payload
-            })
-        return result
+            return self._error_response(e), False
+        return result, result_type == 'result'
+
+    def _error_response(self, e):
+        tb = StringIO()
+        traceback.print_exc(file=tb)
+        payload = {
+            'type': type(e).__name__,
+            'message': str(e),
+            'traceback': tb.getvalue()
+        }
+        return json.dumps({
+            'type': 'error',
+            'payload': payload
+        })
 
     def close(self):
         pass
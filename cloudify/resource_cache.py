@@ -0,0 +1,258 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""An on-disk cache of the files downloaded from the manager file server.
+
+The cache is a directory shared by all the processes of an agent:
+    entries/<hash of the key>  - json: the key, its ETag, and content hash
+    objects/<sha256>           - the content; equal files are stored once
+    locks/<hash of the key>    - lock files, see ResourceCache.lock
+
+Entries are only a hint: the file server is always asked whether the
+file changed (If-None-Match), so a cached file is never served stale.
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import fasteners
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+# threading locks, for the threads of the same process: the fasteners
+# locks are only exclusive between processes
+_LOCK_STRIPES = 16
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash(data):
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def replace_file(source, destination):
+    """Rename source to destination, replacing it if it exists.
+
+    Readers of destination never see it partially written, if both are
+    on the same filesystem.
+    """
+    try:
+        os.rename(source, destination)
+    except OSError:
+        # windows doesn't overwrite with rename
+        _remove(destination)
+        os.rename(source, destination)
+
+
+def copy_file(source, destination):
+    """Copy source to destination, replacing it atomically"""
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(destination)), prefix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp_path)
+        replace_file(temp_path, destination)
+    except Exception:
+        _remove(temp_path)
+        raise
+
+
+class CachedResource(object):
+    """A file stored in the cache.
+
+    :ivar path: where the content is stored; the file is shared, and must
+                not be changed
+    """
+    def __init__(self, key, etag, path):
+        self.key = key
+        self.etag = etag
+        self.path = path
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def copy_to(self, destination):
+        copy_file(self.path, destination)
+
+
+class ResourceCache(object):
+    """Files stored by key, and evicted least-recently-used first once
+    their total size is over max_size.
+
+    :param directory: where to store the files
+    :param max_size: total size of the files, in bytes
+    """
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._entries_dir = os.path.join(directory, 'entries')
+        self._objects_dir = os.path.join(directory, 'objects')
+        self._locks_dir = os.path.join(directory, 'locks')
+        self._thread_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        for path in [self._entries_dir, self._objects_dir, self._locks_dir]:
+            try:
+                os.makedirs(path)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def _entry_path(self, key):
+        return os.path.join(self._entries_dir, _hash(key))
+
+    def _object_path(self, content_hash):
+        return os.path.join(self._objects_dir, content_hash)
+
+    def _write(self, path, data):
+        """Write the file atomically, so that readers never see it
+        partially written
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            replace_file(tmp_path, path)
+        except Exception:
+            _remove(tmp_path)
+            raise
+
+    @contextmanager
+    def lock(self, key):
+        """Lock the key, so that only one thread of all the processes
+        using the cache fetches it at a time
+        """
+        key_hash = _hash(key)
+        with self._thread_locks[int(key_hash[:8], 16) % _LOCK_STRIPES]:
+            with fasteners.InterProcessLock(
+                    os.path.join(self._locks_dir, key_hash)):
+                yield
+
+    def get(self, key):
+        """The CachedResource stored for key, or None.
+
+        The content is checked against its hash, so a file that was
+        evicted, or damaged, is a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+            object_path = self._object_path(entry['sha256'])
+            if entry.get('key') != key or \
+                    _hash_file(object_path) != entry['sha256']:
+                return None
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        try:
+            # the entry's mtime is its last use, for the eviction
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return CachedResource(key, entry.get('etag'), object_path)
+
+    def put(self, key, etag, content):
+        """Store content for key, and evict the least recently used
+        files if the cache is over max_size.
+
+        Files without an ETag can't be revalidated, so aren't stored.
+        """
+        if not etag or len(content) > self.max_size:
+            return
+        content_hash = _hash(content)
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._write(object_path, content)
+        self._put_entry(key, etag, content_hash)
+
+    def put_file(self, key, etag, path):
+        """Like put, but store a copy of the file at path"""
+        if not etag or os.path.getsize(path) > self.max_size:
+            return
+        content_hash = _hash_file(path)
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            copy_file(path, object_path)
+        self._put_entry(key, etag, content_hash)
+
+    def _put_entry(self, key, etag, content_hash):
+        self._write(self._entry_path(key), json.dumps({
+            'key': key,
+            'etag': etag,
+            'sha256': content_hash,
+        }).encode('utf-8'))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the files fit in
+        max_size, and the files that no entry refers to
+        """
+        sizes = {}
+        for name in os.listdir(self._objects_dir):
+            if name.startswith('.'):
+                # being written
+                continue
+            try:
+                sizes[name] = os.path.getsize(self._object_path(name))
+            except OSError:
+                pass
+        total = sum(sizes.values())
+
+        entries = []
+        refcounts = {}
+        for name in os.listdir(self._entries_dir):
+            path = os.path.join(self._entries_dir, name)
+            try:
+                with open(path) as f:
+                    content_hash = json.load(f)['sha256']
+                mtime = os.path.getmtime(path)
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+            entries.append((mtime, path, content_hash))
+            refcounts[content_hash] = refcounts.get(content_hash, 0) + 1
+
+        entries.sort()
+        for _, path, content_hash in entries:
+            if total <= self.max_size:
+                break
+            _remove(path)
+            refcounts[content_hash] -= 1
+            if not refcounts[content_hash]:
+                total -= sizes.get(content_hash, 0)
+
+        for content_hash in sizes:
+            if not refcounts.get(content_hash):
+                _remove(self._object_path(content_hash))
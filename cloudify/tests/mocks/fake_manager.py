@@ -0,0 +1,171 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""A local HTTP server standing in for the manager's REST service.
+
+Routes are registered with handlers that get a `FakeRequest`, and return
+a `(status, body)` or a `(status, body, headers)` tuple. A dict or a list
+body is sent as JSON.
+"""
+
+import re
+import json
+import time
+import zlib
+import threading
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # py2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+from cloudify_rest_client import CloudifyClient
+
+API_PREFIX = '/api/v3.1'
+
+
+class FakeRequest(object):
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def arg(self, name, default=None):
+        """The (first) value of the querystring parameter `name`"""
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def content(self):
+        """The body, decompressed if it was sent gzipped"""
+        if self.headers.get('Content-Encoding') == 'gzip':
+            return zlib.decompress(self.body, 31)
+        return self.body
+
+    def json(self):
+        return json.loads(self.content().decode('utf-8'))
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # a backlog large enough for concurrent clients' connections, which
+    # would otherwise be retried by the kernel only after a second
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args, **kwargs):
+        pass
+
+    def _handle(self):
+        manager = self.server.fake_manager
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        request = FakeRequest(self.command, path, parse_qs(parsed.query),
+                              self.headers, body)
+        manager.requests.append(request)
+        if manager.delay:
+            time.sleep(manager.delay)
+
+        result = manager.dispatch(request)
+        status, response_body = result[:2]
+        headers = result[2] if len(result) > 2 else {}
+        if isinstance(response_body, (dict, list)):
+            response_body = json.dumps(response_body).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+        elif response_body is None:
+            response_body = b''
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(response_body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _handle
+
+
+class FakeManager(object):
+    """A fake manager listening on host (any 127.x.x.x address works)"""
+    def __init__(self, host='127.0.0.1', port=0):
+        self.requests = []
+        self.delay = 0
+        self._routes = []
+        self._server = _Server((host, port), _Handler)
+        self._server.fake_manager = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def route(self, method, path, handler):
+        """Register handler for requests matching method & the path regex"""
+        self._routes.append((method, re.compile('^{0}$'.format(path)),
+                             handler))
+
+    def add_list(self, path, items, page_size=1000):
+        """Serve the items as a paginated list, like the REST service does"""
+        def _list(request):
+            offset = int(request.arg('_offset', 0))
+            size = int(request.arg('_size', page_size))
+            return 200, {
+                'items': items[offset:offset + size],
+                'metadata': {'pagination': {
+                    'offset': offset,
+                    'size': size,
+                    'total': len(items),
+                }}
+            }
+        self.route('GET', path, _list)
+
+    def dispatch(self, request):
+        for method, path, handler in self._routes:
+            if method == request.method and path.match(request.path):
+                return handler(request)
+        return 404, {'message': 'Not found: {0}'.format(request.path),
+                     'error_code': 'not_found_error'}
+
+    def client(self, **kwargs):
+        return CloudifyClient(host=self.host, port=self.port, **kwargs)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,259 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import testtools
+
+from cloudify_rest_client._compat import PY2
+from cloudify_rest_client.exceptions import CloudifyClientError
+from cloudify_rest_client.hooks import RequestHooks
+from cloudify_rest_client.node_instances import NodeInstance
+
+from cloudify import cluster
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+try:
+    import asyncio
+    import aiohttp  # noqa
+except ImportError:
+    aio = None
+else:
+    from cloudify_async_client import client as aio
+
+
+class _TwoRequests(object):
+    def __init__(self, api):
+        self.api = api
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+        try:
+            missing = self.api.get('/missing')
+        except CloudifyClientError as e:
+            if e.status_code != 404:
+                raise
+            missing = None
+        return missing, self.api.get('/a'), self.api.post('/b', data={})
+
+
+@testtools.skipIf(PY2 or aio is None, 'requires python 3 and aiohttp')
+class AsyncClientTest(testtools.TestCase):
+    def setUp(self):
+        super(AsyncClientTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.client = self._client(aio.AsyncCloudifyClient)
+        self.addCleanup(cluster.reset_hosts_health)
+
+    def _client(self, client_class, host=None, **kwargs):
+        client = client_class(host=host or self.manager.host,
+                              port=self.manager.port, tenant='t1', **kwargs)
+        self.addCleanup(self._run, client.close())
+        return client
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_get(self):
+        self.manager.route('GET', '/blueprints/bp1', lambda request: (
+            200, {'id': 'bp1', 'tenant': request.headers['Tenant']}))
+        blueprint = self._run(self.client.blueprints.get('bp1'))
+        self.assertEqual('bp1', blueprint.id)
+        self.assertEqual('t1', blueprint['tenant'])
+
+    def test_list(self):
+        self.manager.add_list('/node-instances', [{'id': 'ni1'}])
+        instances = self._run(self.client.node_instances.list(
+            deployment_id='d1', _include=['id'], _get_all_results=True))
+        self.assertIsInstance(instances[0], NodeInstance)
+        self.assertEqual(1, instances.metadata.pagination.total)
+        request = self.manager.requests[0]
+        self.assertEqual('d1', request.arg('deployment_id'))
+        self.assertEqual('id', request.arg('_include'))
+        self.assertEqual('True', request.arg('_get_all_results'))
+
+    def test_nested_endpoint(self):
+        self.manager.route('GET', '/deployments/d1/outputs', lambda request: (
+            200, {'deployment_id': 'd1', 'outputs': {'a': 1}}))
+        outputs = self._run(self.client.deployments.outputs.get('d1'))
+        self.assertEqual({'a': 1}, outputs.outputs)
+
+    def test_body(self):
+        self.manager.route('PUT', '/secrets/s1', lambda request: (
+            200, dict(request.json(), key='s1')))
+        secret = self._run(self.client.secrets.create('s1', 'v1'))
+        self.assertEqual('v1', secret.value)
+
+    def test_error(self):
+        with testtools.ExpectedException(CloudifyClientError,
+                                         '.*Not found: /blueprints/bp1'):
+            self._run(self.client.blueprints.get('bp1'))
+
+    def test_many_requests(self):
+        self.manager.route('GET', '/a', lambda request: (200, {'a': 1}))
+        self.manager.route('POST', '/b', lambda request: (200, {'b': 2}))
+        two_requests = _TwoRequests(self.client._client)
+        endpoint = aio._AsyncEndpoint(self.client._client, two_requests)
+        self.assertEqual((None, {'a': 1}, {'b': 2}),
+                         self._run(endpoint.run()))
+        self.assertEqual(['/missing', '/a', '/b'],
+                         [r.path for r in self.manager.requests])
+        self.assertEqual(1, two_requests.runs)
+
+    def test_request_outside_endpoint(self):
+        self.assertRaises(RuntimeError, self.client._client.get, '/a')
+        self.manager.add_list('/blueprints', [])
+        self._run(self.client.blueprints.list())
+        # this is the thread that runs the event loop
+        self.assertRaises(RuntimeError, self.client._client.get, '/a')
+        self.assertEqual(['/blueprints'],
+                         [r.path for r in self.manager.requests])
+
+    def test_concurrent(self):
+        in_flight = [0, 0]
+        lock = threading.Lock()
+
+        def _slow(request):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.2)
+            with lock:
+                in_flight[0] -= 1
+            return 200, {'id': request.path.split('/')[-1]}
+
+        self.manager.route('GET', '/deployments/.*', _slow)
+        start = time.time()
+        # gathered as tasks of the loop: gather() has no loop argument
+        # since python 3.10, and this can't use `async def` (python 2)
+        deployments = self._run(asyncio.gather(*[
+            self.loop.create_task(
+                self.client.deployments.get('d{0}'.format(i)))
+            for i in range(10)]))
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(['d{0}'.format(i) for i in range(10)],
+                         [d.id for d in deployments])
+        self.assertGreater(in_flight[1], 1)
+
+    def test_download(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.manager.route('GET', '/blueprints/bp1/archive', lambda request: (
+            200, b'archive data',
+            {'Content-Disposition': 'attachment; filename=bp1.tar.gz'}))
+        path = self._run(self.client.blueprints.download('bp1', tmpdir))
+        self.assertEqual(os.path.join(tmpdir, 'bp1.tar.gz'), path)
+        with open(path, 'rb') as f:
+            self.assertEqual(b'archive data', f.read())
+
+    def test_streamed_download(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        data = os.urandom(300000)
+        self.manager.route('GET', '/blueprints/bp1/archive', lambda request: (
+            200, data,
+            {'Content-Disposition': 'attachment; filename=bp1.tar.gz'}))
+        chunks = []
+        path = self._run(self.client.blueprints.download(
+            'bp1', tmpdir, progress_callback=lambda done, total:
+            chunks.append(done)))
+        with open(path, 'rb') as f:
+            self.assertEqual(data, f.read())
+        # written as it was received, a chunk at a time
+        self.assertGreater(len(chunks), 1)
+
+    def test_upload(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        plugin_path = os.path.join(tmpdir, 'plugin.zip')
+        with open(plugin_path, 'wb') as f:
+            f.write(b'x' * 20000)
+        received = []
+
+        def _upload(request):
+            received.append(request.body)
+            return 201, {'id': 'p1'}
+
+        self.manager.route('POST', '/plugins', _upload)
+        progress = []
+        plugin = self._run(self.client.plugins.upload(
+            plugin_path, progress_callback=lambda done, total:
+            progress.append(done)))
+        self.assertEqual('p1', plugin.id)
+        self.assertEqual([b'x' * 20000], received)
+        self.assertEqual('20000',
+                         self.manager.requests[0].headers['Content-Length'])
+        # read a buffer at a time, while being sent
+        self.assertEqual([8192, 16384, 20000], progress)
+
+    def test_hooks(self):
+        responses = []
+        hooks = RequestHooks()
+        hooks.after_response = responses.append
+        client = self._client(aio.AsyncCloudifyClient, hooks=[hooks])
+        self.manager.route('GET', '/blueprints/bp1', lambda request: (
+            200, {'id': 'bp1'}))
+        self._run(client.blueprints.get('bp1'))
+        self.assertEqual([('/blueprints/{id}', 200)],
+                         [(r.endpoint, r.status_code) for r in responses])
+
+    def test_compressed_request(self):
+        client = self._client(aio.AsyncCloudifyClient, compress_requests=10)
+        self.manager.route('PUT', '/secrets/s1', lambda request: (
+            200, dict(request.json(), key='s1')))
+        secret = self._run(client.secrets.create('s1', 'v' * 1000))
+        self.assertEqual('v' * 1000, secret.value)
+        self.assertEqual(
+            'gzip', self.manager.requests[0].headers['Content-Encoding'])
+
+    def test_iter_not_supported(self):
+        self.assertRaises(AttributeError,
+                          lambda: self.client.node_instances.iter)
+
+    def test_cluster_failover(self):
+        attempts = []
+
+        def _flaky(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                return 502, b'bad gateway'
+            return 200, {'id': 'bp1'}
+
+        self.manager.route('GET', '/blueprints/bp1', _flaky)
+        # nothing listens on 127.0.0.2, so connecting there fails
+        client = self._client(aio.AsyncCloudifyClusterClient,
+                              host=['127.0.0.2', self.manager.host])
+        for _ in range(3):
+            self.assertEqual(
+                'bp1', self._run(client.blueprints.get('bp1')).id)
+        self.assertEqual(4, len(attempts))
+
+    def test_cluster_error(self):
+        client = self._client(aio.AsyncCloudifyClusterClient,
+                              host=['127.0.0.2', '127.0.0.3'])
+        client._client.retries = 4
+        e = self.assertRaises(CloudifyClientError, self._run,
+                              client.blueprints.get('bp1'))
+        self.assertIn('127.0.0.2', str(e))
+        self.assertIn('127.0.0.3', str(e))
@@ -0,0 +1,213 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import time
+import threading
+
+import mock
+import testtools
+
+from cloudify_rest_client import bulk
+from cloudify_rest_client.exceptions import CloudifyClientError
+
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class _FakeExecutions(object):
+    """Executions that end after being polled `polls` times"""
+    def __init__(self, polls=2, fail=()):
+        self.polls = polls
+        self.fail = fail
+        self.executions = {}
+
+    def start(self, request):
+        body = request.json()
+        execution = {
+            'id': 'e-{0}'.format(body['deployment_id']),
+            'deployment_id': body['deployment_id'],
+            'workflow_id': body['workflow_id'],
+            'status': 'pending',
+            'polled': 0,
+        }
+        self.executions[execution['id']] = execution
+        return 201, execution
+
+    def list(self, request):
+        ids = request.query.get('id')
+        deployment_ids = request.query.get('deployment_id')
+        items = []
+        for execution in self.executions.values():
+            if ids and execution['id'] not in ids or \
+                    deployment_ids and \
+                    execution['deployment_id'] not in deployment_ids:
+                continue
+            execution['polled'] += 1
+            if execution['polled'] > self.polls:
+                execution['status'] = 'failed' \
+                    if execution['deployment_id'] in self.fail \
+                    else 'terminated'
+            items.append(dict(execution))
+        return 200, {'items': items, 'metadata': {'pagination': {
+            'offset': 0, 'size': 1000, 'total': len(items)}}}
+
+
+class BulkTest(testtools.TestCase):
+    def setUp(self):
+        super(BulkTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.client = self.manager.client()
+        self.executions = _FakeExecutions()
+        self.manager.route('POST', '/executions', self.executions.start)
+        self.manager.route('GET', '/executions', self.executions.list)
+
+    def _requests(self, method, path):
+        return [r for r in self.manager.requests
+                if r.method == method and r.path == path]
+
+    def test_bounded_concurrency(self):
+        in_flight = [0, 0]
+        lock = threading.Lock()
+
+        def _create(request):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return 201, {'id': request.path.split('/')[-1]}
+
+        self.manager.route('PUT', '/deployments/.*', _create)
+        progress = []
+        results = bulk.create_deployments(
+            self.client,
+            [{'blueprint_id': 'bp1', 'deployment_id': 'd{0}'.format(i)}
+             for i in range(20)],
+            workers=4,
+            progress_callback=lambda done, total: progress.append(done))
+        self.assertEqual(['d{0}'.format(i) for i in range(20)],
+                         [r.result.id for r in results])
+        self.assertEqual(20, len(results.succeeded))
+        self.assertLessEqual(in_flight[1], 4)
+        self.assertEqual(list(range(1, 21)), progress)
+
+    def test_retry_when_throttled(self):
+        rejected = []
+
+        def _create(request):
+            if len(rejected) < 3:
+                rejected.append(request.path)
+                return 429, {'message': 'Too many requests',
+                             'error_code': 'too_many_requests'}, \
+                    {'Retry-After': '0.01'}
+            return 201, {'id': request.path.split('/')[-1]}
+
+        self.manager.route('PUT', '/deployments/.*', _create)
+        results = bulk.create_deployments(
+            self.client,
+            [{'blueprint_id': 'bp1', 'deployment_id': 'd{0}'.format(i)}
+             for i in range(5)],
+            workers=1)
+        self.assertEqual([], results.failed)
+        self.assertEqual([4, 1, 1, 1, 1], [r.attempts for r in results])
+
+    def test_failures_reported(self):
+        def _create(request):
+            if request.path.endswith('d1'):
+                return 400, {'message': 'invalid inputs',
+                             'error_code': 'bad_parameters_error'}
+            if request.path.endswith('d2'):
+                return 503, {'message': 'unavailable',
+                             'error_code': 'unavailable'}, \
+                    {'Retry-After': '0.01'}
+            return 201, {'id': request.path.split('/')[-1]}
+
+        self.manager.route('PUT', '/deployments/.*', _create)
+        results = bulk.create_deployments(
+            self.client,
+            [{'blueprint_id': 'bp1', 'deployment_id': 'd{0}'.format(i)}
+             for i in range(3)],
+            retries=2)
+        self.assertEqual([results[1], results[2]], results.failed)
+        self.assertIn('invalid inputs', str(results[1].error))
+        self.assertEqual(1, results[1].attempts)
+        self.assertEqual(503, results[2].error.status_code)
+        self.assertEqual(3, results[2].attempts)
+
+    def test_start_and_wait(self):
+        self.executions.fail = ['d3']
+        results = bulk.start_executions(
+            self.client,
+            [{'deployment_id': 'd{0}'.format(i), 'workflow_id': 'install'}
+             for i in range(5)],
+            wait=True, poll_interval=0.01)
+        self.assertEqual(['terminated'] * 3 + ['failed', 'terminated'],
+                         [r.execution.status for r in results])
+        self.assertEqual([results[3]], results.failed)
+        # all the executions were polled together
+        polls = self._requests('GET', '/executions')
+        self.assertEqual(3, len(polls))
+        self.assertEqual(5, len(polls[0].query['id']))
+
+    def test_wait_timeout(self):
+        self.executions.polls = 1000
+        results = bulk.start_executions(
+            self.client, [{'deployment_id': 'd1', 'workflow_id': 'install'}],
+            wait=True, poll_interval=0.01, timeout=0.05)
+        self.assertIsInstance(results[0].error, CloudifyClientError)
+        self.assertIn('Timed out', str(results[0].error))
+
+    def test_create_and_wait(self):
+        self.manager.route('PUT', '/deployments/.*', lambda request: (
+            201, {'id': request.path.split('/')[-1]}))
+        for i in range(3):
+            self.executions.executions['env{0}'.format(i)] = {
+                'id': 'env{0}'.format(i),
+                'deployment_id': 'd{0}'.format(i),
+                'workflow_id': 'create_deployment_environment',
+                'status': 'started',
+                'polled': 0,
+            }
+        results = bulk.create_deployments(
+            self.client,
+            [{'blueprint_id': 'bp1', 'deployment_id': 'd{0}'.format(i)}
+             for i in range(3)],
+            wait=True, poll_interval=0.01)
+        self.assertEqual(['env0', 'env1', 'env2'],
+                         [r.execution.id for r in results])
+        self.assertEqual(3, len(results.succeeded))
+
+
+class BackoffTest(testtools.TestCase):
+    def test_delay(self):
+        backoff = bulk._Backoff(min_delay=1, max_delay=4)
+        with mock.patch('cloudify_rest_client.bulk.random') as random_mock:
+            random_mock.uniform.return_value = 1
+            for expected in [1, 2, 4, 4]:
+                backoff.throttled()
+                self.assertEqual(expected, backoff.delay)
+            backoff.succeeded()
+            self.assertEqual(2, backoff.delay)
+            backoff.succeeded()
+            backoff.succeeded()
+            self.assertEqual(0, backoff.delay)
+
+    def test_retry_after(self):
+        backoff = bulk._Backoff()
+        now = time.time()
+        backoff.throttled(retry_after=10)
+        self.assertGreaterEqual(backoff._until, now + 10)
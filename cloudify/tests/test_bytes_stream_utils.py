@@ -0,0 +1,289 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+
+import mock
+import testtools
+
+from cloudify_rest_client.bytes_stream_utils import (
+    FileBody,
+    ReopenableBody,
+    download_file,
+    request_data_file_stream,
+)
+from cloudify_rest_client.exceptions import (
+    CloudifyClientError,
+    ChecksumMismatchError,
+)
+
+from cloudify import cluster
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class FileBodyTest(testtools.TestCase):
+    def setUp(self):
+        super(FileBodyTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.content = os.urandom(20000)
+        self.path = os.path.join(self.tmpdir, 'archive.tar.gz')
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+
+    def test_iterate_again(self):
+        body = FileBody(self.path, buffer_size=4096)
+        self.assertEqual(20000, len(body))
+        chunks = list(body)
+        self.assertEqual(5, len(chunks))
+        self.assertEqual(self.content, b''.join(chunks))
+        self.assertEqual(self.content, b''.join(body))
+
+    def test_read_starts_over(self):
+        body = FileBody(self.path)
+        self.assertEqual(self.content[:100], body.read(100))
+        self.assertEqual(self.content[100:], body.read())
+        self.assertEqual(b'', body.read(100))
+        self.assertEqual(self.content[:100], body.read(100))
+        body.rewind()
+        self.assertEqual(self.content, body.read())
+
+    def test_offset(self):
+        body = FileBody(self.path, offset=15000)
+        self.assertEqual(5000, len(body))
+        self.assertEqual(self.content[15000:], b''.join(body))
+
+    def test_progress(self):
+        progress = []
+        body = request_data_file_stream(
+            self.path, buffer_size=8192,
+            progress_callback=lambda read, total: progress.append(
+                (read, total)))
+        list(body)
+        self.assertEqual([(8192, 20000), (16384, 20000), (20000, 20000)],
+                         progress)
+
+    def test_reopenable(self):
+        body = ReopenableBody(lambda: iter([b'a', b'b']))
+        self.assertEqual([b'a', b'b'], list(body))
+        self.assertEqual([b'a', b'b'], list(body))
+
+    def test_upload(self):
+        received = []
+
+        def _upload(request):
+            received.append(request)
+            return 201, {'id': 'p1'}
+
+        with FakeManager() as manager:
+            manager.route('POST', '/plugins', _upload)
+            manager.client().plugins.upload(self.path)
+        self.assertEqual(self.content, received[0].body)
+        self.assertEqual('20000', received[0].headers['Content-Length'])
+        self.assertIsNone(received[0].headers.get('Transfer-Encoding'))
+
+    def test_cluster_retry(self):
+        received = []
+
+        def _upload(request):
+            received.append(request.body)
+            if len(received) == 1:
+                return 502, b'bad gateway'
+            return 201, {'id': 'p1'}
+
+        with FakeManager() as manager, \
+                mock.patch.object(cluster.itertools, 'tee') as mock_tee:
+            manager.route('POST', '/plugins', _upload)
+            client = cluster.CloudifyClusterClient(
+                host=[manager.host, 'localhost'], port=manager.port)
+            client.plugins.upload(self.path)
+        self.assertEqual([self.content, self.content], received)
+        mock_tee.assert_not_called()
+
+
+class _StaticFile(object):
+    """Serves content like a static file server: with ETag and Range support
+
+    The first `drop` responses are cut off after `drop_after` bytes.
+    For each range request, the size of the file at part_path (the bytes
+    the client already wrote) is kept in `written`.
+    """
+    def __init__(self, content, etag='"v1"', drop=0, drop_after=0,
+                 part_path=None):
+        self.content = content
+        self.etag = etag
+        self.drop = drop
+        self.drop_after = drop_after
+        self.part_path = part_path
+        self.ranges = []
+        self.written = []
+
+    def __call__(self, request):
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'ETag': self.etag,
+            'Content-Disposition': 'attachment; filename=snapshot.zip',
+        }
+        status, body = 200, self.content
+        requested = request.headers.get('Range')
+        self.ranges.append(requested)
+        if requested and self.part_path:
+            self.written.append(os.path.getsize(self.part_path))
+        if_range = request.headers.get('If-Range')
+        if requested and if_range in (None, self.etag):
+            start, end = re.match(r'bytes=(\d+)-(\d*)', requested).groups()
+            end = int(end) if end else len(self.content) - 1
+            status, body = 206, self.content[int(start):end + 1]
+            headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+                start, end, len(self.content))
+        if self.drop:
+            self.drop -= 1
+            headers['Content-Length'] = str(len(body))
+            headers['Connection'] = 'close'
+            body = body[:self.drop_after]
+        return status, body, headers
+
+
+class DownloadTest(testtools.TestCase):
+    def setUp(self):
+        super(DownloadTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.client = self.manager.client()
+        self.content = os.urandom(300000)
+        self.path = os.path.join(self.tmpdir, 'snapshot.zip')
+
+    def _serve(self, **kwargs):
+        static_file = _StaticFile(self.content,
+                                  part_path=self.path + '.part', **kwargs)
+        self.manager.route('GET', '/snapshots/s1/archive', static_file)
+        return static_file
+
+    def _assert_downloaded(self):
+        with open(self.path, 'rb') as f:
+            self.assertEqual(self.content, f.read())
+        self.assertEqual([], [name for name in os.listdir(self.tmpdir)
+                              if name != 'snapshot.zip'])
+
+    def test_download(self):
+        static_file = self._serve()
+        progress = []
+        self.assertEqual(self.path, self.client.snapshots.download(
+            's1', self.tmpdir,
+            progress_callback=lambda done, total: progress.append(
+                (done, total))))
+        self._assert_downloaded()
+        self.assertEqual([None], static_file.ranges)
+        self.assertEqual((300000, 300000), progress[-1])
+
+    def _assert_resumed(self, static_file, resumes):
+        """The download was resumed `resumes` times, each time from
+        the end of what was already written
+        """
+        self.assertEqual(resumes + 1, len(static_file.ranges))
+        self.assertIsNone(static_file.ranges[0])
+        self.assertEqual(
+            ['bytes={0}-'.format(written) for written in static_file.written],
+            static_file.ranges[1:])
+        self.assertEqual(sorted(set(static_file.written)),
+                         static_file.written)
+        self.assertGreater(static_file.written[0], 0)
+
+    def test_resume_after_drop(self):
+        static_file = self._serve(drop=2, drop_after=100000)
+        self.client.snapshots.download('s1', self.path)
+        self._assert_downloaded()
+        self._assert_resumed(static_file, 2)
+
+    def test_resume_partial_file(self):
+        with open(self.path + '.part', 'wb') as f:
+            f.write(self.content[:1000])
+        with open(self.path + '.part.validator', 'w') as f:
+            f.write('"v1"')
+        static_file = self._serve()
+        self.client.snapshots.download('s1', self.path)
+        self._assert_downloaded()
+        self.assertEqual([None, 'bytes=1000-'], static_file.ranges)
+
+    def test_partial_file_changed(self):
+        with open(self.path + '.part', 'wb') as f:
+            f.write(b'x' * 1000)
+        with open(self.path + '.part.validator', 'w') as f:
+            f.write('"v0"')
+        static_file = self._serve()
+        self.client.snapshots.download('s1', self.path)
+        self._assert_downloaded()
+        self.assertEqual([None], static_file.ranges)
+
+    def test_changed_while_resuming(self):
+        static_file = _StaticFile(self.content, drop=1, drop_after=100000,
+                                  part_path=self.path + '.part')
+
+        def _changing(request):
+            response = static_file(request)
+            static_file.etag = '"v2"'
+            return response
+
+        self.manager.route('GET', '/snapshots/s1/archive', _changing)
+        self.client.snapshots.download('s1', self.path)
+        self._assert_downloaded()
+        self._assert_resumed(static_file, 1)
+
+    def test_parallel(self):
+        static_file = self._serve()
+        download_file(self.client._client, '/snapshots/s1/archive',
+                      self.path, workers=4, parallel_min_size=1)
+        self._assert_downloaded()
+        self.assertEqual(None, static_file.ranges[0])
+        self.assertEqual(
+            ['bytes=0-74999', 'bytes=150000-224999', 'bytes=225000-299999',
+             'bytes=75000-149999'], sorted(static_file.ranges[1:]))
+
+    def test_parallel_small_file(self):
+        static_file = self._serve()
+        self.client.snapshots.download('s1', self.path, workers=4)
+        self._assert_downloaded()
+        self.assertEqual([None], static_file.ranges)
+
+    def test_checksum(self):
+        self._serve()
+        checksum = 'sha256:' + hashlib.sha256(self.content).hexdigest()
+        self.client.snapshots.download('s1', self.path, checksum=checksum)
+        self._assert_downloaded()
+
+    def test_checksum_mismatch(self):
+        self._serve()
+        self.assertRaises(ChecksumMismatchError,
+                          self.client.snapshots.download, 's1', self.path,
+                          checksum='sha256:' + hashlib.sha256(b'').hexdigest())
+        self.assertEqual([], os.listdir(self.tmpdir))
+
+    def test_no_range_support(self):
+        def _no_ranges(request):
+            return 200, self.content[:100000], {
+                'Content-Length': str(len(self.content)),
+                'Connection': 'close'}
+
+        self.manager.route('GET', '/snapshots/s1/archive', _no_ranges)
+        self.assertRaises(CloudifyClientError, self.client.snapshots.download,
+                          's1', self.path)
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,304 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import time
+import random
+import functools
+import threading
+
+import mock
+import requests
+import testtools
+
+from cloudify import cluster
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class HostHealthTest(testtools.TestCase):
+    def setUp(self):
+        super(HostHealthTest, self).setUp()
+        self.now = 1000.0
+        patcher = mock.patch.object(cluster, 'time')
+        self.time = patcher.start()
+        self.time.time.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_failures(self):
+        health = cluster.HostHealth()
+        for _ in range(cluster.HEALTH_FAILURE_THRESHOLD - 1):
+            health.record_failure()
+            self.assertTrue(health.available())
+        health.record_failure()
+        self.assertEqual(cluster.HostHealth.OPEN, health.state)
+        self.assertFalse(health.available())
+
+    def test_success_resets_failures(self):
+        health = cluster.HostHealth()
+        for _ in range(cluster.HEALTH_FAILURE_THRESHOLD - 1):
+            health.record_failure()
+        health.record_success(0.1)
+        health.record_failure()
+        self.assertEqual(cluster.HostHealth.CLOSED, health.state)
+
+    def test_half_open(self):
+        health = cluster.HostHealth()
+        for _ in range(cluster.HEALTH_FAILURE_THRESHOLD):
+            health.record_failure()
+        self.now += cluster.HEALTH_COOLDOWN
+        # a single probe request is let through
+        self.assertTrue(health.available())
+        self.assertEqual(cluster.HostHealth.HALF_OPEN, health.state)
+        self.assertFalse(health.available())
+        # ...and a failed probe opens the circuit again
+        health.record_failure()
+        self.assertEqual(cluster.HostHealth.OPEN, health.state)
+        self.assertFalse(health.available())
+
+        self.now += cluster.HEALTH_COOLDOWN
+        self.assertTrue(health.available())
+        health.record_success(0.1)
+        self.assertEqual(cluster.HostHealth.CLOSED, health.state)
+        self.assertTrue(health.available())
+
+    def test_latency_average(self):
+        health = cluster.HostHealth()
+        health.record_success(1.0)
+        self.assertEqual(1.0, health.latency)
+        health.record_success(2.0)
+        self.assertAlmostEqual(1.0 + cluster.LATENCY_SMOOTHING,
+                               health.latency)
+
+
+class ClusterClientTest(testtools.TestCase):
+    def setUp(self):
+        super(ClusterClientTest, self).setUp()
+        cluster.reset_hosts_health()
+        self.addCleanup(cluster.reset_hosts_health)
+        # two managers on the same port, and a dead host: nothing
+        # listens on 127.0.0.4
+        self.managers = [FakeManager()]
+        self.port = self.managers[0].port
+        self.managers.append(FakeManager('127.0.0.3', self.port))
+        self.statuses = {}
+        self.delays = {}
+        for manager in self.managers:
+            manager.route('GET', '/blueprints/bp1',
+                          functools.partial(self._respond, manager.host))
+            manager.start()
+            self.addCleanup(manager.stop)
+        self.dead = '127.0.0.4'
+
+    def _respond(self, host, request):
+        time.sleep(self.delays.get(host, 0))
+        status = self.statuses.get(host, 200)
+        if status == 200:
+            return 200, {'id': 'bp1', 'host': host}
+        return status, b'error'
+
+    def _client(self, hosts, **kwargs):
+        return cluster.CloudifyClusterClient(
+            host=hosts, port=self.port, **kwargs)
+
+    def _health(self, host):
+        return cluster.get_host_health(host, self.port)
+
+    def _fail(self, host):
+        for _ in range(cluster.HEALTH_FAILURE_THRESHOLD):
+            self._health(host).record_failure()
+
+    def _tried_hosts(self, client, requests_count):
+        tried = []
+        do_request = cluster.HTTPClient.do_request
+
+        def _do_request(http_client, *args, **kwargs):
+            tried.append(http_client.host)
+            return do_request(http_client, *args, **kwargs)
+
+        with mock.patch.object(cluster.HTTPClient, 'do_request',
+                               _do_request):
+            for _ in range(requests_count):
+                client.blueprints.get('bp1')
+        return tried
+
+    def test_dead_host_skipped(self):
+        manager = self.managers[0]
+        client = self._client([self.dead, manager.host])
+        tried = self._tried_hosts(client, 10)
+        # once it failed, the dead host is tried only after the others
+        self.assertLessEqual(tried.count(self.dead), 1)
+        self.assertEqual(10, tried.count(manager.host))
+
+    def test_health_shared_between_clients(self):
+        self._fail(self.dead)
+        client = self._client([self.dead, self.managers[0].host])
+        self.assertEqual([self.managers[0].host],
+                         self._tried_hosts(client, 1))
+
+    def test_failing_host_recovers(self):
+        manager = self.managers[0]
+        responses = [502] * cluster.HEALTH_FAILURE_THRESHOLD
+
+        def _recovering(request):
+            if responses:
+                return responses.pop(), b'bad gateway'
+            return 200, {'id': 'bp1'}
+
+        manager.route('GET', '/blueprints/bp2', _recovering)
+        client = self._client([manager.host])
+        # a single host is retried even when its circuit is open
+        self.assertEqual('bp1', client.blueprints.get('bp2').id)
+        self.assertEqual(cluster.HostHealth.CLOSED,
+                         self._health(manager.host).state)
+
+    def test_prefers_fastest_host(self):
+        fast, slow = self.managers
+        slow.delay = 0.1
+        client = self._client([fast.host, slow.host])
+        tried = self._tried_hosts(client, 10)
+        self.assertLess(self._health(fast.host).latency,
+                        self._health(slow.host).latency)
+        self.assertLessEqual(tried.count(slow.host), 1)
+
+    def test_failover_to_slower_host(self):
+        fast, slow = self.managers
+        slow.delay = 0.1
+        client = self._client([fast.host, slow.host])
+        self._tried_hosts(client, 2)
+        self.statuses[fast.host] = 502
+        tried = self._tried_hosts(client, 5)
+        self.assertEqual(5, tried.count(slow.host))
+        self.assertLessEqual(tried.count(fast.host),
+                             cluster.HEALTH_FAILURE_THRESHOLD)
+
+    def test_stalled_host(self):
+        stalled = self.managers[0]
+        stalled.delay = 1
+        client = self._client([stalled.host], timeout=(5, 0.1))
+        self.assertRaises(requests.exceptions.ReadTimeout,
+                          client.blueprints.get, 'bp1')
+        self.assertEqual(1, self._health(stalled.host).failures)
+
+    def test_all_hosts_open(self):
+        hosts = [self.dead, '127.0.0.5']
+        for host in hosts:
+            self._fail(host)
+            time.sleep(0.01)
+        # the one that failed the longest ago
+        self.assertEqual(self.dead, cluster.choose_host(hosts, self.port))
+
+    def test_threads_use_their_own_host(self):
+        hosts = [m.host for m in self.managers]
+        self.delays = dict((host, 0.01) for host in hosts)
+        client = self._client(hosts)
+        mismatched = []
+        do_request = cluster.HTTPClient.do_request
+
+        def _do_request(http_client, *args, **kwargs):
+            sent_to = http_client.host
+            response = do_request(http_client, *args, **kwargs)
+            if not sent_to == response['host'] == http_client.host:
+                mismatched.append(sent_to)
+            return response
+
+        def _get():
+            for _ in range(5):
+                client.blueprints.get('bp1')
+
+        threads = [threading.Thread(target=_get) for _ in range(8)]
+        with mock.patch.object(cluster.HTTPClient, 'do_request',
+                               _do_request), \
+                mock.patch.object(cluster, 'choose_host',
+                                  lambda hosts, port, tried=(): random.choice(
+                                      list(hosts))):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual([], mismatched)
+
+    def _hedging_client(self, latency=0.05, **kwargs):
+        first, second = [m.host for m in self.managers]
+        # make the first manager the preferred one
+        self._health(first).record_success(0.001)
+        self._health(second).record_success(0.002)
+        hedging = cluster.Hedging(min_samples=1, **kwargs)
+        hedging.record(latency)
+        client = self._client([first, second], hedging=hedging)
+        return client, hedging
+
+    def test_hedged_get(self):
+        first, second = [m.host for m in self.managers]
+        self.delays[first] = 1
+        client, hedging = self._hedging_client(budget=1)
+        started = time.time()
+        blueprint = client.blueprints.get('bp1')
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEqual(second, blueprint['host'])
+        self.assertEqual((1, 1), (hedging.sent, hedging.won))
+
+    def test_hedging_budget(self):
+        first, second = [m.host for m in self.managers]
+        self.delays[first] = 0.2
+        client, hedging = self._hedging_client(budget=0.5)
+        # the budget allows for a hedge request on every other request
+        self.assertEqual(first, client.blueprints.get('bp1')['host'])
+        self.assertEqual(0, hedging.sent)
+        self._health(first).latency = 0.001
+        # the first response time is now the p95 to wait for
+        self.delays[first] = 1
+        self.assertEqual(second, client.blueprints.get('bp1')['host'])
+        self.assertEqual(1, hedging.sent)
+
+    def test_hedging_fast_response(self):
+        client, hedging = self._hedging_client(latency=1, budget=1)
+        self.assertEqual(self.managers[0].host,
+                         client.blueprints.get('bp1')['host'])
+        self.assertEqual(0, hedging.sent)
+
+    def test_only_get_hedged(self):
+        first = self.managers[0]
+        self.delays[first.host] = 0.2
+        first.route('PATCH', '/blueprints/bp1/set-visibility',
+                    lambda request: (200, {'id': 'bp1'}))
+        client, hedging = self._hedging_client(budget=1)
+        client.blueprints.set_visibility('bp1', 'global')
+        self.assertEqual(0, hedging.sent)
+
+
+class HedgingTest(testtools.TestCase):
+    def test_delay(self):
+        hedging = cluster.Hedging(percentile=90, min_samples=5)
+        for latency in range(1, 5):
+            hedging.record(latency / 100.0)
+        self.assertIsNone(hedging.delay())
+        for latency in range(5, 101):
+            hedging.record(latency / 100.0)
+        self.assertAlmostEqual(0.9, hedging.delay(), places=1)
+
+    def test_min_delay(self):
+        hedging = cluster.Hedging(min_samples=1, min_delay=0.5)
+        hedging.record(0.001)
+        self.assertEqual(0.5, hedging.delay())
+
+    def test_budget(self):
+        hedging = cluster.Hedging(budget=0.25, max_burst=2)
+        for _ in range(3):
+            hedging.request_started()
+        self.assertFalse(hedging.take())
+        for _ in range(100):
+            hedging.request_started()
+        self.assertTrue(hedging.take())
+        self.assertTrue(hedging.take())
+        self.assertFalse(hedging.take())
@@ -0,0 +1,113 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import re
+import json
+
+import mock
+import testtools
+
+from cloudify_rest_client import codec
+
+from cloudify import amqp_client
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class _CountingCodec(codec.JSONCodec):
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = []
+
+    def dumps(self, obj):
+        self.calls.append('dumps')
+        return super(_CountingCodec, self).dumps(obj)
+
+    def loads(self, data):
+        self.calls.append('loads')
+        return super(_CountingCodec, self).loads(data)
+
+
+class _FakeOrjson(object):
+    """Accepts only dicts with string keys, and serializes NaN and
+    infinite floats as null, like orjson does
+    """
+    def dumps(self, obj):
+        if any(not isinstance(k, str) for k in obj):
+            raise TypeError('Dict key must be str')
+        return re.sub('NaN|-?Infinity', 'null',
+                      json.dumps(obj)).encode('utf-8')
+
+    def loads(self, data):
+        if b'NaN' in data:
+            raise ValueError('unexpected character')
+        return json.loads(data.decode('utf-8'))
+
+
+class CodecTest(testtools.TestCase):
+    def setUp(self):
+        super(CodecTest, self).setUp()
+        self.codec = _CountingCodec()
+        previous = codec.set_codec(self.codec)
+        self.addCleanup(codec.set_codec, previous)
+
+    def test_json_codec(self):
+        json_codec = codec.JSONCodec()
+        data = {'a': [1, 2.5, None, True], u'\u05d0': u'\u05d1'}
+        self.assertEqual(data, json_codec.loads(json_codec.dumps(data)))
+        self.assertEqual(
+            data, json_codec.loads(json_codec.dumps(data).encode('utf-8')))
+
+    def test_orjson_fallback(self):
+        orjson_codec = codec.OrjsonCodec(_FakeOrjson())
+        self.assertEqual('{"a": 1}', orjson_codec.dumps({'a': 1}))
+        self.assertEqual('{"1": 1}', orjson_codec.dumps({1: 1}))
+        self.assertEqual({'a': 1}, orjson_codec.loads(b'{"a": 1}'))
+        self.assertEqual([1], orjson_codec.loads(b'[NaN, 1]')[1:])
+        self.assertRaises(ValueError, orjson_codec.loads, b'{')
+
+    def test_orjson_nan(self):
+        orjson_codec = codec.OrjsonCodec(_FakeOrjson())
+        self.assertEqual('{"a": NaN, "b": null}',
+                         orjson_codec.dumps({'a': float('nan'), 'b': None}))
+        self.assertEqual('{"a": [Infinity]}',
+                         orjson_codec.dumps({'a': [float('inf')]}))
+        self.assertEqual('{"a": [1.5, null]}',
+                         orjson_codec.dumps({'a': [1.5, None]}))
+
+    def test_set_codec(self):
+        self.assertIs(self.codec, codec.get_codec())
+        self.assertEqual('{"a": 1}', codec.dumps({'a': 1}))
+        self.assertEqual(['dumps'], self.codec.calls)
+        self.assertRaises(ValueError, codec.set_codec, 'unknown')
+        codec.set_codec('json')
+        self.assertIsInstance(codec.get_codec(), codec.JSONCodec)
+
+    def test_rest_client(self):
+        with FakeManager() as manager:
+            manager.route('PUT', '/secrets/s1', lambda request: (
+                200, dict(request.json(), key='s1')))
+            secret = manager.client().secrets.create('s1', 'v1')
+        self.assertEqual('v1', secret.value)
+        self.assertEqual(['dumps', 'loads'], self.codec.calls)
+
+    def test_amqp_messages(self):
+        connection = mock.Mock()
+        handler = amqp_client.SendHandler('exchange1')
+        handler._connection = connection
+        handler.publish({'a': 1})
+        self.assertEqual(['dumps'], self.codec.calls)
+        message = connection.publish.call_args[0][0]
+        self.assertEqual({'a': 1}, json.loads(message['body']))
@@ -24,6 +24,7 @@ import unittest
 import pytest
 import requests
 import testtools
+from jinja2.exceptions import SecurityError
 from mock import patch, Mock
 
 from cloudify_rest_client.exceptions import CloudifyClientError
@@ -36,9 +37,16 @@ from cloudify.manager import (
     get_resource_from_manager
 )
 from cloudify.workflows import local
-from cloudify import constants, state, context, exceptions, conflict_handlers
+from cloudify import (constants, state, context, endpoint, exceptions,
+                      conflict_handlers)
 
 from cloudify.test_utils import workflow_test
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+def _file_response(content):
+    return Mock(ok=True, status_code=200,
+                iter_content=lambda chunk_size: [content])
 
 
 class CloudifyContextTest(testtools.TestCase):
@@ -83,16 +91,16 @@ class CloudifyContextTest(testtools.TestCase):
 
     @mock.patch('cloudify.manager.get_rest_client')
     def test_get_resource(self, _):
-        with patch('requests.get',
-                   return_value=Mock(ok=True, content=b'Hello from test')):
+        with patch('requests.Session.get',
+                   return_value=_file_response(b'Hello from test')):
             resource = self.context.get_resource(
                 resource_path='for_test_bp_resource.txt')
         self.assertEquals(resource, b'Hello from test')
 
     @mock.patch('cloudify.manager.get_rest_client')
     def test_download_resource(self, _):
-        with patch('requests.get',
-                   return_value=Mock(ok=True, content=b'')) as mock_get:
+        with patch('requests.Session.get',
+                   return_value=_file_response(b'')) as mock_get:
             resource_path = self.context.download_resource(
                 resource_path='for_test.txt')
 
@@ -115,8 +123,8 @@ class CloudifyContextTest(testtools.TestCase):
     @mock.patch('cloudify.manager.get_rest_client')
     def test_download_blueprint_from_tenant(self, _):
         self.setup_tenant_context()
-        with patch('requests.get',
-                   return_value=Mock(ok=True, content=b'')) as mock_get:
+        with patch('requests.Session.get',
+                   return_value=_file_response(b'')) as mock_get:
             resource_path = self.context.download_resource(
                 resource_path='blueprint.yaml')
 
@@ -138,7 +146,7 @@ class CloudifyContextTest(testtools.TestCase):
     @mock.patch('cloudify.manager.get_rest_client')
     def test_download_resource_to_specific_file(self, _):
         target_path = "{0}/for_test_custom.log".format(create_temp_folder())
-        with patch('requests.get', return_value=Mock(ok=True, content=b'')):
+        with patch('requests.Session.get', return_value=_file_response(b'')):
             resource_path = self.context.download_resource(
                 resource_path='for_test.txt',
                 target_path=target_path)
@@ -166,7 +174,8 @@ class CloudifyContextTest(testtools.TestCase):
         filename = 'file.txt'
 
         not_found_err = exceptions.HttpException('', 404, 'Not found')
-        with mock.patch('requests.get', side_effect=not_found_err) as mock_get:
+        with mock.patch('requests.Session.get',
+                        side_effect=not_found_err) as mock_get:
             self.assertRaises(
                 exceptions.HttpException, self.context.get_resource, filename)
         self.assertEqual(len(mock_get.mock_calls), 3)
@@ -198,7 +207,7 @@ class CloudifyContextTest(testtools.TestCase):
                 'http://server1', 'http://server2']):
 
             # can't connect to any managers - thats NonRecoverable
-            with mock.patch('requests.get', side_effect=[
+            with mock.patch('requests.Session.get', side_effect=[
                 requests.ConnectionError(),
                 requests.ConnectionError(),
             ]) as mock_get:
@@ -209,34 +218,34 @@ class CloudifyContextTest(testtools.TestCase):
             assert len(mock_get.mock_calls) == 2
 
             # can't connect to the first, but second is OK
-            with mock.patch('requests.get', side_effect=[
+            with mock.patch('requests.Session.get', side_effect=[
                 requests.ConnectionError(),
-                mock.Mock(ok=True, content='content'),
+                _file_response(b'content'),
             ]) as mock_get:
                 response = get_resource_from_manager('resource.txt')
-            assert response == 'content'
+            assert response == b'content'
             assert len(mock_get.mock_calls) == 2
 
             # first is OK already, second not tried
-            with mock.patch('requests.get', side_effect=[
-                mock.Mock(ok=True, content='content'),
+            with mock.patch('requests.Session.get', side_effect=[
+                _file_response(b'content'),
             ]) as mock_get:
                 response = get_resource_from_manager('resource.txt')
-            assert response == 'content'
+            assert response == b'content'
             assert len(mock_get.mock_calls) == 1
 
             # first is 404, but second is OK. First must've not replicated
             # the files yet.
-            with mock.patch('requests.get', side_effect=[
+            with mock.patch('requests.Session.get', side_effect=[
                 mock.Mock(ok=False, status_code=404, reason='Not found'),
-                mock.Mock(ok=True, content='content'),
+                _file_response(b'content'),
             ]) as mock_get:
                 response = get_resource_from_manager('resource.txt')
-            assert response == 'content'
+            assert response == b'content'
             assert len(mock_get.mock_calls) == 2
 
             # both are 404 - the exception is reraised
-            with mock.patch('requests.get', side_effect=[
+            with mock.patch('requests.Session.get', side_effect=[
                 mock.Mock(ok=False, status_code=404, reason='Not found'),
                 mock.Mock(ok=False, status_code=404, reason='Not found'),
             ]) as mock_get:
@@ -274,7 +283,8 @@ class CloudifyContextTest(testtools.TestCase):
                 'cloudify.utils.get_manager_file_server_url', return_value=[
                     'http://server1', 'http://server2']):
 
-                with mock.patch('requests.get', side_effect=case) as mock_get:
+                with mock.patch('requests.Session.get',
+                                side_effect=case) as mock_get:
                     pytest.raises(
                         exceptions.HttpException,
                         get_resource,
@@ -524,6 +534,33 @@ class GetResourceTemplateTests(testtools.TestCase):
             rendered='extended')
 
 
+class TemplateCacheTest(testtools.TestCase):
+    def setUp(self):
+        super(TemplateCacheTest, self).setUp()
+        endpoint._templates.clear()
+        self.addCleanup(endpoint._templates.clear)
+
+    def test_cached(self):
+        template = endpoint.get_template(b'{{ a }}')
+        self.assertIs(template, endpoint.get_template(b'{{ a }}'))
+        self.assertIsNot(template, endpoint.get_template(b'{{ b }}'))
+        self.assertEqual('1', template.render({'a': 1}))
+
+    def test_bounded(self):
+        with mock.patch('cloudify.endpoint.TEMPLATE_CACHE_SIZE', 2):
+            first = endpoint.get_template(b'1')
+            endpoint.get_template(b'2')
+            # 1 was used most recently, so 2 is evicted
+            endpoint.get_template(b'1')
+            endpoint.get_template(b'3')
+            self.assertEqual(2, len(endpoint._templates))
+            self.assertIs(first, endpoint.get_template(b'1'))
+
+    def test_sandboxed(self):
+        template = endpoint.get_template(b'{{ a.__class__.__mro__ }}')
+        self.assertRaises(SecurityError, template.render, {'a': ''})
+
+
 def _context_with_endpoint(endpoint, **kwargs):
     """Get a NodeInstanceContext with the passed stub data."""
     context_kwargs = {
@@ -667,6 +704,44 @@ class TestPropertiesUpdate(testtools.TestCase):
         self.assertEqual(5, len(handler.mock_calls))
         self.assertEqual(5, len(ep.update_node_instance.mock_calls))
 
+    def test_update_conflict_merged(self):
+        """On a conflict, changes to other properties are merged."""
+        instances = [
+            NodeInstance('id', 'node_id', {'a': {'b': 1}, 'c': 1}, version=1),
+            NodeInstance('id', 'node_id', {'a': {'b': 1}, 'c': 2}, version=2),
+        ]
+
+        def mock_update(instance):
+            if instance.version < 2:
+                raise self.ERR_CONFLICT
+            self.assertEqual({'a': {'b': 5}, 'c': 2},
+                             instance.runtime_properties)
+
+        ep = mock.Mock(**{
+            'get_node_instance.side_effect': instances,
+            'update_node_instance.side_effect': mock_update
+        })
+        ctx = _context_with_endpoint(ep)
+        ctx.runtime_properties['a']['b'] = 5
+        ctx.update()
+        self.assertEqual(2, len(ep.update_node_instance.mock_calls))
+
+    def test_update_conflict_same_property(self):
+        """On a conflict, changes to the same property aren't merged."""
+        instances = [
+            NodeInstance('id', 'node_id', {'a': {'b': 1}}, version=1),
+            NodeInstance('id', 'node_id', {'a': {'b': 2}}, version=2),
+        ]
+        ep = mock.Mock(**{
+            'get_node_instance.side_effect': instances,
+            'update_node_instance.side_effect': self.ERR_CONFLICT
+        })
+        ctx = _context_with_endpoint(ep)
+        ctx.runtime_properties['a']['b'] = 5
+        e = self.assertRaises(CloudifyClientError, ctx.update)
+        self.assertEqual(409, e.status_code)
+        self.assertEqual(1, len(ep.update_node_instance.mock_calls))
+
 
 class TestPropertiesUpdateDefaultMergeHandler(unittest.TestCase):
     ERR_CONFLICT = CloudifyClientError('conflict', status_code=409)
@@ -756,6 +831,86 @@ class TestPropertiesUpdateDefaultMergeHandler(unittest.TestCase):
         self.assertEqual(2, len(ep.update_node_instance.mock_calls))
 
 
+class TestPrefetch(testtools.TestCase):
+    def setUp(self):
+        super(TestPrefetch, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.manager.route('GET', '/nodes', self._nodes)
+        self.manager.route('GET', '/node-instances/(.*)', self._node_instance)
+        self.node_instances_error = False
+
+    def _nodes(self, request):
+        items = [{'id': node_id, 'deployment_id': 'd1',
+                  'properties': {'name': node_id}}
+                 for node_id in request.query.get('id', [])]
+        return 200, {'items': items, 'metadata': {'pagination': {
+            'offset': 0, 'size': 1000, 'total': len(items)}}}
+
+    def _node_instance(self, request):
+        if self.node_instances_error:
+            return 500, {'message': 'error', 'error_code': 'internal_error'}
+        node_instance_id = request.path.split('/')[-1]
+        return 200, {'id': node_instance_id,
+                     'node_id': node_instance_id.split('_')[0],
+                     'runtime_properties': {'a': 1},
+                     'version': 1,
+                     'state': 'started',
+                     'host_id': node_instance_id}
+
+    def _context(self, context_dict):
+        ctx = context.CloudifyContext(dict(context_dict, deployment_id='d1'))
+        ctx._endpoint._rest_client = self.manager.client()
+        return ctx
+
+    def _requests(self):
+        return sorted(request.path for request in self.manager.requests)
+
+    def test_node_instance(self):
+        ctx = self._context({'node_id': 'n1_1', 'node_name': 'n1'})
+        ctx._prefetch()
+        self.assertEqual(['/node-instances/n1_1', '/nodes'],
+                         self._requests())
+        self.assertEqual({'name': 'n1'}, ctx.node.properties)
+        self.assertEqual({'a': 1}, ctx.instance.runtime_properties)
+        self.assertEqual(2, len(self.manager.requests))
+
+    def test_relationship(self):
+        ctx = self._context({
+            'node_id': 'n1_1', 'node_name': 'n1',
+            'related': {'node_id': 'n2_1', 'node_name': 'n2',
+                        'is_target': True}})
+        ctx._prefetch()
+        self.assertEqual(
+            ['/node-instances/n1_1', '/node-instances/n2_1', '/nodes'],
+            self._requests())
+        nodes_request = [request for request in self.manager.requests
+                         if request.path == '/nodes'][0]
+        self.assertEqual(['n1', 'n2'], sorted(nodes_request.query['id']))
+        self.assertEqual({'name': 'n2'}, ctx.target.node.properties)
+        self.assertEqual({'a': 1}, ctx.source.instance.runtime_properties)
+        self.assertEqual(3, len(self.manager.requests))
+
+    def test_failed(self):
+        self.node_instances_error = True
+        ctx = self._context({'node_id': 'n1_1', 'node_name': 'n1'})
+        with mock.patch.object(context.CloudifyContext, 'logger'):
+            ctx._prefetch()
+        # gotten when used instead
+        self.manager.requests[:] = []
+        self.assertEqual({'name': 'n1'}, ctx.node.properties)
+        self.assertEqual(['/nodes'], self._requests())
+
+    def test_connection_error(self):
+        ctx = self._context({'node_id': 'n1_1', 'node_name': 'n1'})
+        with mock.patch.object(context.CloudifyContext, 'logger'), \
+                mock.patch.object(ctx._endpoint, 'prefetch', side_effect=(
+                    requests.exceptions.ConnectionError('refused'))):
+            ctx._prefetch()
+        self.assertEqual({'name': 'n1'}, ctx.node.properties)
+
+
 @operation
 def get_template(ctx, testing, **_):
 
@@ -13,6 +13,11 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import os
+import sys
+import json
+import subprocess
+
 from mock import patch, MagicMock, Mock
 import testtools
 
@@ -199,6 +204,20 @@ class TestDispatchTaskHandler(testtools.TestCase):
             process_registry=process_registry)
 
 
+class TestDispatchImports(testtools.TestCase):
+    def test_operation_dispatch_does_not_import_workflows(self):
+        code = ('import sys, json; import cloudify.dispatch; '
+                'print(json.dumps(sorted(sys.modules)))')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(dispatch.__file__))))
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=root)
+        imported = set(json.loads(output.decode('utf-8')))
+        for module in ['cloudify.workflows.workflow_context', 'networkx',
+                       'pika', 'jinja2']:
+            self.assertNotIn(module, imported)
+
+
 def func1(result):
     return result
 
@@ -0,0 +1,159 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import mock
+import testtools
+
+from cloudify import constants, context, evaluation
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+def _list(items):
+    return 200, {'items': items, 'metadata': {'pagination': {
+        'offset': 0, 'size': 1000, 'total': len(items)}}}
+
+
+class _FakeDeployment(object):
+    """Serves the nodes, node instances and secrets of a deployment:
+    a web node with 2 instances, contained in a vm node with 1 instance
+    """
+    def __init__(self):
+        self.nodes = [
+            {'id': 'vm', 'deployment_id': 'd1', 'relationships': [],
+             'properties': {'port': 22}},
+            {'id': 'web', 'deployment_id': 'd1', 'properties': {},
+             'relationships': [{
+                 'target_id': 'vm',
+                 'type_hierarchy': ['cloudify.relationships.contained_in']
+             }]},
+        ]
+        self.node_instances = [
+            {'id': 'vm_1', 'node_id': 'vm', 'relationships': [],
+             'runtime_properties': {'ip': '10.0.0.1'}},
+            {'id': 'web_1', 'node_id': 'web', 'runtime_properties': {
+                'url': {'concat': ['http://', {'get_attribute': [
+                    'vm', 'ip']}]}},
+             'relationships': [{'target_name': 'vm', 'target_id': 'vm_1'}]},
+            {'id': 'web_2', 'node_id': 'web', 'runtime_properties': {},
+             'relationships': [{'target_name': 'vm', 'target_id': 'vm_1'}]},
+        ]
+
+    def get_nodes(self, request):
+        return _list([node for node in self.nodes
+                      if node['id'] in request.query.get('id', [])])
+
+    def get_node_instances(self, request):
+        ids = request.query.get('id')
+        node_ids = request.query.get('node_id')
+        return _list([
+            node_instance for node_instance in self.node_instances
+            if (not ids or node_instance['id'] in ids) and
+            (not node_ids or node_instance['node_id'] in node_ids)])
+
+    def get_secret(self, request):
+        key = request.path.split('/')[-1]
+        return 200, {'key': key, 'value': key.upper()}
+
+    def evaluate(self, request):
+        return 200, {'deployment_id': 'd1', 'context': {},
+                     'payload': {'evaluated': 'by the manager'}}
+
+
+class _EvaluationTestBase(testtools.TestCase):
+    def setUp(self):
+        super(_EvaluationTestBase, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.deployment = _FakeDeployment()
+        self.manager.route('GET', '/nodes', self.deployment.get_nodes)
+        self.manager.route('GET', '/node-instances',
+                           self.deployment.get_node_instances)
+        self.manager.route('GET', '/secrets/.*', self.deployment.get_secret)
+        self.manager.route('POST', '/evaluate/functions',
+                           self.deployment.evaluate)
+        self.client = self.manager.client()
+
+    def _paths(self):
+        return sorted(request.path for request in self.manager.requests)
+
+
+class LocalEvaluationTest(_EvaluationTestBase):
+    def test_evaluate(self):
+        payload = {
+            'ip': {'get_attribute': ['vm', 'ip']},
+            'url': {'get_attribute': ['SELF', 'url']},
+            'port': {'get_property': ['vm', 'port']},
+            'password': {'get_secret': 'password'},
+            'ips': {'get_attributes_list': ['vm', 'ip']},
+        }
+        result = evaluation.evaluate_functions(
+            self.client, 'd1', {'self': 'web_1'}, payload,
+            node_ids=['web'])
+        self.assertEqual({
+            'ip': '10.0.0.1',
+            'url': 'http://10.0.0.1',
+            'port': 22,
+            'password': 'PASSWORD',
+            'ips': ['10.0.0.1'],
+        }, result)
+        # gotten together, up front
+        self.assertEqual(
+            ['/node-instances', '/node-instances', '/nodes',
+             '/secrets/password'], self._paths())
+
+    def test_unsupported(self):
+        payload = {'a': {'get_capability': ['d2', 'cap']}}
+        self.assertRaises(
+            evaluation.EvaluateOnManager, evaluation.evaluate_functions,
+            self.client, 'd1', {}, payload)
+        self.assertEqual([], self.manager.requests)
+
+    def test_unsupported_in_runtime_properties(self):
+        self.deployment.node_instances[0]['runtime_properties']['ip'] = \
+            {'get_label': 'ip'}
+        payload = {'a': {'get_attribute': ['vm', 'ip']}}
+        self.assertRaises(
+            evaluation.EvaluateOnManager, evaluation.evaluate_functions,
+            self.client, 'd1', {}, payload)
+
+
+class EndpointEvaluationTest(_EvaluationTestBase):
+    def _evaluate(self, payload, local=True):
+        ctx = context.CloudifyContext({
+            'deployment_id': 'd1', 'node_id': 'web_1', 'node_name': 'web'})
+        ctx._endpoint._rest_client = self.client
+        with mock.patch.dict('os.environ', {
+                constants.LOCAL_EVALUATION_KEY: str(local).lower()}):
+            return ctx._endpoint.evaluate_functions(payload)
+
+    def test_local(self):
+        payload = {'a': {'get_attribute': ['SELF', 'url']}}
+        self.assertEqual({'a': 'http://10.0.0.1'}, self._evaluate(payload))
+        self.assertNotIn('/evaluate/functions', self._paths())
+        # the payload passed in is left as it was
+        self.assertEqual({'a': {'get_attribute': ['SELF', 'url']}}, payload)
+
+    def test_disabled(self):
+        payload = {'a': {'get_attribute': ['SELF', 'url']}}
+        self.assertEqual({'evaluated': 'by the manager'},
+                         self._evaluate(payload, local=False))
+        self.assertEqual(['/evaluate/functions'], self._paths())
+
+    def test_fallback(self):
+        payload = {'a': {'get_capability': ['d2', 'cap']}}
+        self.assertEqual({'evaluated': 'by the manager'},
+                         self._evaluate(payload))
+        self.assertEqual(['/evaluate/functions'], self._paths())
@@ -0,0 +1,132 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import mock
+import testtools
+
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class _FakeEvents(object):
+    """Serves /events like the REST service: filtered by execution and
+    type, in a timestamp range (inclusive), sorted, and paginated.
+    """
+    def __init__(self):
+        self.events = []
+        self.status = 'started'
+
+    def add(self, timestamp, text, event_type='cloudify_event'):
+        self.events.append({
+            'reported_timestamp': '2021-01-01T00:00:{0:06.3f}Z'.format(
+                timestamp),
+            'execution_id': 'e1',
+            'type': event_type,
+            'message': text,
+        })
+
+    def __call__(self, request):
+        events = [e for e in self.events
+                  if e['type'] in request.query.get('type', [])]
+        time_range = request.arg('_range')
+        if time_range:
+            _, start, _ = time_range.split(',')
+            events = [e for e in events if e['reported_timestamp'] >= start]
+        events.sort(key=lambda e: e['reported_timestamp'])
+        offset = int(request.arg('_offset', 0))
+        size = int(request.arg('_size', 1000))
+        return 200, {
+            'items': events[offset:offset + size],
+            'metadata': {'pagination': {
+                'offset': offset, 'size': size, 'total': len(events)}}
+        }
+
+
+class EventsTailTest(testtools.TestCase):
+    def setUp(self):
+        super(EventsTailTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.events = _FakeEvents()
+        self.manager.route('GET', '/events', self.events)
+        self.manager.route('GET', '/executions/e1', lambda request: (
+            200, {'id': 'e1', 'status': self.events.status}))
+        self.client = self.manager.client()
+
+    def _messages(self, events):
+        return [e['message'] for e in events]
+
+    def test_tail(self):
+        self.events.add(1, 'a')
+        self.events.add(2, 'b')
+        events, cursor = self.client.events.tail(execution_id='e1')
+        self.assertEqual(['a', 'b'], self._messages(events))
+        # stored with the same timestamp as the last one returned
+        self.events.add(2, 'c')
+        self.events.add(3, 'd')
+        events, cursor = self.client.events.tail(cursor, execution_id='e1')
+        self.assertEqual(['c', 'd'], self._messages(events))
+        events, _ = self.client.events.tail(cursor, execution_id='e1')
+        self.assertEqual([], events)
+
+    def test_tail_pages(self):
+        for i in range(10):
+            self.events.add(i // 2, str(i))
+        events, cursor = self.client.events.tail(batch_size=3)
+        self.assertEqual([str(i) for i in range(10)],
+                         self._messages(events))
+
+    def test_same_timestamp_over_pages(self):
+        for i in range(7):
+            self.events.add(1, str(i))
+        self.events.add(2, 'last')
+        events, cursor = self.client.events.tail(batch_size=3)
+        self.assertEqual([str(i) for i in range(7)] + ['last'],
+                         self._messages(events))
+
+    def test_include_logs(self):
+        self.events.add(1, 'event')
+        self.events.add(2, 'log', event_type='cloudify_log')
+        events, _ = self.client.events.tail()
+        self.assertEqual(['event'], self._messages(events))
+        events, _ = self.client.events.tail(include_logs=True)
+        self.assertEqual(['event', 'log'], self._messages(events))
+
+    def test_follow(self):
+        self.events.add(1, 'a')
+        # what happens during each wait between the polls
+        steps = [
+            lambda: self.events.add(2, 'b'),
+            lambda: None,
+            lambda: None,
+            lambda: self.events.add(3, 'c'),
+            lambda: setattr(self.events, 'status', 'terminated'),
+            # stored just after the execution ended
+            lambda: self.events.add(4, 'd'),
+            lambda: None,
+        ]
+        sleeps = []
+
+        def _sleep(seconds):
+            sleeps.append(seconds)
+            steps.pop(0)()
+
+        with mock.patch('cloudify_rest_client.events.time') as time_mock:
+            time_mock.sleep.side_effect = _sleep
+            events = list(self.client.events.follow(
+                'e1', poll_interval=1, max_poll_interval=3))
+        self.assertEqual(['a', 'b', 'c', 'd'], self._messages(events))
+        self.assertEqual([1, 1, 2, 3, 1, 1, 1], sleeps)
+        self.assertEqual([], steps)
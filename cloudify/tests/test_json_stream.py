@@ -0,0 +1,129 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import json
+
+import testtools
+
+from cloudify_rest_client.json_stream import iter_list_items
+from cloudify_rest_client.node_instances import NodeInstance
+from cloudify_rest_client.operations import Operation
+
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+def _chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterListItemsTest(testtools.TestCase):
+    items = [
+        {'id': u'\u05d0\u05d1', 'nested': {'a': [1, 2, {'b': None}]}},
+        12345,
+        -1.5e10,
+        'a string with "quotes", commas] and braces}',
+        [],
+        True,
+        None,
+    ]
+
+    def _decode(self, data, size, **kwargs):
+        members = {}
+        items = list(iter_list_items(
+            _chunked(data, size),
+            on_member=lambda name, value: members.update({name: value}),
+            **kwargs))
+        return items, members
+
+    def test_any_chunk_boundary(self):
+        data = json.dumps({
+            'metadata': {'pagination': {'total': 7}},
+            'items': self.items,
+            'other': 'x',
+        }, indent=2).encode('utf-8')
+        for size in range(1, 40):
+            items, members = self._decode(data, size)
+            self.assertEqual(self.items, items)
+            self.assertEqual({'metadata': {'pagination': {'total': 7}},
+                              'other': 'x'}, members)
+
+    def test_multibyte_split(self):
+        data = u'{"items": ["\u05d0\u05d1\u05d2"]}'.encode('utf-8')
+        for size in range(1, 5):
+            self.assertEqual([u'\u05d0\u05d1\u05d2'],
+                             self._decode(data, size)[0])
+
+    def test_empty(self):
+        self.assertEqual(([], {}), self._decode(b'{}', 1))
+        self.assertEqual(([], {'metadata': {}}),
+                         self._decode(b'{"items": [ ], "metadata": {}}', 3))
+
+    def test_key(self):
+        self.assertEqual(([1, 2], {'items': 'x'}), self._decode(
+            b'{"items": "x", "events": [1, 2]}', 4, key='events'))
+
+    def test_lazy(self):
+        read = []
+
+        def chunks():
+            for chunk in [b'{"items": [1', b', 2', b', 3]}']:
+                read.append(chunk)
+                yield chunk
+
+        items = iter_list_items(chunks())
+        self.assertEqual(1, next(items))
+        self.assertEqual(2, len(read))
+
+    def test_invalid(self):
+        for data in [b'[1, 2]', b'{"items": [1, 2}', b'{"items": [1, 2',
+                     b'{"items": [1 2]}', b'{"items": {}}']:
+            self.assertRaises(ValueError, self._decode, data, 2)
+
+
+class StreamedListTest(testtools.TestCase):
+    def setUp(self):
+        super(StreamedListTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.client = self.manager.client()
+
+    def test_node_instances(self):
+        instances = [{'id': 'ni_{0}'.format(i), 'runtime_properties': {
+            'index': i}} for i in range(5000)]
+        self.manager.add_list('/node-instances', instances, page_size=5000)
+        response = self.client.node_instances.list(
+            deployment_id='d1', _stream=True)
+        self.assertIsNone(response.metadata)
+        received = list(response)
+        self.assertTrue(all(isinstance(ni, NodeInstance) for ni in received))
+        self.assertEqual([ni['id'] for ni in instances],
+                         [ni.id for ni in received])
+        self.assertEqual(5000, response.metadata.pagination.total)
+        self.assertRaises(RuntimeError, list, response)
+        self.assertEqual(
+            'd1', self.manager.requests[0].arg('deployment_id'))
+
+    def test_events(self):
+        self.manager.add_list('/events', [{'message': 'm1'}])
+        events = self.client.events.list(execution_id='e1', _stream=True)
+        self.assertEqual([{'message': 'm1'}], list(events))
+
+    def test_operations(self):
+        self.manager.add_list('/operations', [{'id': 'op1'}])
+        with self.client.operations.list('g1', _stream=True) as operations:
+            received = list(operations)
+        self.assertIsInstance(received[0], Operation)
+        self.assertEqual('op1', received[0].id)
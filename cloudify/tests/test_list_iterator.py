@@ -0,0 +1,214 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import time
+import threading
+
+import testtools
+
+from cloudify_rest_client.exceptions import CloudifyClientError
+from cloudify_rest_client.node_instances import NodeInstance
+from cloudify_rest_client.responses import get_all_results
+
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class ListIteratorTest(testtools.TestCase):
+    def setUp(self):
+        super(ListIteratorTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.client = self.manager.client()
+        self.instances = [{'id': 'ni_{0}'.format(i), 'node_id': 'node'}
+                          for i in range(25)]
+        self.manager.add_list('/node-instances', self.instances,
+                              page_size=10)
+
+    def _list_requests(self):
+        return [r for r in self.manager.requests
+                if r.path == '/node-instances']
+
+    def test_iterates_all_pages(self):
+        instances = list(self.client.node_instances.iter())
+        self.assertEqual([i['id'] for i in self.instances],
+                         [i.id for i in instances])
+        self.assertTrue(all(isinstance(i, NodeInstance) for i in instances))
+        self.assertEqual(['0', '10', '20'],
+                         [r.arg('_offset') for r in self._list_requests()])
+
+    def test_fetches_lazily(self):
+        iterator = iter(self.client.node_instances.iter(_size=5))
+        for _ in range(5):
+            next(iterator)
+        self.assertEqual(1, len(self._list_requests()))
+        next(iterator)
+        self.assertEqual(2, len(self._list_requests()))
+        self.assertEqual('5', self._list_requests()[-1].arg('_size'))
+
+    def test_passes_filters(self):
+        list(self.client.node_instances.iter(deployment_id='d1'))
+        self.assertEqual('d1', self._list_requests()[0].arg('deployment_id'))
+
+    def test_resume_from_offset(self):
+        items = self.client.node_instances.iter()
+        for item in items:
+            if item.id == 'ni_12':
+                break
+        self.assertEqual(13, items.offset)
+        rest = self.client.node_instances.iter(_offset=items.offset)
+        self.assertEqual(['ni_{0}'.format(i) for i in range(13, 25)],
+                         [i.id for i in rest])
+        self.assertEqual(25, rest.metadata.pagination.total)
+
+    def test_pages_advance_offset(self):
+        items = self.client.node_instances.iter()
+        pages = items.pages()
+        self.assertEqual(10, len(next(pages)))
+        self.assertEqual(10, items.offset)
+        # items continue after the pages already returned
+        self.assertEqual(['ni_{0}'.format(i) for i in range(10, 25)],
+                         [i.id for i in items])
+        self.assertEqual(25, items.offset)
+        self.assertEqual([], list(items.pages()))
+
+    def test_stream_not_supported(self):
+        self.assertRaises(ValueError, self.client.node_instances.iter,
+                          _stream=True)
+        self.assertEqual(25, len(list(
+            self.client.node_instances.iter(_stream=False))))
+
+    def test_prefetch(self):
+        iterator = iter(self.client.node_instances.iter(_prefetch=True))
+        next(iterator)
+        # the 2nd page is being fetched in the background
+        deadline = time.time() + 5
+        while len(self._list_requests()) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(2, len(self._list_requests()))
+        self.assertEqual(24, len(list(iterator)))
+        self.assertEqual(3, len(self._list_requests()))
+
+    def test_prefetch_error(self):
+        self.manager.route('GET', '/executions', lambda request: (
+            (500, {'message': 'boom', 'error_code': 'error'})
+            if request.arg('_offset') != '0' else
+            (200, {'items': [{'id': 'e1'}], 'metadata': {
+                'pagination': {'offset': 0, 'size': 1, 'total': 2}}})
+        ))
+        iterator = iter(self.client.executions.iter(_prefetch=True))
+        self.assertEqual('e1', next(iterator).id)
+        self.assertRaises(CloudifyClientError, next, iterator)
+
+    def test_empty(self):
+        self.manager.add_list('/nodes', [])
+        self.assertEqual([], list(self.client.nodes.iter()))
+
+    def test_operations(self):
+        self.manager.add_list('/operations', [
+            {'id': 'op{0}'.format(i)} for i in range(3)], page_size=2)
+        operations = list(self.client.operations.iter('g1'))
+        self.assertEqual(['op0', 'op1', 'op2'], [op.id for op in operations])
+        self.assertEqual(
+            ['g1', 'g1'],
+            [r.arg('graph_id') for r in self.manager.requests
+             if r.path == '/operations'])
+
+
+class GetAllResultsTest(testtools.TestCase):
+    def setUp(self):
+        super(GetAllResultsTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.client = self.manager.client()
+        self.nodes = [{'id': 'node_{0}'.format(i)} for i in range(95)]
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.added = None
+        self._lock = threading.Lock()
+        self.manager.route('GET', '/nodes', self._slow_list)
+
+    def _slow_list(self, request):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        offset = int(request.arg('_offset', 0))
+        size = int(request.arg('_size', 10))
+        with self._lock:
+            self.in_flight -= 1
+        if request.arg('_get_all_results'):
+            offset, size = 0, len(self.nodes)
+        nodes = self.nodes
+        if self.added and offset > 0:
+            nodes = [self.added] + nodes
+        return 200, {
+            'items': nodes[offset:offset + size],
+            'metadata': {'pagination': {
+                'offset': offset, 'size': size, 'total': len(self.nodes)}}
+        }
+
+    def test_all_results_in_order(self):
+        nodes = get_all_results(self.client.nodes.list, deployment_id='d1',
+                                _workers=3)
+        self.assertEqual([n['id'] for n in self.nodes],
+                         [n.id for n in nodes])
+        self.assertEqual(95, nodes.metadata.pagination.total)
+        self.assertEqual(95, nodes.metadata.pagination.size)
+        self.assertEqual(10, len(self.manager.requests))
+        self.assertEqual(
+            {'d1'}, set(r.arg('deployment_id') for r in self.manager.requests))
+        self.assertEqual(3, self.max_in_flight)
+
+    def test_sorted_by_id(self):
+        get_all_results(self.client.nodes.list)
+        self.assertEqual(
+            {'id'}, set(r.arg('_sort') for r in self.manager.requests))
+        get_all_results(self.client.nodes.list, sort='deployment_id')
+        self.assertEqual('deployment_id', self.manager.requests[-1].arg(
+            '_sort'))
+
+    def test_changed_while_fetching(self):
+        # a node is added once the first page was returned, so the last
+        # node of each page is returned again at the start of the next one
+        self.added = {'id': 'node_added'}
+        nodes = get_all_results(self.client.nodes.list)
+        self.assertEqual([n['id'] for n in self.nodes],
+                         [n.id for n in nodes])
+        self.assertEqual(11, len(self.manager.requests))
+        self.assertEqual('True', self.manager.requests[-1].arg(
+            '_get_all_results'))
+
+    def test_page_size(self):
+        get_all_results(self.client.nodes.list, _size=50)
+        self.assertEqual(['0', '50'],
+                         [r.arg('_offset') for r in self.manager.requests])
+
+    def test_single_page(self):
+        del self.nodes[5:]
+        nodes = get_all_results(self.client.nodes.list)
+        self.assertEqual(5, len(nodes))
+        self.assertEqual(1, len(self.manager.requests))
+
+    def test_error(self):
+        self.manager.route('GET', '/executions', lambda request: (
+            (500, {'message': 'boom', 'error_code': 'error'})
+            if request.arg('_offset') == '2' else
+            (200, {'items': [{'id': 'e1'}, {'id': 'e2'}], 'metadata': {
+                'pagination': {'offset': 0, 'size': 2, 'total': 6}}})
+        ))
+        self.assertRaises(CloudifyClientError, get_all_results,
+                          self.client.executions.list)
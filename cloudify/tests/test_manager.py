@@ -0,0 +1,288 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+
+import mock
+import testtools
+
+from cloudify import constants, manager
+from cloudify.exceptions import (HttpException,
+                                 NonRecoverableError,
+                                 ResourceTooLargeError)
+from cloudify.resource_cache import ResourceCache
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class GetRestClientTest(testtools.TestCase):
+    def setUp(self):
+        super(GetRestClientTest, self).setUp()
+        self.execution_token = 'token1'
+        for name, value in [
+            ('get_tenant_name', lambda: 'tenant1'),
+            ('get_is_bypass_maintenance', lambda: False),
+            ('get_execution_token', lambda: self.execution_token),
+            ('get_manager_rest_service_host', lambda: ['1.1.1.1']),
+            ('get_manager_rest_service_port', lambda: 53333),
+            ('get_local_rest_certificate', lambda: '/tmp/ca.crt'),
+        ]:
+            patcher = mock.patch('cloudify.utils.{0}'.format(name), value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        manager.clear_rest_client_cache()
+        self.addCleanup(manager.clear_rest_client_cache)
+
+    def test_client_reused(self):
+        client = manager.get_rest_client()
+        self.assertIs(client, manager.get_rest_client())
+        self.assertIs(client, manager.get_rest_client(tenant='tenant1'))
+
+    def test_client_per_tenant(self):
+        client = manager.get_rest_client()
+        other = manager.get_rest_client(tenant='tenant2')
+        self.assertIsNot(client, other)
+        self.assertEqual('tenant2', other._client.headers['Tenant'])
+
+    def test_credentials_changed(self):
+        client = manager.get_rest_client()
+        self.execution_token = 'token2'
+        new_client = manager.get_rest_client()
+        self.assertIsNot(client, new_client)
+        self.assertEqual(
+            'token2',
+            new_client._client.headers[
+                constants.CLOUDIFY_EXECUTION_TOKEN_HEADER])
+
+    def test_cache_bounded(self):
+        with mock.patch('cloudify.manager.REST_CLIENT_CACHE_SIZE', 2):
+            first = manager.get_rest_client(tenant='t1')
+            manager.get_rest_client(tenant='t2')
+            # t1 was used most recently, so t2 is evicted
+            manager.get_rest_client(tenant='t1')
+            manager.get_rest_client(tenant='t3')
+            self.assertEqual(2, len(manager._rest_clients))
+            self.assertIs(first, manager.get_rest_client(tenant='t1'))
+
+
+class ResourceCacheTest(testtools.TestCase):
+    def setUp(self):
+        super(ResourceCacheTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = ResourceCache(self.directory, max_size=100)
+
+    def _objects(self):
+        return os.listdir(os.path.join(self.directory, 'objects'))
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', '"etag1"', b'content')
+        cached = self.cache.get('a')
+        self.assertEqual(('"etag1"', b'content'),
+                         (cached.etag, cached.read()))
+
+    def test_no_etag(self):
+        self.cache.put('a', None, b'content')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_content_stored_once(self):
+        self.cache.put('a', '"etag1"', b'content')
+        self.cache.put('b', '"etag2"', b'content')
+        self.assertEqual(1, len(self._objects()))
+        self.assertEqual(b'content', self.cache.get('b').read())
+
+    def test_damaged(self):
+        self.cache.put('a', '"etag1"', b'content')
+        object_path = os.path.join(
+            self.directory, 'objects', self._objects()[0])
+        with open(object_path, 'wb') as f:
+            f.write(b'conte')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_evict_least_recently_used(self):
+        for key in ['a', 'b', 'c']:
+            self.cache.put(key, '"etag"', key.encode() * 40)
+            entry_path = self.cache._entry_path(key)
+            # b is used most recently
+            mtime = {'a': 1000, 'b': 3000, 'c': 2000}[key]
+            os.utime(entry_path, (mtime, mtime))
+        self.cache.put('d', '"etag"', b'd' * 40)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('c'))
+        self.assertIsNotNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('d'))
+        self.assertEqual(2, len(self._objects()))
+
+
+class _FileServer(object):
+    """Serves files with an ETag, and 304 when it matches If-None-Match"""
+    def __init__(self):
+        self.files = {}
+        self.downloads = 0
+
+    def __call__(self, request):
+        if request.path not in self.files:
+            return 404, b'not found'
+        content = self.files[request.path]
+        etag = '"{0}"'.format(len(content))
+        if request.headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        self.downloads += 1
+        return 200, content, {'ETag': etag}
+
+
+class GetResourceCachedTest(testtools.TestCase):
+    def setUp(self):
+        super(GetResourceCachedTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.files = _FileServer()
+        self.manager.route('GET', '/resources/.*', self.files)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.client = mock.Mock()
+        self.client.blueprints.get.return_value = {
+            'visibility': 'global', 'tenant_name': 'tenant2'}
+        for patcher in [
+            mock.patch.dict(os.environ, {
+                constants.RESOURCE_CACHE_DIR_KEY: cache_dir}),
+            mock.patch('cloudify.utils.get_manager_file_server_url',
+                       lambda: ['http://{0}:{1}/resources'.format(
+                           self.manager.host, self.manager.port)]),
+            mock.patch('cloudify.utils.get_local_rest_certificate',
+                       lambda: None),
+            mock.patch('cloudify.manager.ctx',
+                       mock.Mock(execution_token='token1')),
+            mock.patch('cloudify.manager.get_rest_client',
+                       lambda: self.client),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        manager._blueprint_tenants.clear()
+        self.addCleanup(manager._blueprint_tenants.clear)
+
+    def test_cached(self):
+        self.files.files['/resources/a.txt'] = b'content1'
+        for _ in range(3):
+            self.assertEqual(
+                b'content1', manager.get_resource_from_manager('a.txt'))
+        self.assertEqual(1, self.files.downloads)
+        self.assertEqual(3, len(self.manager.requests))
+
+    def test_changed(self):
+        self.files.files['/resources/a.txt'] = b'content1'
+        manager.get_resource_from_manager('a.txt')
+        self.files.files['/resources/a.txt'] = b'new content'
+        self.assertEqual(
+            b'new content', manager.get_resource_from_manager('a.txt'))
+        self.assertEqual(2, self.files.downloads)
+
+    def test_disabled(self):
+        self.files.files['/resources/a.txt'] = b'content1'
+        with mock.patch.dict(
+                os.environ, {constants.RESOURCE_CACHE_SIZE_KEY: '0'}):
+            manager.get_resource_from_manager('a.txt')
+            manager.get_resource_from_manager('a.txt')
+        self.assertEqual(2, self.files.downloads)
+
+    def test_concurrent(self):
+        self.files.files['/resources/a.txt'] = b'content1'
+        self.manager.delay = 0.05
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            manager.get_resource_from_manager('a.txt'))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([b'content1'] * 4, results)
+        self.assertEqual(1, self.files.downloads)
+
+    def test_download(self):
+        self.files.files['/resources/a.txt'] = b'x' * 3000000
+        target_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target_dir)
+        target_path = os.path.join(target_dir, 'a.txt')
+        for _ in range(2):
+            self.assertEqual(target_path,
+                             manager.download_resource_from_manager(
+                                 'a.txt', mock.Mock(), target_path))
+            with open(target_path, 'rb') as f:
+                self.assertEqual(b'x' * 3000000, f.read())
+        self.assertEqual(1, self.files.downloads)
+        # only the downloaded file, no leftover temp files
+        self.assertEqual(['a.txt'], os.listdir(target_dir))
+
+    def test_download_not_found(self):
+        target_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target_dir)
+        self.assertRaises(
+            HttpException, manager.download_resource_from_manager,
+            'a.txt', mock.Mock(), os.path.join(target_dir, 'a.txt'))
+        self.assertEqual([], os.listdir(target_dir))
+
+    def test_memory_limit(self):
+        self.files.files['/resources/a.txt'] = b'x' * 3000000
+        with mock.patch.dict(os.environ, {
+                constants.RESOURCE_MEMORY_LIMIT_KEY: '1'}):
+            self.assertRaises(NonRecoverableError,
+                              manager.get_resource_from_manager, 'a.txt')
+            path = manager.download_resource_from_manager(
+                'a.txt', mock.Mock())
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        self.assertEqual(3000000, os.path.getsize(path))
+
+    def test_memory_limit_other_paths_not_tried(self):
+        self.files.files['/resources/deployments/tenant1/d1/a.txt'] = \
+            b'x' * 3000000
+        self.files.files['/resources/blueprints/tenant2/bp1/a.txt'] = b'a'
+        with mock.patch.dict(os.environ, {
+                constants.RESOURCE_MEMORY_LIMIT_KEY: '1'}):
+            e = self.assertRaises(ResourceTooLargeError, manager.get_resource,
+                                  'bp1', 'd1', 'tenant1', 'a.txt')
+        self.assertIn('larger than', str(e))
+        self.assertEqual(['/resources/deployments/tenant1/d1/a.txt'],
+                         [r.path for r in self.manager.requests])
+
+    def test_session_reused(self):
+        session = manager._get_file_server_session()
+        self.assertIs(session, manager._get_file_server_session())
+        with mock.patch('os.getpid', return_value=-1):
+            # in a forked child process
+            self.assertIsNot(session, manager._get_file_server_session())
+
+    def test_blueprint_tenant_looked_up_once(self):
+        self.files.files['/resources/blueprints/tenant2/bp1/a.txt'] = b'a'
+        self.files.files['/resources/blueprints/tenant2/bp1/b.txt'] = b'b'
+        for path in ['a.txt', 'b.txt', 'a.txt']:
+            manager.get_resource('bp1', 'd1', 'tenant1', path)
+        self.assertEqual(1, self.client.blueprints.get.call_count)
+
+    def test_blueprint_tenant_changed(self):
+        self.files.files['/resources/blueprints/tenant2/bp1/a.txt'] = b'a'
+        manager.get_resource('bp1', 'd1', 'tenant1', 'a.txt')
+        # the blueprint was deleted, and uploaded again by tenant3
+        del self.files.files['/resources/blueprints/tenant2/bp1/a.txt']
+        self.files.files['/resources/blueprints/tenant3/bp1/a.txt'] = b'b'
+        self.client.blueprints.get.return_value = {
+            'visibility': 'global', 'tenant_name': 'tenant3'}
+        for _ in range(2):
+            self.assertEqual(
+                b'b', manager.get_resource('bp1', 'd1', 'tenant1', 'a.txt'))
+        self.assertEqual(2, self.client.blueprints.get.call_count)
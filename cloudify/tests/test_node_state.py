@@ -121,3 +121,51 @@ class NodeStateTest(testtools.TestCase):
             self.fail(
                 'Error should be raised when assigning runtime_properties '
                 'with the modifiable flag set to False')
+
+    def test_nested_change_makes_properties_dirty(self):
+        node = NodeInstance('instance_id', 'node_id',
+                            runtime_properties={'a': {'b': [1]}})
+        node.runtime_properties['a']['b'].append(2)
+        self.assertTrue(node.dirty)
+
+    def test_runtime_properties_patch(self):
+        node = NodeInstance('instance_id', 'node_id', runtime_properties={
+            'a': {'b': 1, 'c': 2, 'd': {'e': 1}},
+            'f': [1],
+            'g': 1,
+        })
+        self.assertEqual([], node.runtime_properties_patch)
+        node.runtime_properties['a']['b'] = 5
+        del node.runtime_properties['a']['c']
+        node.runtime_properties['a']['d']['x'] = 1
+        node.runtime_properties['f'].append(2)
+        node.runtime_properties['g'] = True
+        self.assertEqual(sorted([
+            ('set', ('a', 'b'), 5),
+            ('delete', ('a', 'c')),
+            ('set', ('a', 'd', 'x'), 1),
+            ('set', ('f',), [1, 2]),
+            ('set', ('g',), True),
+        ], key=repr), sorted(node.runtime_properties_patch, key=repr))
+
+    def test_rebase(self):
+        node = NodeInstance('instance_id', 'node_id', runtime_properties={
+            'a': {'b': 1, 'c': 1}, 'd': 1})
+        node.runtime_properties['a']['b'] = 2
+        node.runtime_properties['e'] = 1
+        latest = NodeInstance('instance_id', 'node_id', runtime_properties={
+            'a': {'b': 1, 'c': 5}, 'f': 1}, version=2)
+        self.assertTrue(node.rebase(latest))
+        self.assertEqual({'a': {'b': 2, 'c': 5}, 'e': 1, 'f': 1},
+                         latest.runtime_properties)
+        self.assertTrue(latest.dirty)
+
+    def test_rebase_overlapping(self):
+        node = NodeInstance('instance_id', 'node_id', runtime_properties={
+            'a': {'b': 1}})
+        node.runtime_properties['a']['b'] = 2
+        for stored in [{'a': {'b': 3}}, {'a': 1}, {}]:
+            latest = NodeInstance('instance_id', 'node_id',
+                                  runtime_properties=stored, version=2)
+            self.assertFalse(node.rebase(latest))
+            self.assertEqual(stored, latest.runtime_properties)
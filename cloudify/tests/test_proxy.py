@@ -15,10 +15,13 @@
 
 
 import os
+import json
 import threading
 import time
 import sys
+import subprocess
 
+import mock
 import testtools
 from pytest import mark
 
@@ -192,6 +195,72 @@ class CtxProxyTestBase(object):
         response = self.request(*args)
         self.assertEqual(args[1:], response)
 
+    def test_batch(self):
+        connection = client.Connection(self.server.socket_url)
+        self.addCleanup(connection.close)
+        responses = connection.batch([
+            ['node', 'properties', 'prop4.key', 'new_value'],
+            ['node', 'properties', 'prop4.key'],
+            ['property_that_does_not_exist'],
+            ['node', 'properties', 'prop1'],
+        ])
+        # not processed after the error
+        self.assertEqual(3, len(responses))
+        self.assertEqual('new_value', client.get_payload(responses[1]))
+        self.assertRaises(client.RequestError,
+                          client.get_payload, responses[2])
+
+    def test_connection_reused(self):
+        connection = client.Connection(self.server.socket_url)
+        self.addCleanup(connection.close)
+        for _ in range(3):
+            self.assertEqual('value1', connection.request(
+                ['node', 'properties', 'prop1']))
+
+    def test_batch_cli(self):
+        stdin = StringIO(u'node properties prop1\n'
+                         u'\n'
+                         u'["stub_method", 1, 2]\n'
+                         u'stub-method @[1] a\n')
+        stdout = StringIO()
+        with mock.patch('sys.stdin', stdin), \
+                mock.patch('sys.stdout', stdout):
+            client.main(['--batch', '-j',
+                         '--socket-url', self.server.socket_url])
+        self.assertEqual('"value1"\n[1, 2]\n[[1], "a"]\n',
+                         stdout.getvalue())
+
+    def test_batch_cli_one_line_per_result(self):
+        stdin = StringIO(u'["stub_method", "a\\nb"]\n'
+                         u'node properties prop1\n')
+        stdout = StringIO()
+        with mock.patch('sys.stdin', stdin), \
+                mock.patch('sys.stdout', stdout):
+            # JSON even without -j
+            client.main(['--batch', '--socket-url', self.server.socket_url])
+        self.assertEqual('["a\\nb"]\n"value1"\n', stdout.getvalue())
+
+    @mark.skipif(IS_WINDOWS, reason='Test skipped on Windows')
+    def test_daemon(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(client.__file__))))
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'cloudify.proxy.client', '--daemon',
+             '--socket-url', self.server.socket_url], cwd=root)
+        requests_path, responses_path = output.decode('utf-8').split()
+        responses = []
+        with open(requests_path, 'w') as requests_file:
+            with open(responses_path) as responses_file:
+                for request in ['node properties prop1',
+                                'stub-method \'a b\' @[1]',
+                                'property_that_does_not_exist']:
+                    requests_file.write(request + '\n')
+                    requests_file.flush()
+                    responses.append(responses_file.readline())
+        self.assertEqual('ok "value1"\n', responses[0])
+        self.assertEqual('ok ["a b", [1]]\n', responses[1])
+        self.assertTrue(responses[2].startswith('error RuntimeError: '))
+
 
 @mark.skipif(IS_WINDOWS, reason='Test skipped on Windows')
 class TestUnixCtxProxy(CtxProxyTestBase, testtools.TestCase):
@@ -408,3 +477,30 @@ class TestPathDictAccess(testtools.TestCase):
         obj = {}
         path_dict = PathDictAccess(obj)
         self.assertRaises(RuntimeError, path_dict.get, 'foo[1]')
+
+
+class TestClientImports(testtools.TestCase):
+    """The ctx client is started for every `ctx` call, keep it light."""
+
+    heavy_modules = [
+        'requests',
+        'pika',
+        'jinja2',
+        'bottle',
+        'zmq',
+        'ssl',
+        'cloudify_rest_client',
+        'cloudify.manager',
+        'cloudify.workflows',
+    ]
+
+    def test_client_import_set(self):
+        code = ('import sys, json; import cloudify.proxy.client; '
+                'print(json.dumps(sorted(sys.modules)))')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(client.__file__))))
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=root)
+        imported = set(json.loads(output.decode('utf-8')))
+        self.assertEqual(
+            [], [m for m in self.heavy_modules if m in imported])
@@ -0,0 +1,91 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import json
+import zlib
+
+import testtools
+
+from cloudify_rest_client.client import COMPRESS_MIN_SIZE
+
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class RequestCompressionTest(testtools.TestCase):
+    def setUp(self):
+        super(RequestCompressionTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.manager.route('PUT', '/secrets/s1', lambda request: (
+            200, dict(request.json(), key='s1')))
+        self.big_value = 'x' * COMPRESS_MIN_SIZE
+
+    def _received(self):
+        return self.manager.requests[-1]
+
+    def test_compressed(self):
+        client = self.manager.client(compress_requests=True)
+        secret = client.secrets.create('s1', self.big_value)
+        self.assertEqual(self.big_value, secret.value)
+        request = self._received()
+        self.assertEqual('gzip', request.headers['Content-Encoding'])
+        self.assertLess(len(request.body), 1000)
+
+    def test_small_body_not_compressed(self):
+        client = self.manager.client(compress_requests=True)
+        client.secrets.create('s1', 'small')
+        self.assertIsNone(self._received().headers.get('Content-Encoding'))
+
+    def test_threshold(self):
+        client = self.manager.client(compress_requests=10)
+        client.secrets.create('s1', 'small value')
+        self.assertEqual('gzip',
+                         self._received().headers.get('Content-Encoding'))
+
+    def test_not_compressed_by_default(self):
+        self.manager.client().secrets.create('s1', self.big_value)
+        self.assertIsNone(self._received().headers.get('Content-Encoding'))
+
+    def test_unsupported(self):
+        def _no_gzip(request):
+            if request.headers.get('Content-Encoding'):
+                return 415, {'message': 'Unsupported Media Type',
+                             'error_code': 'unsupported_media_type'}
+            return 200, dict(request.json(), key='s2')
+
+        self.manager.route('PUT', '/secrets/s2', _no_gzip)
+        client = self.manager.client(compress_requests=True)
+        for _ in range(2):
+            secret = client.secrets.create('s2', self.big_value)
+            self.assertEqual(self.big_value, secret.value)
+        self.assertEqual(
+            ['gzip', None, None],
+            [r.headers.get('Content-Encoding')
+             for r in self.manager.requests])
+
+    def test_compressed_response(self):
+        instances = [{'id': 'ni{0}'.format(i), 'runtime_properties': {}}
+                     for i in range(5000)]
+        body = json.dumps({'items': instances, 'metadata': {'pagination': {
+            'offset': 0, 'size': 5000, 'total': 5000}}}).encode('utf-8')
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compressed = compressor.compress(body) + compressor.flush()
+        self.manager.route('GET', '/node-instances', lambda request: (
+            200, compressed, {'Content-Encoding': 'gzip',
+                              'Content-Type': 'application/json'}))
+        listed = self.manager.client().node_instances.list()
+        self.assertEqual(5000, len(listed))
+        self.assertIn('gzip', self._received().headers['Accept-Encoding'])
@@ -0,0 +1,141 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import logging
+
+import requests
+import testtools
+
+from cloudify_rest_client import CloudifyClient
+from cloudify_rest_client.exceptions import CloudifyClientError
+from cloudify_rest_client.hooks import RequestHooks, endpoint_template
+
+from cloudify import cluster
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class _Recorder(RequestHooks):
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, request):
+        self.calls.append(('before', request.method, request.endpoint))
+
+    def after_response(self, request):
+        self.calls.append(('after', request))
+
+    def on_retry(self, request, error):
+        self.calls.append(('retry', request))
+
+
+class RequestHooksTest(testtools.TestCase):
+    def setUp(self):
+        super(RequestHooksTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.hooks = _Recorder()
+        self.client = self.manager.client(hooks=[self.hooks])
+        self.addCleanup(cluster.reset_hosts_health)
+
+    def test_endpoint_template(self):
+        for uri, template in [
+            ('/blueprints', '/blueprints'),
+            ('/blueprints/bp1', '/blueprints/{id}'),
+            ('/deployments/d1/outputs', '/deployments/{id}/outputs'),
+            ('/deployment-updates/u1/update/initiate',
+             '/deployment-updates/{id}/update/initiate'),
+            ('/searches/deployments', '/searches/deployments'),
+            ('/users/unlock/u1', '/users/unlock/{id}'),
+            ('/labels/deployments/env', '/labels/deployments/{id}'),
+        ]:
+            self.assertEqual(template, endpoint_template(uri))
+
+    def test_request(self):
+        self.manager.route('PUT', '/secrets/s1', lambda request: (
+            200, dict(request.json(), key='s1', padding='x' * 1000)))
+        self.client.secrets.create('s1', 'v1')
+        before, (_, request) = self.hooks.calls
+        self.assertEqual(('before', 'PUT', '/secrets/{id}'), before)
+        self.assertEqual(200, request.status_code)
+        self.assertEqual(self.manager.host, request.host)
+        self.assertEqual(len(self.manager.requests[0].body),
+                         request.bytes_sent)
+        self.assertGreater(request.bytes_received, 1000)
+        self.assertGreater(request.latency, 0)
+        self.assertEqual(0, request.retries)
+
+    def test_error_status(self):
+        self.assertRaises(CloudifyClientError,
+                          self.client.blueprints.get, 'bp1')
+        _, (_, request) = self.hooks.calls
+        self.assertEqual(404, request.status_code)
+
+    def test_connection_error(self):
+        # nothing listens on 127.0.0.2
+        client = CloudifyClient(host='127.0.0.2', port=self.manager.port,
+                                hooks=[self.hooks])
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          client.blueprints.get, 'bp1')
+        _, (_, request) = self.hooks.calls
+        self.assertIsNone(request.status_code)
+        self.assertIsInstance(request.error,
+                              requests.exceptions.ConnectionError)
+
+    def test_streamed(self):
+        self.manager.route('GET', '/blueprints/bp1/archive', lambda request: (
+            200, b'x' * 5000,
+            {'Content-Disposition': 'attachment; filename=bp1.tar.gz'}))
+        response = self.client._client.get(
+            '/blueprints/bp1/archive', stream=True)
+        _, (_, request) = self.hooks.calls
+        self.assertEqual(5000, request.bytes_received)
+        self.assertEqual(5000, len(b''.join(response.bytes_stream())))
+
+    def test_cluster_retry(self):
+        self.manager.route('GET', '/blueprints/bp1', lambda request: (
+            200, {'id': 'bp1'}))
+        # nothing listens on 127.0.0.2
+        client = cluster.CloudifyClusterClient(
+            host=['127.0.0.2', self.manager.host], port=self.manager.port,
+            hooks=[self.hooks])
+        cluster.get_host_health(self.manager.host, self.manager.port) \
+            .record_failure()
+        client.blueprints.get('bp1')
+        self.assertEqual(
+            ['before', 'after', 'retry', 'before', 'after'],
+            [call[0] for call in self.hooks.calls])
+        failed, retry, succeeded = [
+            call[1] for call in self.hooks.calls if call[0] != 'before']
+        self.assertEqual('127.0.0.2', failed.host)
+        self.assertEqual('127.0.0.2', retry.host)
+        self.assertEqual((0, 1), (failed.retries, succeeded.retries))
+        self.assertEqual(200, succeeded.status_code)
+
+    def test_debug_log_truncated(self):
+        self.manager.route('GET', '/blueprints/bp1', lambda request: (
+            200, {'id': 'bp1', 'description': 'x' * 100000}))
+        logger = logging.getLogger('cloudify.rest_client.http')
+        messages = []
+        handler = logging.Handler()
+        handler.emit = lambda record: messages.append(record.getMessage())
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.DEBUG)
+        self.client.blueprints.get('bp1')
+        reply = [m for m in messages if m.startswith('reply')][0]
+        self.assertLess(len(reply), 2000)
+        self.assertIn('bytes)', reply)
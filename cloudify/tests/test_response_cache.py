@@ -0,0 +1,124 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import mock
+import testtools
+
+from cloudify_rest_client.cache import MISS, ResponseCache
+
+from cloudify.tests.mocks.fake_manager import FakeManager
+
+
+class ResponseCacheTest(testtools.TestCase):
+    def setUp(self):
+        super(ResponseCacheTest, self).setUp()
+        self.manager = FakeManager()
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        self.cache = ResponseCache()
+        self.client = self.manager.client(cache=self.cache)
+        self.blueprint = {'id': 'bp1', 'description': 'first'}
+        self.manager.route('GET', '/blueprints/bp1', self._get_blueprint)
+        self.manager.route('PATCH', '/blueprints/bp1',
+                           lambda request: (200, self.blueprint))
+        self.manager.add_list('/node-instances', [{'id': 'ni1'}])
+
+    def _get_blueprint(self, request):
+        etag = '"{0}"'.format(self.blueprint['description'])
+        if request.headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, dict(self.blueprint), {'ETag': etag}
+
+    def _requests(self, method, path):
+        return [r for r in self.manager.requests
+                if r.method == method and r.path == path]
+
+    def test_cache_hit(self):
+        for _ in range(2):
+            blueprint = self.client.blueprints.get('bp1')
+            self.assertEqual('first', blueprint.description)
+        self.assertEqual(1, len(self._requests('GET', '/blueprints/bp1')))
+        self.assertEqual(1, self.cache.stats['hits'])
+        self.assertEqual(1, self.cache.stats['misses'])
+
+    def test_returns_copy(self):
+        blueprint = self.client.blueprints.get('bp1')
+        blueprint['description'] = 'changed'
+        blueprint = self.client.blueprints.get('bp1')
+        self.assertEqual('first', blueprint.description)
+
+    def test_revalidate_expired(self):
+        self.client.blueprints.get('bp1')
+        with mock.patch('cloudify_rest_client.cache.time') as time_mock:
+            time_mock.time.return_value = 10 ** 10
+            blueprint = self.client.blueprints.get('bp1')
+        self.assertEqual('first', blueprint.description)
+        requests = self._requests('GET', '/blueprints/bp1')
+        self.assertEqual(2, len(requests))
+        self.assertIsNone(requests[0].headers.get('If-None-Match'))
+        self.assertEqual('"first"',
+                         requests[1].headers.get('If-None-Match'))
+        self.assertEqual(1, self.cache.stats['revalidations'])
+
+    def test_revalidate_evicted(self):
+        def _evicted(key):
+            self.cache.invalidate()
+            return MISS
+
+        self.client.blueprints.get('bp1')
+        with mock.patch('cloudify_rest_client.cache.time') as time_mock, \
+                mock.patch.object(self.cache, 'revalidated', _evicted):
+            time_mock.time.return_value = 10 ** 10
+            blueprint = self.client.blueprints.get('bp1')
+        self.assertEqual('first', blueprint.description)
+        requests = self._requests('GET', '/blueprints/bp1')
+        self.assertEqual(3, len(requests))
+        self.assertIsNone(requests[2].headers.get('If-None-Match'))
+
+    def test_write_invalidates(self):
+        self.client.blueprints.get('bp1')
+        self.blueprint['description'] = 'second'
+        self.client.blueprints.update('bp1', {'description': 'second'})
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual('second',
+                         self.client.blueprints.get('bp1').description)
+
+    def test_uncached_uri(self):
+        self.client.node_instances.list()
+        self.client.node_instances.list()
+        self.assertEqual(2, len(self._requests('GET', '/node-instances')))
+        self.assertEqual(0, len(self.cache))
+
+    def test_no_cache(self):
+        client = self.manager.client()
+        client.blueprints.get('bp1')
+        client.blueprints.get('bp1')
+        self.assertEqual(2, len(self._requests('GET', '/blueprints/bp1')))
+
+    def test_max_entries(self):
+        cache = ResponseCache(max_entries=2)
+        for uri in ['/blueprints/a', '/blueprints/b', '/blueprints/c']:
+            cache.store((uri, uri), {'id': uri})
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.stats['evictions'])
+        self.assertIsNone(cache.etag(('/blueprints/a', '/blueprints/a')))
+
+    def test_ttl_prefix(self):
+        cache = ResponseCache(ttls={'/deployments': 10,
+                                    '/deployments/d1/outputs': 1})
+        self.assertEqual(10, cache.ttl('/deployments'))
+        self.assertEqual(10, cache.ttl('/deployments/d1'))
+        self.assertEqual(1, cache.ttl('/deployments/d1/outputs'))
+        self.assertIsNone(cache.ttl('/deployment-groups'))
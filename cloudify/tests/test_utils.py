@@ -14,9 +14,11 @@
 #    * limitations under the License.
 
 import os
+import gzip
 import mock
 import shutil
 import logging
+import tarfile
 import tempfile
 from testtools import TestCase
 from datetime import datetime, timedelta
@@ -213,6 +215,129 @@ class TestRestUtils(object):
         shutil.rmtree(temp_dir)
 
 
+class TestBlueprintArchive(TestCase):
+    def setUp(self):
+        super(TestBlueprintArchive, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.blueprint_dir = os.path.join(self.tmpdir, 'bp')
+        os.makedirs(os.path.join(self.blueprint_dir, 'scripts', 'empty'))
+        self.files = {
+            'blueprint.yaml': b'tosca_definitions_version: x\n',
+            'scripts/configure.sh': os.urandom(3 * 1024 * 1024),
+        }
+        for name, content in self.files.items():
+            with open(os.path.join(self.blueprint_dir, name), 'wb') as f:
+                f.write(content)
+        self.blueprint_path = os.path.join(
+            self.blueprint_dir, 'blueprint.yaml')
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+
+    def _archive(self, **kwargs):
+        dest_dir = tempfile.mkdtemp(dir=self.tmpdir)
+        return rest_utils.tar_blueprint(
+            self.blueprint_path, dest_dir, **kwargs)
+
+    def test_archive(self):
+        tar_path = self._archive(workers=4)
+        with tarfile.open(tar_path) as tar:
+            members = dict((m.name, m) for m in tar.getmembers())
+            self.assertEqual([
+                'blueprint',
+                'blueprint/blueprint.yaml',
+                'blueprint/scripts',
+                'blueprint/scripts/configure.sh',
+                'blueprint/scripts/empty',
+            ], sorted(members))
+            for name, content in self.files.items():
+                self.assertEqual(
+                    content, tar.extractfile('blueprint/' + name).read())
+        self.assertTrue(members['blueprint/scripts'].mode & 0o001)
+
+    def test_gzip_members(self):
+        data = os.urandom(100) * 50000
+        path = os.path.join(self.tmpdir, 'data.gz')
+        with open(path, 'wb') as f:
+            with rest_utils.ParallelGzipWriter(
+                    f, workers=3, block_size=65536) as gz:
+                for offset in range(0, len(data), 10000):
+                    gz.write(data[offset:offset + 10000])
+        with gzip.open(path) as f:
+            self.assertEqual(data, f.read())
+
+    def test_empty_gzip(self):
+        path = os.path.join(self.tmpdir, 'empty.gz')
+        with open(path, 'wb') as f:
+            rest_utils.ParallelGzipWriter(f).close()
+        with gzip.open(path) as f:
+            self.assertEqual(b'', f.read())
+
+    def test_scan_folder(self):
+        folder = rest_utils.scan_folder(self.blueprint_dir)
+        self.assertEqual(4, folder.files)
+        self.assertEqual(
+            ['blueprint.yaml', 'scripts', os.path.join('scripts',
+                                                       'configure.sh'),
+             os.path.join('scripts', 'empty')],
+            [entry.relpath for entry in folder.entries])
+
+    def test_cache(self):
+        first = self._archive(cache_dir=self.cache_dir)
+        with mock.patch.object(rest_utils, 'ParallelGzipWriter') as writer:
+            second = self._archive(cache_dir=self.cache_dir)
+        writer.assert_not_called()
+        with open(first, 'rb') as f1, open(second, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_cache_changed(self):
+        self._archive(cache_dir=self.cache_dir)
+        with open(os.path.join(self.blueprint_dir, 'new.yaml'), 'w') as f:
+            f.write('x')
+        tar_path = self._archive(cache_dir=self.cache_dir)
+        with tarfile.open(tar_path) as tar:
+            self.assertIn('blueprint/new.yaml', tar.getnames())
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+    def test_cache_changed_same_size_and_mtime(self):
+        self._archive(cache_dir=self.cache_dir)
+        path = os.path.join(self.blueprint_dir, 'blueprint.yaml')
+        st = os.stat(path)
+        with open(path, 'wb') as f:
+            f.write(b'tosca_definitions_version: y\n')
+        # like `cp -p`: same size, and the mtime restored
+        os.utime(path, (st.st_atime, st.st_mtime))
+        tar_path = self._archive(cache_dir=self.cache_dir)
+        with tarfile.open(tar_path) as tar:
+            self.assertEqual(b'tosca_definitions_version: y\n',
+                             tar.extractfile('blueprint/blueprint.yaml')
+                             .read())
+
+    def test_cache_not_changed_by_destination(self):
+        first = self._archive(cache_dir=self.cache_dir)
+        with open(first, 'rb') as f:
+            content = f.read()
+        second = self._archive(cache_dir=self.cache_dir)
+        with open(second, 'r+b') as f:
+            f.write(b'x' * 10)
+        third = self._archive(cache_dir=self.cache_dir)
+        with open(third, 'rb') as f:
+            self.assertEqual(content, f.read())
+
+    def test_cache_from_env(self):
+        with mock.patch.dict(os.environ, {
+                rest_utils.ARCHIVE_CACHE_ENV: self.cache_dir}):
+            self._archive()
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+    def test_cache_eviction(self):
+        cache = rest_utils.ArchiveCache(self.cache_dir, max_entries=2)
+        archive = self._archive()
+        for key in ['a', 'b', 'c']:
+            cache.put(key, archive)
+        self.assertEqual(['b.tar.gz', 'c.tar.gz'],
+                         sorted(os.listdir(self.cache_dir)))
+
+
 class TestDateTimeUtils(TestCase):
     def test_parse_utc_datetime(self):
         parsed_datetime = utils.parse_utc_datetime("1905-6-13 12:00", "GMT")
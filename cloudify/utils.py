@@ -18,8 +18,6 @@ import re
 import ssl
 import sys
 import time
-import pytz
-import pika
 import shlex
 import random
 import string
@@ -42,7 +40,6 @@ from cloudify import constants
 from cloudify.state import workflow_parameters, workflow_ctx, ctx
 from cloudify._compat import StringIO, parse_version
 from cloudify.constants import SUPPORTED_ARCHIVE_TYPES
-from cloudify.amqp_client import BlockingRequestResponseHandler
 from cloudify.exceptions import CommandExecutionException, NonRecoverableError
 
 ENV_CFY_EXEC_TEMPDIR = 'CFY_EXEC_TEMP'
@@ -609,6 +606,7 @@ def is_agent_alive(name,
     :param connect: whether to connect the client (should be False if it is
                     already connected)
     """
+    from cloudify.amqp_client import BlockingRequestResponseHandler
     handler = BlockingRequestResponseHandler(name)
     client.add_handler(handler)
     if connect:
@@ -620,6 +618,7 @@ def is_agent_alive(name,
 
 
 def _send_ping_task(name, handler, timeout=INSPECT_TIMEOUT):
+    import pika
     logger = setup_logger('cloudify.utils.is_agent_alive')
     task = {
         'service_task': {
@@ -978,6 +977,7 @@ def parse_utc_datetime_absolute(time_expression, timezone=None):
         return None
     date_time = parse_schedule_datetime_string(time_expression)
     if timezone:
+        import pytz
         if timezone not in pytz.all_timezones:
             raise NonRecoverableError(
                 "{} is not a recognized timezone".format(timezone))
@@ -60,6 +60,8 @@ from cloudify.logs import (CloudifyWorkflowLoggingHandler,
 from cloudify.models_states import DeploymentModificationState
 
 from cloudify.utils import is_agent_alive
+from cloudify_rest_client import codec
+from cloudify_rest_client.responses import get_all_results
 
 
 try:
@@ -1030,11 +1032,10 @@ class CloudifySystemWideWorkflowContext(_WorkflowContextBase):
         if self._dep_contexts is None:
             self._dep_contexts = {}
 
-            deployments_list = \
-                self.internal.handler.rest_client.deployments.list(
-                    _include=['id', 'blueprint_id'],
-                    _get_all_results=True
-                )
+            deployments_list = get_all_results(
+                self.internal.handler.rest_client.deployments.list,
+                _include=['id', 'blueprint_id'],
+            )
             for dep in deployments_list:
                 # Failure to deepcopy will cause snapshot restore context hack
                 # to be reset just before it's needed.
@@ -1211,7 +1212,7 @@ class _WorkflowTaskHandler(object):
 
     def process(self, channel, method, properties, body):
         try:
-            response = json.loads(body.decode('utf-8'))
+            response = codec.loads(body)
         except ValueError:
             self._logger.error('Error parsing response: %s', body)
             channel.basic_ack(method.delivery_tag)
@@ -1233,7 +1234,7 @@ class _WorkflowTaskHandler(object):
                 routing_key=self._queue_name)
         self._connection.publish({
             'exchange': target,
-            'body': json.dumps(message),
+            'body': codec.dumps(message),
             'properties': pika.BasicProperties(
                 reply_to=self._queue_name,
                 correlation_id=correlation_id),
@@ -1483,17 +1484,7 @@ class RemoteContextHandler(CloudifyWorkflowContextHandler):
                                  logger=logger)
 
     def get_operations(self, graph_id):
-        ops = []
-        offset = 0
-        while True:
-            operations = self.rest_client.operations.list(
-                graph_id, _offset=offset)
-            ops += operations.items
-            if len(ops) < operations.metadata.pagination.total:
-                offset += operations.metadata.pagination.size
-            else:
-                break
-        return ops
+        return list(self.rest_client.operations.iter(graph_id))
 
     def update_operation(self, operation_id, state,
                          result=None, exception=None):
@@ -1546,9 +1537,9 @@ class RemoteContextHandler(CloudifyWorkflowContextHandler):
             # deployment environment creation had a really bad time.
             return []
         dep = self.workflow_ctx.deployment
-        return self.rest_client.nodes.list(
+        return get_all_results(
+            self.rest_client.nodes.list,
             deployment_id=dep.id,
-            _get_all_results=True,
             evaluate_functions=dep.runtime_only_evaluation
         )
 
@@ -1557,9 +1548,9 @@ class RemoteContextHandler(CloudifyWorkflowContextHandler):
                                              'delete_deployment_environment'):
             return []
         dep = self.workflow_ctx.deployment
-        return self.rest_client.node_instances.list(
+        return get_all_results(
+            self.rest_client.node_instances.list,
             deployment_id=dep.id,
-            _get_all_results=True,
         )
 
     def get_plugin(self, plugin):
@@ -0,0 +1,24 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# The asyncio REST client. Python 3 only, and requires aiohttp
+# (the "async" extra), so it is not part of cloudify_rest_client,
+# which also supports python 2. The endpoint methods still run in
+# threads; see the client module.
+
+from cloudify_async_client.client import (  # noqa
+    AsyncCloudifyClient,
+    AsyncCloudifyClusterClient,
+)
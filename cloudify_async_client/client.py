@@ -0,0 +1,388 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""asyncio versions of the CloudifyClient and the CloudifyClusterClient.
+
+The endpoint methods are the same as the ones of the CloudifyClient, but
+they are coroutines:
+
+    async with AsyncCloudifyClient(host, username=..., ...) as client:
+        blueprints, deployments = await asyncio.gather(
+            client.blueprints.list(), client.deployments.list())
+
+This is a thread-backed facade, not a non-blocking client. The endpoint
+classes (BlueprintsClient etc.) are reused as they are, and they build
+requests and handle responses synchronously, so each call of an endpoint
+method runs in a thread of the client's executor, which is blocked until
+the method returns. Only the requests themselves are sent by the event
+loop, over a pooled aiohttp session. So the calls don't block the event
+loop, but each call in flight still takes a thread, and at most
+connection_limit calls run at once.
+
+Request bodies (eg. of uploads) are streamed to aiohttp a chunk at a
+time, and streamed responses (eg. of downloads) are read from aiohttp as
+they are consumed, so neither is held in memory.
+
+The lazy `iter()` and `follow()` methods are not supported, because they
+make requests while being iterated over; use `list()` with `_offset` and
+`_size`, and `tail()`, instead.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import ssl
+import threading
+import time
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from cloudify.cluster import ClusterHTTPClient, Hedging
+
+from cloudify_rest_client import codec
+from cloudify_rest_client.client import (
+    CloudifyClient,
+    HTTPClient,
+    DEFAULT_PORT,
+    DEFAULT_PROTOCOL,
+    DEFAULT_API_VERSION,
+)
+
+DEFAULT_CONNECTION_LIMIT = 100
+_END = object()
+
+
+class _Response(object):
+    """The parts of a requests.Response that the error handling uses"""
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return codec.loads(self.content)
+
+
+def _client_error(error):
+    """The requests exception to raise for an aiohttp error"""
+    if isinstance(error, aiohttp.ClientSSLError):
+        return requests.exceptions.SSLError(str(error))
+    return requests.exceptions.ConnectionError(str(error) or 'Timeout')
+
+
+class AsyncStreamedResponse(object):
+    """A StreamedResponse reading an aiohttp response, for the threads
+    that the endpoint methods run in.
+    """
+    def __init__(self, client, response):
+        self._client = client
+        self._response = response
+        self.headers = CaseInsensitiveDict(response.headers)
+
+    @property
+    def status_code(self):
+        return self._response.status
+
+    def _read(self, read, *args):
+        return self._client._wait(self._client._read(read, *args))
+
+    def bytes_stream(self, chunk_size=8192):
+        while True:
+            chunk = self._read(self._response.content.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def lines_stream(self):
+        while True:
+            line = self._read(self._response.content.readline)
+            if not line:
+                return
+            yield line.rstrip(b'\r\n')
+
+    def close(self):
+        self._client._loop.call_soon_threadsafe(self._response.release)
+
+
+def _querystring(params):
+    """Encode params the way requests does, for aiohttp"""
+    query = []
+    for name, value in params.items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query.extend((name, str(v)) for v in values)
+    return query
+
+
+class AsyncHTTPClient(HTTPClient):
+    """Sends the requests of the endpoint methods using aiohttp.
+
+    The requests are prepared by HTTPClient.do_request, in the thread
+    that the endpoint method runs in, and only their transport
+    (_do_request) is replaced: they are sent by the client's event loop,
+    while the thread waits for the response.
+
+    :param session: an aiohttp.ClientSession to use; by default, a session
+                    with a pool of up to connection_limit connections is
+                    created on first use
+    """
+    def __init__(self, host, port=DEFAULT_PORT,
+                 protocol=DEFAULT_PROTOCOL, api_version=DEFAULT_API_VERSION,
+                 headers=None, query_params=None, cert=None, trust_all=False,
+                 username=None, password=None, token=None, tenant=None,
+                 kerberos_env=None, timeout=None, session=None, cache=None,
+                 hooks=None, compress_requests=None):
+        if cache is not None:
+            raise ValueError('The async client does not support a cache')
+        super(AsyncHTTPClient, self).__init__(
+            host, port, protocol, api_version, headers, query_params, cert,
+            trust_all, username, password, token, tenant, kerberos_env,
+            timeout, None, None, hooks, compress_requests)
+        self.connection_limit = DEFAULT_CONNECTION_LIMIT
+        self._aio_session = session
+        self._owns_session = session is None
+        self._ssl = {}
+        self._loop = None
+        self._loop_thread = None
+        self._executor = None
+
+    def _get_aio_session(self):
+        if self._aio_session is None:
+            self._aio_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                # cookies would leak between the clients' tenants/users
+                cookie_jar=aiohttp.DummyCookieJar())
+        return self._aio_session
+
+    async def call(self, method, *args, **kwargs):
+        """Run the endpoint method in the executor, and return its result"""
+        loop = asyncio.get_event_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._loop_thread = threading.current_thread()
+        elif self._loop is not loop:
+            raise RuntimeError(
+                'The async client can only be used from one event loop')
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.connection_limit)
+        return await loop.run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs))
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._aio_session is not None and self._owns_session:
+            await self._aio_session.close()
+            self._aio_session = None
+
+    def _wait(self, coro):
+        """Run coro on the event loop, and wait for its result"""
+        if self._loop is None or \
+                threading.current_thread() is self._loop_thread:
+            coro.close()
+            raise RuntimeError(
+                'The async client can only make requests from the endpoint '
+                'methods, eg. `await client.blueprints.list()`')
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _ssl_context(self, verify):
+        if verify not in self._ssl:
+            if verify is False:
+                self._ssl[verify] = False
+            elif verify is True:
+                self._ssl[verify] = ssl.create_default_context()
+            else:
+                self._ssl[verify] = ssl.create_default_context(cafile=verify)
+        return self._ssl[verify]
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                     sock_read=read_timeout)
+
+    async def _body_chunks(self, body):
+        """Stream the body, reading its chunks in the default executor"""
+        chunks = iter(body)
+        while True:
+            chunk = await self._loop.run_in_executor(None, next, chunks, _END)
+            if chunk is _END:
+                return
+            if chunk:
+                yield chunk
+
+    async def _read(self, read, *args):
+        try:
+            return await read(*args)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _client_error(e)
+
+    async def _aio_request(self, method, url, body, params, headers,
+                           verify, timeout, stream):
+        """Send the request; return the response, and its content unless
+        it is streamed
+        """
+        headers = dict((k, str(v)) for k, v in headers.items())
+        if body is not None and not isinstance(body, (bytes, str)):
+            if hasattr(body, '__len__'):
+                # send it with a Content-Length, like requests does
+                headers['Content-Length'] = str(len(body))
+            body = self._body_chunks(body)
+        try:
+            response = await self._get_aio_session().request(
+                method, url,
+                data=body,
+                params=_querystring(params),
+                headers=headers,
+                ssl=self._ssl_context(verify),
+                timeout=self._timeout(timeout))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _client_error(e)
+        if stream:
+            return response, None
+        try:
+            return response, await self._read(response.read)
+        finally:
+            response.release()
+
+    def _do_request(self, requests_method, request_url, body, params, headers,
+                    expected_status_code, stream, verify, timeout,
+                    cache_key=None, request_info=None):
+        if request_info is not None:
+            started = time.time()
+        try:
+            response, content = self._wait(self._aio_request(
+                requests_method.__name__.upper(), request_url, body, params,
+                headers, verify, timeout or self.default_timeout_sec,
+                stream))
+        except requests.exceptions.RequestException as e:
+            if request_info is not None:
+                request_info.latency = time.time() - started
+                request_info.error = e
+                self._call_hooks('after_response', request_info)
+            raise
+        if request_info is not None:
+            request_info.latency = time.time() - started
+            request_info.status_code = response.status
+            request_info.bytes_received = len(content) \
+                if content is not None else response.content_length
+            self._call_hooks('after_response', request_info)
+        self.logger.debug('reply:  "%s %s"', response.status, response.reason)
+
+        if isinstance(expected_status_code, int):
+            expected_status_code = [expected_status_code]
+        if response.status not in expected_status_code:
+            if content is None:
+                streamed = AsyncStreamedResponse(self, response)
+                try:
+                    content = b''.join(streamed.bytes_stream())
+                finally:
+                    streamed.close()
+            self._raise_client_error(_Response(
+                request_url, response.status,
+                CaseInsensitiveDict(response.headers), content), request_url)
+        if stream:
+            streamed = AsyncStreamedResponse(self, response)
+            if response.status == 204:
+                streamed.close()
+                return None
+            return streamed
+        if response.status == 204:
+            return None
+        return codec.loads(content)
+
+
+class AsyncClusterHTTPClient(AsyncHTTPClient, ClusterHTTPClient):
+    """Fails over between managers, like the ClusterHTTPClient does.
+
+    ClusterHTTPClient's retries, host health and hedging are used as they
+    are, with the requests sent by AsyncHTTPClient's transport.
+    """
+
+
+class _AsyncEndpoint(object):
+    """Exposes the methods of an endpoint client as coroutines"""
+
+    def __init__(self, api, endpoint):
+        self._api = api
+        self._endpoint = endpoint
+
+    def __getattr__(self, name):
+        value = getattr(self._endpoint, name)
+        if getattr(value, 'api', None) is self._api:
+            # a nested endpoint, eg. deployments.outputs
+            return _AsyncEndpoint(self._api, value)
+        if not callable(value):
+            return value
+        if name == 'iter':
+            raise AttributeError(
+                'The async client does not support iter(), use list()')
+        if name == 'follow':
+            raise AttributeError(
+                'The async client does not support follow(), use tail()')
+        return functools.partial(self._api.call, value)
+
+
+class AsyncCloudifyClient(CloudifyClient):
+    """Cloudify's management client, for use with asyncio.
+
+    Takes the same arguments as the CloudifyClient (except for `cache`,
+    which is not supported, and `session`, which is an
+    aiohttp.ClientSession), and `connection_limit`: the size of the
+    connection pool, and of the thread pool that the endpoint methods
+    run in, so how many of them can run at once.
+    Use as an async context manager, or await close() when done.
+    """
+    client_class = AsyncHTTPClient
+
+    def __init__(self, *args, **kwargs):
+        connection_limit = kwargs.pop('connection_limit',
+                                      DEFAULT_CONNECTION_LIMIT)
+        super(AsyncCloudifyClient, self).__init__(*args, **kwargs)
+        self._client.connection_limit = connection_limit
+        for name, value in list(vars(self).items()):
+            if getattr(value, 'api', None) is self._client:
+                setattr(self, name, _AsyncEndpoint(self._client, value))
+
+    async def close(self):
+        await self._client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+class AsyncCloudifyClusterClient(AsyncCloudifyClient):
+    """An AsyncCloudifyClient that fails over between the managers of a
+    cluster, like the CloudifyClusterClient.
+    """
+    client_class = AsyncClusterHTTPClient
+
+    def __init__(self, *args, **kwargs):
+        hedging = kwargs.pop('hedging', None)
+        super(AsyncCloudifyClusterClient, self).__init__(*args, **kwargs)
+        if hedging is True:
+            hedging = Hedging()
+        self._client.hedging = hedging or None
@@ -22,11 +22,18 @@ PY2 = sys.version_info[0] == 2
 
 
 if PY2:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+    import Queue as queue
     from urllib import quote as urlquote, pathname2url
     from urlparse import urlparse
 else:
+    from os import scandir
+    import queue
     from urllib.parse import quote as urlquote, urlparse
     from urllib.request import pathname2url
 
 
-__all__ = ['PY2', 'urlquote', 'pathname2url', 'urlparse']
+__all__ = ['PY2', 'queue', 'scandir', 'urlquote', 'pathname2url', 'urlparse']
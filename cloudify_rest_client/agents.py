@@ -14,7 +14,7 @@
 #    * limitations under the License.
 
 from cloudify.models_states import AgentState
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.utils import get_file_content
 
 
@@ -163,6 +163,14 @@ class AgentsClient(object):
             response['metadata']
         )
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the agents, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self, name):
         """Get an agent from the manager.
 
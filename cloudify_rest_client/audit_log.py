@@ -1,4 +1,4 @@
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class AuditLog(dict):
@@ -60,3 +60,11 @@ class AuditLogClient(object):
         return ListResponse(
             [AuditLog(item) for item in response['items']],
             response['metadata'])
+
+    def iter(self, **kwargs):
+        """Lazily iterate over all the audit log entries, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
@@ -16,14 +16,13 @@
 import os
 import tempfile
 import shutil
-import contextlib
 
 from cloudify_rest_client import utils
 from cloudify_rest_client import bytes_stream_utils
 from cloudify_rest_client._compat import urlquote, urlparse
 from cloudify_rest_client.constants import VisibilityState
 from cloudify_rest_client.exceptions import CloudifyClientError
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 from .labels import Label
 
@@ -195,7 +194,8 @@ class BlueprintsClient(object):
 
     def _validate_blueprint_size(self, path, tempdir, skip_size_limit):
         blueprint_directory = os.path.dirname(path) or os.getcwd()
-        size, files = utils.get_folder_size_and_files(blueprint_directory)
+        folder = utils.scan_folder(blueprint_directory)
+        size, files = folder.size, folder.files
 
         try:
             config = self.api.get('/config', params={'scope': 'rest'})
@@ -221,7 +221,7 @@ class BlueprintsClient(object):
                 raise Exception(error_message.format(
                     'Number of files in blueprint folder exceeds {}'.format(
                         files_limit)))
-        tar_path = utils.tar_blueprint(path, tempdir)
+        tar_path = utils.tar_blueprint(path, tempdir, folder=folder)
         return tar_path, os.path.basename(path)
 
     def list(self, _include=None, sort=None, is_descending=False,
@@ -258,6 +258,14 @@ class BlueprintsClient(object):
             response['metadata']
         )
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the blueprints, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def publish_archive(self,
                         archive_location,
                         blueprint_id,
@@ -423,7 +431,8 @@ class BlueprintsClient(object):
             '/{self._uri_prefix}/{id}'.format(self=self, id=blueprint_id),
             params={'force': force})
 
-    def download(self, blueprint_id, output_file=None, progress_callback=None):
+    def download(self, blueprint_id, output_file=None, progress_callback=None,
+                 workers=1, checksum=None):
         """
         Downloads a previously uploaded blueprint from Cloudify's manager.
 
@@ -431,20 +440,17 @@ class BlueprintsClient(object):
         :param progress_callback: Callback function for printing a progress bar
         :param output_file: The file path of the downloaded blueprint file
          (optional)
+        :param workers: download files larger than 64MB in this many
+                        concurrent ranges
+        :param checksum: "<algorithm>:<hexdigest>" (eg. "sha256:ab12..")
+                         to verify the downloaded file against
         :return: The file path of the downloaded blueprint.
         """
         uri = '/{self._uri_prefix}/{id}/archive'.format(self=self,
                                                         id=blueprint_id)
-
-        with contextlib.closing(
-                self.api.get(uri, stream=True)) as streamed_response:
-
-            output_file = bytes_stream_utils.write_response_stream_to_file(
-                streamed_response,
-                output_file,
-                progress_callback=progress_callback)
-
-            return output_file
+        return bytes_stream_utils.download_file(
+            self.api, uri, output_file, progress_callback=progress_callback,
+            workers=workers, checksum=checksum)
 
     def set_global(self, blueprint_id):
         """
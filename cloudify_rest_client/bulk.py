@@ -0,0 +1,273 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Run many REST calls, eg. creating hundreds of deployments, concurrently.
+
+    results = bulk.create_deployments(client, [
+        {'blueprint_id': 'bp1', 'deployment_id': 'd{0}'.format(i)}
+        for i in range(500)
+    ], workers=10, wait=True)
+    for result in results.failed:
+        print(result.item, result.error)
+"""
+
+import time
+import random
+import threading
+
+from cloudify_rest_client.exceptions import CloudifyClientError
+from cloudify_rest_client.executions import Execution
+from cloudify_rest_client.utils import map_concurrently
+
+DEFAULT_WORKERS = 10
+DEFAULT_RETRIES = 8
+# the manager is overloaded: these requests weren't handled, and can be
+# sent again
+RETRY_STATUS_CODES = (429, 503)
+BACKOFF_MIN_DELAY = 0.5
+BACKOFF_MAX_DELAY = 30
+WAIT_POLL_INTERVAL = 2
+WAIT_JITTER = 0.2
+# how many executions' status to get per request, when waiting
+WAIT_BATCH_SIZE = 100
+
+
+class BulkResult(object):
+    """The outcome of one item of a bulk operation.
+
+    :ivar item: the item, as passed in
+    :ivar result: what the call returned, eg. the Deployment
+    :ivar error: the exception the call raised, if it failed
+    :ivar attempts: how many times the call was made
+    :ivar execution: when waiting, the Execution that was waited for
+    """
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.attempts = 0
+        self.execution = None
+
+    @property
+    def succeeded(self):
+        if self.error is not None:
+            return False
+        return self.execution is None or \
+            self.execution.status == Execution.TERMINATED
+
+    def __repr__(self):
+        return '<BulkResult {0}: {1}>'.format(
+            self.item, 'ok' if self.succeeded else self.error or
+            self.execution.status)
+
+
+class BulkResults(list):
+    """The BulkResults of all the items, in the order of the items"""
+
+    @property
+    def succeeded(self):
+        return [result for result in self if result.succeeded]
+
+    @property
+    def failed(self):
+        return [result for result in self if not result.succeeded]
+
+
+class _Backoff(object):
+    """A delay shared by all the workers, growing while the manager
+    replies with 429/503, and shrinking back while it doesn't
+    """
+    def __init__(self, min_delay=BACKOFF_MIN_DELAY,
+                 max_delay=BACKOFF_MAX_DELAY):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = 0
+        self._until = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                remaining = self._until - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def throttled(self, retry_after=None):
+        with self._lock:
+            self.delay = min(max(self.delay * 2, self.min_delay),
+                             self.max_delay)
+            delay = retry_after or self.delay * random.uniform(1, 1.5)
+            self._until = max(self._until, time.time() + delay)
+
+    def succeeded(self):
+        with self._lock:
+            self.delay /= 2
+            if self.delay < self.min_delay:
+                self.delay = 0
+
+
+def _retry_after(error):
+    """The Retry-After header of the error response, in seconds"""
+    response = getattr(error, 'response', None)
+    value = None if response is None else \
+        response.headers.get('Retry-After')
+    try:
+        return min(float(value), BACKOFF_MAX_DELAY)
+    except (TypeError, ValueError):
+        # not set, or an HTTP date
+        return None
+
+
+def run_bulk(func, items, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES,
+             progress_callback=None):
+    """Call func(item) for every item, with up to `workers` at a time.
+
+    Calls rejected with a 429 or a 503 are retried, up to `retries`
+    times, after a delay that all the workers wait for. The delay
+    doubles with each rejection, starting at BACKOFF_MIN_DELAY, unless
+    the manager sent a Retry-After. Other errors are not retried.
+
+    :param func: called with each item
+    :param items: an iterable of items
+    :param workers: how many calls to make at a time
+    :param retries: how many times to retry a rejected call
+    :param progress_callback: called with (done, total) after each item
+    :return: BulkResults, one for each item
+    """
+    results = BulkResults(BulkResult(item) for item in items)
+    backoff = _Backoff()
+    done = [0]
+    lock = threading.Lock()
+
+    def _run(result):
+        while True:
+            backoff.wait()
+            result.attempts += 1
+            try:
+                result.result = func(result.item)
+            except CloudifyClientError as e:
+                if e.status_code in RETRY_STATUS_CODES and \
+                        result.attempts <= retries:
+                    backoff.throttled(_retry_after(e))
+                    continue
+                result.error = e
+            except Exception as e:
+                result.error = e
+            else:
+                backoff.succeeded()
+            break
+        if progress_callback is not None:
+            with lock:
+                done[0] += 1
+                progress_callback(done[0], len(results))
+
+    map_concurrently(_run, results, workers)
+    return results
+
+
+def wait_for_executions(client, results, poll_interval=WAIT_POLL_INTERVAL,
+                        jitter=WAIT_JITTER, timeout=None):
+    """Wait until the executions of the results end.
+
+    Polls the status of all the executions that didn't end yet, getting
+    WAIT_BATCH_SIZE of them per request. The interval between the polls
+    is randomized by +/- jitter, so that several waiting clients don't
+    poll the manager at the same time.
+
+    :param results: BulkResults, with .execution set to the Execution
+                    to wait for (others are skipped)
+    :param timeout: give up after this many seconds; the results whose
+                    execution didn't end then get a CloudifyClientError
+    """
+    pending = dict((result.execution.id, result) for result in results
+                   if result.execution is not None and
+                   result.execution.status not in Execution.END_STATES)
+    deadline = None if timeout is None else time.time() + timeout
+    while pending:
+        ids = list(pending)
+        for offset in range(0, len(ids), WAIT_BATCH_SIZE):
+            executions = client.executions.list(
+                id=ids[offset:offset + WAIT_BATCH_SIZE],
+                include_system_workflows=True,
+                _include=['id', 'status', 'error', 'deployment_id',
+                          'workflow_id'])
+            for execution in executions:
+                result = pending.get(execution.id)
+                if result is None:
+                    continue
+                result.execution = execution
+                if execution.status in Execution.END_STATES:
+                    del pending[execution.id]
+        if not pending:
+            break
+        if deadline is not None and time.time() >= deadline:
+            for execution_id, result in pending.items():
+                result.error = CloudifyClientError(
+                    'Timed out waiting for execution {0}'.format(
+                        execution_id))
+            break
+        time.sleep(poll_interval * random.uniform(1 - jitter, 1 + jitter))
+    return results
+
+
+def create_deployments(client, deployments, wait=False, timeout=None,
+                       poll_interval=WAIT_POLL_INTERVAL, **kwargs):
+    """Create the deployments, with run_bulk.
+
+    :param deployments: dicts of the arguments of DeploymentsClient.create
+    :param wait: wait for the deployments' environment creation to end;
+                 the result.execution is then that execution
+    :param timeout: when waiting, wait at most this many seconds
+    :param poll_interval: when waiting, seconds between the polls
+    :param kwargs: passed to run_bulk
+    """
+    results = run_bulk(lambda item: client.deployments.create(**item),
+                       deployments, **kwargs)
+    if wait:
+        created = dict((result.result.id, result) for result in results
+                       if result.error is None)
+        ids = list(created)
+        for offset in range(0, len(ids), WAIT_BATCH_SIZE):
+            for execution in client.executions.list(
+                    deployment_id=ids[offset:offset + WAIT_BATCH_SIZE],
+                    workflow_id='create_deployment_environment',
+                    include_system_workflows=True,
+                    _include=['id', 'status', 'deployment_id']):
+                created[execution.deployment_id].execution = execution
+        wait_for_executions(client, results, poll_interval=poll_interval,
+                            timeout=timeout)
+    return results
+
+
+def start_executions(client, executions, wait=False, timeout=None,
+                     poll_interval=WAIT_POLL_INTERVAL, **kwargs):
+    """Start the executions, with run_bulk.
+
+    :param executions: dicts of the arguments of ExecutionsClient.start
+    :param wait: wait for the executions to end
+    :param timeout: when waiting, wait at most this many seconds
+    :param poll_interval: when waiting, seconds between the polls
+    :param kwargs: passed to run_bulk
+    """
+    results = run_bulk(lambda item: client.executions.start(**item),
+                       executions, **kwargs)
+    if wait:
+        for result in results:
+            if result.error is None:
+                result.execution = result.result
+        wait_for_executions(client, results, poll_interval=poll_interval,
+                            timeout=timeout)
+    return results
@@ -14,9 +14,95 @@
 #    * limitations under the License.
 
 import os
+import base64
+import hashlib
+import logging
+import binascii
+import threading
+
+import requests
+
+from cloudify_rest_client.exceptions import (
+    CloudifyClientError,
+    ChecksumMismatchError,
+)
+from cloudify_rest_client.utils import map_concurrently
 
 CONTENT_DISPOSITION_HEADER = 'content-disposition'
 DEFAULT_BUFFER_SIZE = 8192
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_WRITE_BUFFER_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+PARALLEL_DOWNLOAD_MIN_SIZE = 64 * 1024 * 1024
+PARTIAL_DOWNLOAD_SUFFIX = '.part'
+
+logger = logging.getLogger('cloudify.rest_client.download')
+
+
+class FileBody(object):
+    """A request body streaming a file, which can be sent more than once.
+
+    The file is read from `offset`, a buffer at a time. Once it was read
+    to the end, or after rewind() is called, reading starts over, so that
+    the request can be re-sent (eg. to another manager of a cluster, or
+    after kerberos authentication) without holding the file in memory.
+    As it has a length, requests sends it with a Content-Length header,
+    and not chunked, which kerberos requires.
+    """
+
+    def __init__(self, file_path, offset=0, buffer_size=DEFAULT_BUFFER_SIZE,
+                 progress_callback=None):
+        self.file_path = file_path
+        self.offset = offset
+        self.buffer_size = buffer_size
+        self.progress_callback = progress_callback
+        self._size = os.path.getsize(file_path) - offset
+        self._file = None
+        self._bytes_read = 0
+
+    def __len__(self):
+        return self._size
+
+    def rewind(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._bytes_read = 0
+
+    def read(self, size=-1):
+        if self._file is None:
+            self._file = open(self.file_path, 'rb')
+            self._file.seek(self.offset)
+        data = self._file.read(size)
+        if not data:
+            self.rewind()
+            return data
+        self._bytes_read += len(data)
+        if self.progress_callback:
+            self.progress_callback(self._bytes_read, self._size)
+        return data
+
+    def __iter__(self):
+        self.rewind()
+        while True:
+            chunk = self.read(self.buffer_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class ReopenableBody(object):
+    """A streamed request body, which can be sent more than once.
+
+    :param factory: called each time the body is sent, to return an
+                    iterable of the body's chunks
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __iter__(self):
+        return iter(self._factory())
 
 
 def request_data_file_stream(file_path,
@@ -24,25 +110,16 @@ def request_data_file_stream(file_path,
                              progress_callback=None,
                              client=None):
     """
-    Read file data in kerberos mode or split into chunks,
+    Stream the file data, in a body that can be re-sent on retries,
     :param file_path: Local path of the file to be transferred
     :param buffer_size: Size of the buffer
     :param progress_callback: Callback function - can be used to print progress
-    :return: File data or generator object
+    :param client: unused, kept for backwards compatibility
+    :return: a FileBody
     """
-    if client and client.has_kerberos() and not client.has_auth_header():
-        # kerberos currently does not support chunks
-        with open(file_path, 'rb') as f:
-            data = f.read()
-        if progress_callback:
-            progress_callback(1, 1)
-    else:
-        # upload it in chunks
-        data = request_data_file_stream_gen(
-            file_path,
-            buffer_size=buffer_size,
-            progress_callback=progress_callback)
-    return data
+    return FileBody(file_path,
+                    buffer_size=buffer_size,
+                    progress_callback=progress_callback)
 
 
 def request_data_file_stream_gen(file_path,
@@ -72,6 +149,23 @@ def request_data_file_stream_gen(file_path,
                 return
 
 
+def _output_path(headers, output_file):
+    """The path to download to, based on the Content-Disposition filename"""
+    if not output_file or os.path.isdir(output_file):
+        if CONTENT_DISPOSITION_HEADER not in headers:
+            raise RuntimeError(
+                'Cannot determine attachment filename: {0} header not'
+                ' found in response headers'.format(
+                    CONTENT_DISPOSITION_HEADER))
+        output_filename = headers[
+            CONTENT_DISPOSITION_HEADER].split('filename=')[1]
+        output_file = os.path.join(output_file or '', output_filename)
+
+    if os.path.exists(output_file):
+        raise OSError("Output file '{0}' already exists".format(output_file))
+    return output_file
+
+
 def write_response_stream_to_file(streamed_response,
                                   output_file=None,
                                   buffer_size=DEFAULT_BUFFER_SIZE,
@@ -84,33 +178,247 @@ def write_response_stream_to_file(streamed_response,
     :param progress_callback: Callback function - can be used to print progress
     :return:
     """
-    output_filename = streamed_response.headers[
-        CONTENT_DISPOSITION_HEADER].split('filename=')[1]
-
-    if not output_file:
-        if CONTENT_DISPOSITION_HEADER not in streamed_response.headers:
-            raise RuntimeError(
-                'Cannot determine attachment filename: {0} header not'
-                ' found in response headers'.format(
-                    CONTENT_DISPOSITION_HEADER))
-        output_file = output_filename
-
-    if os.path.isdir(output_file):
-        output_file = os.path.join(output_file, output_filename)
-
-    if os.path.exists(output_file):
-        raise OSError("Output file '{0}' already exists".format(output_file))
-
+    output_file = _output_path(streamed_response.headers, output_file)
     total_file_size = int(streamed_response.headers['content-length'])
     total_bytes_written = 0
 
-    with open(output_file, 'wb') as f:
+    with open(output_file, 'wb', DOWNLOAD_WRITE_BUFFER_SIZE) as f:
         for chunk in streamed_response.bytes_stream(buffer_size):
             if chunk:
                 f.write(chunk)
-                f.flush()
 
             if progress_callback:
                 total_bytes_written += len(chunk)
                 progress_callback(total_bytes_written, total_file_size)
     return output_file
+
+
+class _IncompleteDownload(Exception):
+    pass
+
+
+class _Progress(object):
+    """Report the progress of a download, from several threads"""
+
+    def __init__(self, callback, total, done=0):
+        self._callback = callback
+        self._total = total
+        self._done = done
+        self._lock = threading.Lock()
+
+    def add(self, size):
+        with self._lock:
+            self._done += size
+            if self._callback:
+                self._callback(self._done, self._total)
+
+
+def _parse_checksum(checksum, headers):
+    """The (hashlib algorithm, expected hexdigest) to verify, if any.
+
+    checksum is "<algorithm>:<hexdigest>", eg. "sha256:ab12..". If it's not
+    given, the RFC 3230 Digest response header is used, if the server
+    sent one.
+    """
+    if checksum:
+        algorithm, _, digest = checksum.partition(':')
+        return algorithm.lower(), digest.lower()
+    for digest in (headers.get('digest') or '').split(','):
+        algorithm, _, value = digest.strip().partition('=')
+        algorithm = algorithm.lower().replace('-', '')
+        if algorithm in ('md5', 'sha1', 'sha256', 'sha512') and value:
+            return algorithm, binascii.hexlify(
+                base64.b64decode(value)).decode('ascii')
+    return None
+
+
+def _verify_checksum(path, algorithm, expected):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_WRITE_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    if digest.hexdigest() != expected:
+        raise ChecksumMismatchError(
+            'Checksum mismatch of {0}: expected {1} {2}, got {3}'.format(
+                path, algorithm, expected, digest.hexdigest()))
+
+
+def _write_range(get_response, path, start, end, validator, progress,
+                 retries, response=None):
+    """Download bytes start..end of the file into path, at the same offset.
+
+    end is inclusive, or None for the rest of the file. After a connection
+    error, the download is resumed from the last byte received.
+    :param response: an already-made response for the range
+    """
+    position = start
+    for attempt in range(retries + 1):
+        try:
+            if response is None:
+                headers = {}
+                if position or end is not None:
+                    headers['Range'] = 'bytes={0}-{1}'.format(
+                        position, '' if end is None else end)
+                    if validator:
+                        headers['If-Range'] = validator
+                response = get_response(headers)
+                if headers and response.status_code != 206:
+                    if end is not None:
+                        raise CloudifyClientError(
+                            'Range request for {0} was not honored: {1}'
+                            .format(path, headers['Range']))
+                    # the file changed since (If-Range), so this is the
+                    # whole new file: start over
+                    progress.add(-position)
+                    position = 0
+            with open(path, 'r+b', DOWNLOAD_WRITE_BUFFER_SIZE) as f:
+                if response.status_code != 206:
+                    # the whole file
+                    f.truncate(0)
+                f.seek(position)
+                for chunk in response.bytes_stream(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    position += len(chunk)
+                    progress.add(len(chunk))
+            length = response.headers.get('content-length')
+            if length is not None and \
+                    position != _range_start(response) + int(length):
+                raise _IncompleteDownload(
+                    'Received {0} of {1} bytes'.format(
+                        position - _range_start(response), length))
+            return
+        except (requests.exceptions.RequestException,
+                _IncompleteDownload) as e:
+            if attempt == retries:
+                raise CloudifyClientError(
+                    'Download of {0} failed: {1}'.format(path, e))
+            logger.debug('Download of %s interrupted at byte %d: %s; '
+                         'resuming', path, position, e)
+        finally:
+            if response is not None:
+                response.close()
+                response = None
+
+
+def _range_start(response):
+    """The first byte of the file that the response contains"""
+    if response.status_code != 206:
+        return 0
+    # Content-Range: bytes <start>-<end>/<total>
+    content_range = response.headers['content-range']
+    return int(content_range.split()[1].split('-')[0])
+
+
+def download_to_file(get_response, output_file=None, progress_callback=None,
+                     workers=1, checksum=None, retries=DOWNLOAD_RETRIES,
+                     parallel_min_size=PARALLEL_DOWNLOAD_MIN_SIZE):
+    """Download a file, resuming after interruptions.
+
+    The file is first downloaded to "<output_file>.part", and renamed once
+    it's complete. If the server supports range requests (Accept-Ranges),
+    a download that was interrupted by a connection error is resumed from
+    where it stopped, and so is a partial file left by a previous call
+    (if the file's ETag or Last-Modified didn't change since).
+    With workers > 1, files of at least parallel_min_size bytes are
+    downloaded in that many concurrent ranges.
+
+    :param get_response: called with a dict of extra request headers
+                         (eg. Range), returns a StreamedResponse
+    :param output_file: the path to download to; if it's not given or is a
+                        directory, the name from the Content-Disposition
+                        header is used
+    :param progress_callback: called with (bytes downloaded, total bytes)
+    :param workers: how many ranges to download concurrently
+    :param checksum: "<algorithm>:<hexdigest>" to verify the file against,
+                     eg. "sha256:ab12..". Otherwise, the Digest response
+                     header is verified, if the server sent it.
+    :param retries: how many times to resume after connection errors
+    :return: the path of the downloaded file
+    """
+    response = get_response({})
+    try:
+        headers = response.headers
+        output_file = _output_path(headers, output_file)
+        part_file = output_file + PARTIAL_DOWNLOAD_SUFFIX
+        validator_file = part_file + '.validator'
+        total = headers.get('content-length')
+        total = int(total) if total is not None else None
+        validator = headers.get('etag') or headers.get('last-modified')
+        accepts_ranges = (total is not None and
+                          headers.get('accept-ranges') == 'bytes')
+        expected_checksum = _parse_checksum(checksum, headers)
+
+        parallel = (accepts_ranges and workers > 1 and
+                    total >= parallel_min_size)
+        done = 0
+        if accepts_ranges and validator and os.path.exists(part_file) \
+                and _read_file(validator_file) == validator:
+            done = min(os.path.getsize(part_file), total)
+            parallel = False
+        if done or parallel:
+            # not using this response, but ranges of the file
+            response.close()
+            response = None
+        with open(part_file, 'r+b' if done else 'wb') as f:
+            f.truncate(total if parallel else done)
+        if validator and not parallel:
+            # a parallel download's partial file has holes, so it can't
+            # be resumed
+            with open(validator_file, 'w') as f:
+                f.write(validator)
+        else:
+            _remove(validator_file)
+
+        progress = _Progress(progress_callback, total, done)
+        if parallel:
+            step = -(-total // workers)
+            ranges = [(start, min(start + step, total) - 1)
+                      for start in range(0, total, step)]
+            map_concurrently(
+                lambda byte_range: _write_range(
+                    get_response, part_file, byte_range[0], byte_range[1],
+                    validator, progress, retries),
+                ranges, workers)
+        elif done != total:
+            _write_range(get_response, part_file, done, None, validator,
+                         progress, retries if accepts_ranges else 0,
+                         response=response)
+            response = None
+    finally:
+        if response is not None:
+            response.close()
+
+    if expected_checksum:
+        try:
+            _verify_checksum(part_file, *expected_checksum)
+        except ChecksumMismatchError:
+            os.remove(part_file)
+            raise
+        finally:
+            _remove(validator_file)
+    os.rename(part_file, output_file)
+    _remove(validator_file)
+    return output_file
+
+
+def download_file(api, uri, output_file=None, progress_callback=None,
+                  **kwargs):
+    """Download uri from the REST service (see download_to_file)"""
+    def _get_response(headers):
+        return api.get(uri, stream=True, headers=headers,
+                       expected_status_code=(200, 206))
+    return download_to_file(_get_response, output_file,
+                            progress_callback=progress_callback, **kwargs)
+
+
+def _read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
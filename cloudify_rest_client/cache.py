@@ -0,0 +1,158 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import copy
+import json
+import time
+import threading
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+# how long (in seconds) to cache responses of GET requests, per the
+# URI prefix; only responses for URIs matching one of the prefixes are cached
+DEFAULT_TTLS = {
+    '/blueprints': 60,
+    '/deployments': 30,
+    '/nodes': 30,
+    '/plugins': 60,
+    '/secrets': 30,
+    '/tenants': 300,
+}
+DEFAULT_MAX_ENTRIES = 1000
+
+MISS = object()
+
+
+class _CacheEntry(object):
+    def __init__(self, uri, data, etag, expires):
+        self.uri = uri
+        self.data = data
+        self.etag = etag
+        self.expires = expires
+
+
+class ResponseCache(object):
+    """A read-through cache for the responses of GET requests.
+
+    Pass an instance as the `cache` argument of the CloudifyClient to use
+    it. Responses are kept for the TTL configured for the longest
+    matching URI prefix. Once expired, a response that came with an ETag
+    header is revalidated using If-None-Match, and if the server replies
+    with a 304, the cached response is used again.
+    Any non-GET request for a URI invalidates the cached responses of the
+    same resource type (eg. updating a deployment invalidates all cached
+    /deployments responses).
+
+    Cached responses are keyed by the request headers as well, so a cache
+    can be shared by several clients, but it is meant to be used by one.
+
+    :param ttls: a dict of URI prefix to TTL in seconds, replacing the
+                 defaults (see DEFAULT_TTLS)
+    :param max_entries: how many responses to keep; least recently used
+                        responses are evicted first
+    """
+
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttls = DEFAULT_TTLS.copy() if ttls is None else dict(ttls)
+        self.max_entries = max_entries
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'revalidations': 0,
+            'evictions': 0,
+        }
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl(self, uri):
+        """The TTL for responses of this URI, or None if not cacheable"""
+        prefixes = [prefix for prefix in self.ttls
+                    if uri == prefix or uri.startswith(prefix + '/')]
+        if not prefixes:
+            return None
+        return self.ttls[max(prefixes, key=len)]
+
+    def key(self, uri, url, params, headers):
+        """The cache key for this request, or None if it's not cacheable"""
+        if not self.ttl(uri):
+            return None
+        return uri, json.dumps([url, params, headers], sort_keys=True,
+                               default=str)
+
+    def get(self, key):
+        """Return a copy of the fresh response for key, or MISS"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.time():
+                self.stats['misses'] += 1
+                return MISS
+            self._entries.pop(key)
+            self._entries[key] = entry
+            self.stats['hits'] += 1
+            return copy.deepcopy(entry.data)
+
+    def etag(self, key):
+        """The ETag of the (possibly expired) cached response for key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.etag if entry is not None else None
+
+    def revalidated(self, key):
+        """The server confirmed the cached response is still valid.
+
+        Extends the entry's lifetime, and returns a copy of the response,
+        or MISS if it is not cached anymore.
+        """
+        uri = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            entry.expires = time.time() + self.ttl(uri)
+            self.stats['revalidations'] += 1
+            return copy.deepcopy(entry.data)
+
+    def store(self, key, data, etag=None):
+        uri = key[0]
+        entry = _CacheEntry(uri, copy.deepcopy(data), etag,
+                            time.time() + self.ttl(uri))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, uri=None):
+        """Drop the cached responses for the resource type of uri.
+
+        :param uri: eg. '/deployments/d1'; drops all cached /deployments
+                    responses. If not given, the whole cache is cleared.
+        """
+        with self._lock:
+            if uri is None:
+                self._entries.clear()
+                return
+            prefix = '/' + uri.strip('/').split('/')[0]
+            for key, entry in list(self._entries.items()):
+                if entry.uri == prefix or entry.uri.startswith(prefix + '/'):
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
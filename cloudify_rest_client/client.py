@@ -13,7 +13,8 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-import json
+import zlib
+import time
 import logging
 import numbers
 
@@ -24,8 +25,11 @@ from requests.packages import urllib3
 from cloudify import constants
 from cloudify.utils import ipv6_url_compat
 
-from .utils import is_kerberos_env
+from .utils import is_kerberos_env, DEFAULT_COMPRESS_LEVEL
+from .cache import MISS
+from cloudify_rest_client import codec
 from cloudify_rest_client import exceptions
+from cloudify_rest_client.hooks import RequestInfo
 from cloudify_rest_client.ldap import LdapClient
 from cloudify_rest_client.nodes import NodesClient
 from cloudify_rest_client.users import UsersClient
@@ -85,6 +89,11 @@ DEFAULT_PROTOCOL = 'http'
 DEFAULT_API_VERSION = 'v3.1'
 BASIC_AUTH_PREFIX = 'Basic'
 CLOUDIFY_TENANT_HEADER = 'Tenant'
+# how much of the request and response bodies to show in the debug logs
+DEBUG_BODY_LIMIT = 1000
+# with compress_requests=True, gzip request bodies of at least this size
+COMPRESS_MIN_SIZE = 16 * 1024
+COMPRESSED_METHODS = ('post', 'put', 'patch')
 
 urllib3.disable_warnings(urllib3.exceptions.InsecurePlatformWarning)
 
@@ -95,7 +104,8 @@ class HTTPClient(object):
                  protocol=DEFAULT_PROTOCOL, api_version=DEFAULT_API_VERSION,
                  headers=None, query_params=None, cert=None, trust_all=False,
                  username=None, password=None, token=None, tenant=None,
-                 kerberos_env=None, timeout=None, session=None):
+                 kerberos_env=None, timeout=None, session=None, cache=None,
+                 hooks=None, compress_requests=None):
         self.port = port
         self.host = ipv6_url_compat(host)
         self.protocol = protocol
@@ -118,6 +128,15 @@ class HTTPClient(object):
         if session is None:
             session = requests.Session()
         self._session = session
+        self.cache = cache
+        self.hooks = list(hooks or [])
+        if compress_requests is True:
+            compress_requests = COMPRESS_MIN_SIZE
+        # gzip JSON request bodies of at least this many bytes
+        self.compress_min_size = compress_requests or None
+        # how many times the current request was already sent, as set by
+        # the clients that retry requests
+        self._retries = 0
 
     @property
     def url(self):
@@ -138,7 +157,7 @@ class HTTPClient(object):
 
     def _raise_client_error(self, response, url=None):
         try:
-            result = response.json()
+            result = codec.loads(response.content)
         except Exception:
             if response.status_code == 304:
                 error_msg = 'Nothing to modify'
@@ -183,7 +202,8 @@ class HTTPClient(object):
             self._raise_client_error(response)
 
     def _do_request(self, requests_method, request_url, body, params, headers,
-                    expected_status_code, stream, verify, timeout):
+                    expected_status_code, stream, verify, timeout,
+                    cache_key=None, request_info=None):
         """Run a requests method.
 
         :param request_method: string choosing the method, eg "get" or "post"
@@ -196,7 +216,16 @@ class HTTPClient(object):
         :param stream: whether or not to stream the response
         :param verify: the CA cert path
         :param timeout: request timeout or a (connect, read) timeouts pair
+        :param cache_key: store the response in self.cache using this key,
+            revalidating the previously cached response if it had an ETag
+        :param request_info: the RequestInfo to fill in and pass to the
+            hooks, if there are any
         """
+        request_headers = headers
+        if cache_key is not None:
+            etag = self.cache.etag(cache_key)
+            if etag:
+                request_headers = dict(headers, **{'If-None-Match': etag})
         auth = None
         if self.has_kerberos() and not self.has_auth_header():
             if HTTPKerberosAuth is None:
@@ -204,24 +233,52 @@ class HTTPClient(object):
                     'Trying to create a client with kerberos, '
                     'but kerberos_env does not exist')
             auth = HTTPKerberosAuth()
-        response = requests_method(request_url,
-                                   data=body,
-                                   params=params,
-                                   headers=headers,
-                                   stream=stream,
-                                   verify=verify,
-                                   timeout=timeout or self.default_timeout_sec,
-                                   auth=auth)
+        if request_info is not None:
+            started = time.time()
+        try:
+            response = requests_method(
+                request_url,
+                data=body,
+                params=params,
+                headers=request_headers,
+                stream=stream,
+                verify=verify,
+                timeout=timeout or self.default_timeout_sec,
+                auth=auth)
+        except requests.exceptions.RequestException as e:
+            if request_info is not None:
+                request_info.latency = time.time() - started
+                request_info.error = e
+                self._call_hooks('after_response', request_info)
+            raise
+        if request_info is not None:
+            request_info.latency = time.time() - started
+            request_info.status_code = response.status_code
+            request_info.bytes_received = _response_size(response, stream)
+            self._call_hooks('after_response', request_info)
         if self.logger.isEnabledFor(logging.DEBUG):
             for hdr, hdr_content in response.request.headers.items():
-                self.logger.debug('request header:  %s: %s'
-                                  % (hdr, hdr_content))
-            self.logger.debug('reply:  "%s %s" %s'
-                              % (response.status_code,
-                                 response.reason, response.content))
+                self.logger.debug('request header:  %s: %s', hdr, hdr_content)
+            self.logger.debug(
+                'reply:  "%s %s" %s', response.status_code, response.reason,
+                '(streamed)' if stream else _truncated(response.content))
             for hdr, hdr_content in response.headers.items():
-                self.logger.debug('response header:  %s: %s'
-                                  % (hdr, hdr_content))
+                self.logger.debug('response header:  %s: %s',
+                                  hdr, hdr_content)
+
+        if cache_key is not None and response.status_code == 304:
+            cached = self.cache.revalidated(cache_key)
+            if cached is not MISS:
+                return cached
+            # the cached response was evicted in the meantime
+            if request_info is not None:
+                request_info = self._start_request(
+                    request_info.method, request_info.uri, body,
+                    request_info.retries + 1)
+            return self._do_request(
+                requests_method, request_url, body, params, headers,
+                expected_status_code, stream, verify, timeout,
+                request_info=request_info)
 
         if isinstance(expected_status_code, numbers.Number):
             expected_status_code = [expected_status_code]
@@ -234,13 +291,28 @@ class HTTPClient(object):
         if stream:
             return StreamedResponse(response)
 
-        response_json = response.json()
+        response_json = codec.loads(response.content)
 
         if response.history:
             response_json['history'] = response.history
+        elif cache_key is not None:
+            self.cache.store(cache_key, response_json,
+                             response.headers.get('ETag'))
 
         return response_json
 
+    def _call_hooks(self, name, *args):
+        for hook in self.hooks:
+            getattr(hook, name)(*args)
+
+    def _start_request(self, method, uri, body, retries=None):
+        """A RequestInfo for the request, after calling before_request"""
+        request_info = RequestInfo(
+            method, uri, self.host, bytes_sent=_body_size(body),
+            retries=self._retries if retries is None else retries)
+        self._call_hooks('before_request', request_info)
+        return request_info
+
     def get_request_verify(self):
         # disable certificate verification if user asked us to.
         if self.trust_all:
@@ -251,22 +323,16 @@ class HTTPClient(object):
         # verify the certificate
         return True
 
-    def do_request(self,
-                   requests_method,
-                   uri,
-                   data=None,
-                   params=None,
-                   headers=None,
-                   expected_status_code=200,
-                   stream=False,
-                   versioned_url=True,
-                   timeout=None):
+    def _request_url(self, uri, versioned_url=True):
         if versioned_url:
-            request_url = '{0}{1}'.format(self.url, uri)
-        else:
-            # remove version from url ending
-            url = self.url.rsplit('/', 1)[0]
-            request_url = '{0}{1}'.format(url, uri)
+            return '{0}{1}'.format(self.url, uri)
+        # remove version from url ending
+        url = self.url.rsplit('/', 1)[0]
+        return '{0}{1}'.format(url, uri)
+
+    def _build_request(self, uri, data, params, headers, versioned_url):
+        """The URL, body, querystring params and headers of a request"""
+        request_url = self._request_url(uri, versioned_url)
 
         # build headers
         headers = headers or {}
@@ -279,23 +345,87 @@ class HTTPClient(object):
         total_params.update(params)
 
         # data is either dict, bytes data or None
-        is_dict_data = isinstance(data, dict)
-        body = json.dumps(data) if is_dict_data else data
+        body = codec.dumps(data) if isinstance(data, dict) else data
+        return request_url, body, total_params, total_headers
+
+    def _compress(self, requests_method, data, body, headers):
+        """The body and headers to send: gzipped, if the body is JSON
+        at least self.compress_min_size long
+        """
+        if self.compress_min_size is None or not isinstance(data, dict) or \
+                requests_method.__name__ not in COMPRESSED_METHODS or \
+                len(body) < self.compress_min_size:
+            return body, headers
+        headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        return _gzip(body), headers
+
+    def do_request(self,
+                   requests_method,
+                   uri,
+                   data=None,
+                   params=None,
+                   headers=None,
+                   expected_status_code=200,
+                   stream=False,
+                   versioned_url=True,
+                   timeout=None):
+        request_url, body, total_params, total_headers = \
+            self._build_request(uri, data, params, headers, versioned_url)
         if self.logger.isEnabledFor(logging.DEBUG):
-            log_message = 'Sending request: {0} {1}'.format(
-                requests_method.__name__.upper(),
-                request_url)
-            if is_dict_data:
-                log_message += '; body: {0}'.format(body)
+            if isinstance(data, dict):
+                log_body = '; body: {0}'.format(_truncated(body))
             elif data is not None:
-                log_message += '; body: bytes data'
-            self.logger.debug(log_message)
+                log_body = '; body: bytes data'
+            else:
+                log_body = ''
+            self.logger.debug('Sending request: %s %s%s',
+                              requests_method.__name__.upper(),
+                              request_url, log_body)
+
+        cache_key = None
+        if self.cache is not None and not stream:
+            if requests_method.__name__ == 'get':
+                cache_key = self.cache.key(uri, request_url, total_params,
+                                           total_headers)
+            else:
+                self.cache.invalidate(uri)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not MISS:
+                return cached
+        send_body, send_headers = self._compress(
+            requests_method, data, body, total_headers)
+        request_info = None
+        if self.hooks:
+            request_info = self._start_request(
+                requests_method.__name__.upper(), uri, send_body)
         try:
+            try:
+                return self._do_request(
+                    requests_method=requests_method, request_url=request_url,
+                    body=send_body, params=total_params, headers=send_headers,
+                    expected_status_code=expected_status_code, stream=stream,
+                    verify=self.get_request_verify(), timeout=timeout,
+                    cache_key=cache_key, request_info=request_info)
+            except exceptions.CloudifyClientError as e:
+                if send_body is body or e.status_code != 415:
+                    raise
+            # 415 Unsupported Media Type: the manager doesn't accept
+            # compressed requests, so send this one (and the next ones)
+            # uncompressed
+            self.logger.debug('Compressed request rejected, disabling '
+                              'request compression')
+            self.compress_min_size = None
+            if self.hooks:
+                request_info = self._start_request(
+                    requests_method.__name__.upper(), uri, body,
+                    self._retries + 1)
             return self._do_request(
                 requests_method=requests_method, request_url=request_url,
                 body=body, params=total_params, headers=total_headers,
                 expected_status_code=expected_status_code, stream=stream,
-                verify=self.get_request_verify(), timeout=timeout)
+                verify=self.get_request_verify(), timeout=timeout,
+                cache_key=cache_key, request_info=request_info)
         except requests.exceptions.SSLError as e:
             # Special handling: SSL Verification Error.
             # We'd have liked to use `__context__` but this isn't supported in
@@ -398,6 +528,41 @@ class HTTPClient(object):
         self.logger.debug('Setting `{0}` header: {1}'.format(key, value))
 
 
+def _gzip(body, compresslevel=DEFAULT_COMPRESS_LEVEL):
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    # wbits=31: with the gzip header and trailer
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _truncated(content, limit=DEBUG_BODY_LIMIT):
+    """content, cut to limit characters, for logging"""
+    if content is None or len(content) <= limit:
+        return content
+    return '{0!r}... ({1} bytes)'.format(content[:limit], len(content))
+
+
+def _body_size(body):
+    """Size of a request body, or None if it can't be known in advance"""
+    if body is None:
+        return 0
+    if isinstance(body, type(u'')):
+        return len(body.encode('utf-8'))
+    try:
+        return len(body)
+    except TypeError:
+        # a generator
+        return None
+
+
+def _response_size(response, stream):
+    if not stream:
+        return len(response.content)
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
 class StreamedResponse(object):
 
     def __init__(self, response):
@@ -407,6 +572,10 @@ class StreamedResponse(object):
     def headers(self):
         return self._response.headers
 
+    @property
+    def status_code(self):
+        return self._response.status_code
+
     def bytes_stream(self, chunk_size=8192):
         return self._response.iter_content(chunk_size)
 
@@ -425,7 +594,8 @@ class CloudifyClient(object):
                  api_version=DEFAULT_API_VERSION, headers=None,
                  query_params=None, cert=None, trust_all=False,
                  username=None, password=None, token=None, tenant=None,
-                 kerberos_env=None, timeout=None, session=None):
+                 kerberos_env=None, timeout=None, session=None, cache=None,
+                 hooks=None, compress_requests=None):
         """
         Creates a Cloudify client with the provided host and optional port.
 
@@ -446,6 +616,15 @@ class CloudifyClient(object):
         :param timeout: Requests timeout value. If not set, will default to
                         (5, None)- 5 seconds connect timeout, no read timeout.
         :param session: a requests.Session to use for all HTTP calls
+        :param cache: a cloudify_rest_client.cache.ResponseCache, to cache
+                      the responses of GET requests in
+        :param hooks: a list of cloudify_rest_client.hooks.RequestHooks, to
+                      call for every request sent
+        :param compress_requests: gzip the JSON bodies of POST, PUT and
+                      PATCH requests that are at least this many bytes, or
+                      at least COMPRESS_MIN_SIZE with True. The manager
+                      has to accept "Content-Encoding: gzip" requests;
+                      if it replies with 415, the client stops compressing.
         :return: Cloudify client instance.
         """
 
@@ -461,7 +640,8 @@ class CloudifyClient(object):
                                          headers, query_params, cert,
                                          trust_all, username, password,
                                          token, tenant, kerberos_env, timeout,
-                                         session)
+                                         session, cache, hooks,
+                                         compress_requests)
         self.blueprints = BlueprintsClient(self._client)
         self.permissions = PermissionsClient(self._client)
         self.snapshots = SnapshotsClient(self._client)
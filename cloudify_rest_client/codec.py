@@ -0,0 +1,133 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""JSON encoding and decoding of REST bodies and AMQP messages.
+
+Uses orjson if it is installed, and the stdlib json module otherwise.
+Set CFY_JSON_CODEC=json in the environment to always use the stdlib json,
+or call set_codec() to use another codec.
+"""
+
+import os
+import json
+
+CODEC_ENV = 'CFY_JSON_CODEC'
+_INFINITY = float('inf')
+
+
+class JSONCodec(object):
+    """The stdlib json codec"""
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+def _has_non_finite(obj):
+    """Does obj contain a NaN or infinite float?"""
+    values = [obj]
+    while values:
+        value = values.pop()
+        if isinstance(value, float):
+            if value != value or value in (_INFINITY, -_INFINITY):
+                return True
+        elif isinstance(value, dict):
+            values.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            values.extend(value)
+    return False
+
+
+class OrjsonCodec(JSONCodec):
+    """orjson, falling back to the stdlib json where they differ.
+
+    orjson doesn't serialize eg. non-string dict keys or integers over
+    64 bits, nor parse NaN, which the stdlib json does, so those are
+    retried with the stdlib json (and raise the same errors it would).
+    orjson serializes NaN and infinite floats as null, so when the output
+    has nulls, and the object has such floats, it is serialized with the
+    stdlib json instead, as NaN/Infinity.
+    """
+    name = 'orjson'
+
+    def __init__(self, orjson):
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        try:
+            data = self._orjson.dumps(obj)
+        except TypeError:
+            return super(OrjsonCodec, self).dumps(obj)
+        if b'null' in data and _has_non_finite(obj):
+            return super(OrjsonCodec, self).dumps(obj)
+        return data.decode('utf-8')
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except ValueError:
+            return super(OrjsonCodec, self).loads(data)
+
+
+def _load_codec(name=None):
+    name = name or os.environ.get(CODEC_ENV)
+    if name == JSONCodec.name:
+        return JSONCodec()
+    try:
+        import orjson
+    except ImportError:
+        if name == OrjsonCodec.name:
+            raise
+        return JSONCodec()
+    return OrjsonCodec(orjson)
+
+
+_codec = _load_codec()
+
+
+def get_codec():
+    return _codec
+
+
+def set_codec(codec):
+    """Use codec for all the JSON handling.
+
+    :param codec: a codec name ("json" or "orjson"), or an object with
+                  dumps and loads methods
+    :return: the previously used codec
+    """
+    global _codec
+    previous = _codec
+    if not hasattr(codec, 'loads'):
+        if codec not in (JSONCodec.name, OrjsonCodec.name):
+            raise ValueError('Unknown JSON codec: {0}'.format(codec))
+        codec = _load_codec(codec)
+    _codec = codec
+    return previous
+
+
+def dumps(obj):
+    """Serialize obj to a JSON string"""
+    return _codec.dumps(obj)
+
+
+def loads(data):
+    """Deserialize a JSON string or utf-8 bytes"""
+    return _codec.loads(data)
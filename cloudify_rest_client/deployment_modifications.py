@@ -13,7 +13,7 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.node_instances import NodeInstance
 
 
@@ -135,6 +135,14 @@ class DeploymentModificationsClient(object):
         items = [DeploymentModification(item) for item in response['items']]
         return ListResponse(items, response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the deployment modifications, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def start(self, deployment_id, nodes, context=None):
         """Start deployment modification.
 
@@ -14,15 +14,14 @@
 #    * limitations under the License.
 
 import os
-import json
 import shutil
 import tempfile
 
 from mimetypes import MimeTypes
 
-from cloudify_rest_client import utils
+from cloudify_rest_client import codec, utils
 from cloudify_rest_client._compat import urlquote, pathname2url, urlparse
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class DeploymentUpdate(dict):
@@ -126,6 +125,14 @@ class DeploymentUpdatesClient(object):
         items = [DeploymentUpdate(item) for item in response['items']]
         return ListResponse(items, response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the deployment updates, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def _update_from_blueprint(self,
                                deployment_id,
                                blueprint_path,
@@ -170,7 +177,7 @@ class DeploymentUpdatesClient(object):
         params = {}
         # all the inputs are passed through the query
         if inputs:
-            data_form['inputs'] = ('inputs', json.dumps(inputs), 'text/plain')
+            data_form['inputs'] = ('inputs', codec.dumps(inputs), 'text/plain')
 
         if application_file_name:
             params['application_file_name'] = urlquote(application_file_name)
@@ -15,7 +15,7 @@
 
 import warnings
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.constants import VisibilityState
 
 from .labels import Label
@@ -560,6 +560,14 @@ class DeploymentsClient(object):
         return ListResponse([Deployment(item) for item in response['items']],
                             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the deployments, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self,
             deployment_id,
             _include=None,
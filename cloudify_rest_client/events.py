@@ -13,10 +13,50 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import json
+import time
 import warnings
 from datetime import datetime
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.executions import Execution
+from cloudify_rest_client.responses import (
+    ListResponse,
+    ListIterator,
+    StreamedListResponse,
+)
+
+TAIL_BATCH_SIZE = 1000
+FOLLOW_POLL_INTERVAL = 0.5
+FOLLOW_MAX_POLL_INTERVAL = 5
+
+
+def _event_timestamp(event):
+    return event.get('@timestamp') or event.get('reported_timestamp') or \
+        event.get('timestamp')
+
+
+def _event_key(event):
+    """Identifies an event, to tell apart events with the same timestamp"""
+    if event.get('_storage_id') is not None:
+        return event['_storage_id']
+    return json.dumps(event, sort_keys=True, default=str)
+
+
+class EventsCursor(object):
+    """Where EventsClient.tail left off.
+
+    The timestamp of the last events returned, and the events with that
+    timestamp that were already returned: events are queried from that
+    timestamp (inclusive), so that events that were stored after the
+    previous query, with the same timestamp, aren't skipped.
+    """
+    def __init__(self, timestamp=None, seen=None):
+        self.timestamp = timestamp
+        self.seen = set(seen or ())
+
+    def __repr__(self):
+        return '<EventsCursor {0} ({1} seen)>'.format(
+            self.timestamp, len(self.seen))
 
 
 class EventsClient(object):
@@ -53,7 +93,8 @@ class EventsClient(object):
         return events, total_events
 
     def list(self, include_logs=False, message=None, from_datetime=None,
-             to_datetime=None, _include=None, sort=None, **kwargs):
+             to_datetime=None, _include=None, sort=None, _stream=False,
+             **kwargs):
         """List events
 
         :param include_logs: Whether to also get logs.
@@ -63,6 +104,8 @@ class EventsClient(object):
         :param to_datetime: search for events earlier or equal to datetime
         :param _include: return only an exclusive list of fields
         :param sort: Key for sorting the list.
+        :param _stream: decode the events while iterating over the
+                        response, see StreamedListResponse
         :return: dict with 'metadata' and 'items' fields
         """
 
@@ -74,9 +117,106 @@ class EventsClient(object):
                                     sort=sort,
                                     **kwargs)
 
-        response = self.api.get(uri, _include=_include, params=params)
+        response = self.api.get(uri, _include=_include, params=params,
+                                stream=_stream)
+        if _stream:
+            return StreamedListResponse(response)
         return ListResponse(response['items'], response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the events, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
+    def tail(self, cursor=None, include_logs=False,
+             batch_size=TAIL_BATCH_SIZE, **kwargs):
+        """The events stored since the cursor.
+
+        Unlike with offset paging, events stored while reading aren't
+        skipped nor returned twice.
+
+        :param cursor: an EventsCursor returned by the previous call, or
+                       None to start from the first event
+        :param include_logs: Whether to also get logs.
+        :param batch_size: how many events to get per request
+        :param kwargs: filters, as in `list`, eg. execution_id
+        :return: a tuple of the list of events (sorted by timestamp), and
+                 the cursor to pass to the next call
+        """
+        if cursor is None:
+            cursor = EventsCursor()
+        else:
+            cursor = EventsCursor(cursor.timestamp, cursor.seen)
+        events = []
+        offset = 0
+        while True:
+            page = self.list(include_logs=include_logs,
+                             from_datetime=cursor.timestamp,
+                             sort='@timestamp',
+                             _offset=offset,
+                             _size=batch_size,
+                             **kwargs)
+            advanced = False
+            for event in page:
+                key = _event_key(event)
+                timestamp = _event_timestamp(event)
+                if timestamp == cursor.timestamp:
+                    if key in cursor.seen:
+                        continue
+                    cursor.seen.add(key)
+                else:
+                    cursor.timestamp = timestamp
+                    cursor.seen = set([key])
+                    advanced = True
+                events.append(event)
+            if len(page) < batch_size:
+                return events, cursor
+            # query from the new cursor; if all the events in the page had
+            # the cursor's timestamp, there's more of them than a page
+            offset = 0 if advanced else offset + batch_size
+
+    def follow(self, execution_id, include_logs=False,
+               poll_interval=FOLLOW_POLL_INTERVAL,
+               max_poll_interval=FOLLOW_MAX_POLL_INTERVAL, **kwargs):
+        """Yield the execution's events as they are stored, until it ends.
+
+        Polls for new events using `tail`. While there are none, the time
+        between the polls doubles, up to max_poll_interval.
+
+        :param execution_id: follow the events of this execution
+        :param include_logs: Whether to also get logs.
+        :param poll_interval: seconds to wait between polls
+        :param max_poll_interval: wait at most this long between polls
+        :param kwargs: passed to `tail`
+        """
+        cursor = None
+        interval = poll_interval
+        ended = False
+        while True:
+            events, cursor = self.tail(cursor, include_logs=include_logs,
+                                       execution_id=execution_id, **kwargs)
+            for event in events:
+                yield event
+            if events:
+                interval = poll_interval
+            elif ended:
+                # polled once more after the execution ended, to get
+                # the events that were stored late
+                return
+            else:
+                ended = self._execution_ended(execution_id)
+                if not ended:
+                    interval = min(interval * 2, max_poll_interval)
+            time.sleep(interval)
+
+    def _execution_ended(self, execution_id):
+        execution = self.api.get('/executions/{0}'.format(execution_id),
+                                 _include=['status'])
+        return execution['status'] in Execution.END_STATES
+
     def create(self, events=None, logs=None, execution_id=None):
         """Create events & logs
 
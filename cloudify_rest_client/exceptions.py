@@ -293,6 +293,10 @@ class ForbiddenWhileCancelling(CloudifyClientError):
     ERROR_CODE = 'forbidden_while_cancelling'
 
 
+class ChecksumMismatchError(CloudifyClientError):
+    """Raised when a downloaded file doesn't match its expected checksum"""
+
+
 ERROR_MAPPING = dict([
     (error.ERROR_CODE, error)
     for error in [
@@ -1,4 +1,4 @@
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class ExecutionSchedule(dict):
@@ -247,6 +247,14 @@ class ExecutionSchedulesClient(object):
                              for item in response['items']],
                             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the execution schedules, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self, schedule_id, deployment_id, _include=None):
         """Get an execution schedule by its id.
 
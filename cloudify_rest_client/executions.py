@@ -15,7 +15,7 @@
 
 import warnings
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class Execution(dict):
@@ -207,6 +207,14 @@ class ExecutionGroupsClient(object):
             [ExecutionGroup(item) for item in response['items']],
             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the execution groups, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self, execution_group_id):
         response = self.api.get(
             '/execution-groups/{0}'.format(execution_group_id))
@@ -343,6 +351,14 @@ class ExecutionsClient(object):
             response['metadata']
         )
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the executions, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self, execution_id, _include=None):
         """Get execution by its id.
 
@@ -1,4 +1,4 @@
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.constants import VisibilityState
 
 
@@ -88,6 +88,14 @@ class FiltersClient(object):
         return ListResponse([Filter(item) for item in response['items']],
                             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the filters, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self, filter_id):
         response = self.api.get('{0}/{1}'.format(self.uri, filter_id))
         return Filter(response)
@@ -0,0 +1,97 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# the fixed (non-id) path segments of the REST API endpoints, that are
+# kept as they are in RequestInfo.endpoint; any other segment is an id
+ENDPOINT_WORDS = frozenset([
+    'activate', 'active', 'agents', 'archive', 'audit', 'blueprints',
+    'brokers', 'capabilities', 'cluster-status', 'config', 'context',
+    'db-nodes', 'deactivate', 'deployment-groups',
+    'deployment-modifications', 'deployment-updates', 'deployments',
+    'evaluate', 'events', 'execution-groups', 'execution-schedules',
+    'executions', 'export', 'filters', 'finalize', 'finish', 'functions',
+    'import', 'initiate', 'inter-deployment-dependencies', 'labels', 'ldap',
+    'license', 'license-check', 'maintenance', 'managers', 'node-instances',
+    'nodes', 'operations', 'outputs', 'permissions', 'plugins',
+    'plugins-updates', 'provider', 'restore', 'rollback', 'searches',
+    'secrets', 'set-site', 'set-visibility', 'share', 'should-start',
+    'sites', 'snapshot-status', 'snapshots', 'status', 'summary',
+    'tasks_graphs', 'tenants', 'tokens', 'unlock', 'update', 'user',
+    'user-groups', 'user-tokens', 'users', 'validate', 'version',
+    'workflows',
+])
+
+
+def endpoint_template(uri):
+    """The endpoint a URI is for, with the ids replaced by "{id}".
+
+    eg. "/deployments/d1/outputs" is for "/deployments/{id}/outputs"
+    """
+    segments = uri.split('?', 1)[0].strip('/').split('/')
+    return '/' + '/'.join(
+        segment if index == 0 or segment in ENDPOINT_WORDS else '{id}'
+        for index, segment in enumerate(segments))
+
+
+class RequestInfo(object):
+    """A request sent by the client, as passed to the RequestHooks.
+
+    The response attributes are set before after_response is called:
+    status_code is None if no response was received at all (eg. the
+    connection failed, or timed out), and then `error` is the exception.
+    bytes_received is None for streamed responses, unless the server
+    sent a Content-Length.
+    """
+    def __init__(self, method, uri, host, bytes_sent=None, retries=0):
+        self.method = method
+        self.uri = uri
+        self.host = host
+        self.bytes_sent = bytes_sent
+        self.retries = retries
+        self.status_code = None
+        self.latency = None
+        self.bytes_received = None
+        self.error = None
+
+    @property
+    def endpoint(self):
+        return endpoint_template(self.uri)
+
+    def __repr__(self):
+        return '<RequestInfo {0} {1} {2}>'.format(
+            self.method, self.uri, self.status_code)
+
+
+class RequestHooks(object):
+    """Callbacks for the requests sent by a CloudifyClient.
+
+    Pass a list of these as the `hooks` argument of the client, and
+    override the methods of interest. The hooks are called in the thread
+    that sends the request, and exceptions raised from them are not
+    caught.
+    """
+    def before_request(self, request):
+        """Called with a RequestInfo before the request is sent"""
+
+    def after_response(self, request):
+        """Called with the RequestInfo, once the response was received
+        (or the request failed)
+        """
+
+    def on_retry(self, request, error):
+        """Called when a request is going to be sent again (eg. to another
+        manager of a cluster), with the RequestInfo of the failed attempt
+        and the reason
+        """
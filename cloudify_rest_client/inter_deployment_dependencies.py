@@ -15,7 +15,7 @@
 from cloudify.deployment_dependencies import (create_deployment_dependency,
                                               DEPENDENCY_CREATOR)
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class InterDeploymentDependency(dict):
@@ -159,6 +159,14 @@ class InterDeploymentDependencyClient(object):
                                 params=params)
         return self._wrap_list(response)
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the dependencies, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def restore(self, deployment_id, update_service_composition):
         """
         Updating the inter deployment dependencies table from the specified
@@ -0,0 +1,124 @@
+########
+# Copyright (c) 2021 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Incremental decoding of a JSON object holding a (large) list.
+
+Only one element of the list, and at most one chunk of the body, are held
+in memory at a time. The elements are decoded using the stdlib json
+decoder's raw_decode, one at a time.
+"""
+
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+class _Reader(object):
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buf = u''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            raise ValueError('Unexpected end of the JSON document')
+        try:
+            text = self._text_decoder.decode(next(self._chunks))
+        except StopIteration:
+            self._eof = True
+            text = self._text_decoder.decode(b'', True)
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+    def _skip_whitespace(self):
+        while True:
+            while (self._pos < len(self._buf) and
+                    self._buf[self._pos] in _WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return
+            self._fill()
+
+    def char(self, expected=None):
+        """Consume the next non-whitespace character"""
+        self._skip_whitespace()
+        char = self._buf[self._pos]
+        if expected is not None and char not in expected:
+            raise ValueError('Expected one of {0!r}, got {1!r}'
+                             .format(expected, char))
+        self._pos += 1
+        return char
+
+    def peek(self):
+        self._skip_whitespace()
+        return self._buf[self._pos]
+
+    def value(self):
+        """Decode the next JSON value, reading more chunks as needed"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(
+                    self._buf, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+                self._fill()
+                continue
+            if not self._eof and (end == len(self._buf) or
+                                  self._buf[end] in _NUMBER_CHARS):
+                # a number cut by the end of the buffer, eg. "1." of
+                # "1.5", decodes successfully but partially
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+
+def iter_list_items(chunks, key='items', on_member=None):
+    """Yield the elements of the `key` list of the JSON object in chunks.
+
+    :param chunks: iterable of bytes, the utf-8 encoded JSON object
+    :param key: name of the member holding the list
+    :param on_member: called with (name, value) for each of the other
+                      members of the object, as soon as they're decoded
+    """
+    reader = _Reader(chunks)
+    reader.char('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.char(':')
+        if name == key:
+            reader.char('[')
+            if reader.peek() == ']':
+                reader.char()
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.char(',]') == ']':
+                        break
+        else:
+            value = reader.value()
+            if on_member is not None:
+                on_member(name, value)
+        if reader.char(',}') == '}':
+            return
@@ -14,7 +14,11 @@
 #    * limitations under the License.
 import warnings
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import (
+    ListResponse,
+    ListIterator,
+    StreamedListResponse,
+)
 
 
 class NodeInstance(dict):
@@ -205,7 +209,7 @@ class NodeInstancesClient(object):
 
         return params
 
-    def list(self, _include=None, **kwargs):
+    def list(self, _include=None, _stream=False, **kwargs):
         """
         Returns a list of node instances which belong to the deployment
         identified by the provided deployment id.
@@ -220,6 +224,8 @@ class NodeInstancesClient(object):
         :param _include: List of fields to include in response.
         :param sort: Key for sorting the list.
         :param is_descending: True for descending order, False for ascending.
+        :param _stream: decode the node instances while iterating over
+                        the response, see StreamedListResponse
         :param kwargs: Optional filter fields. for a list of available fields
                see the REST service's models.DeploymentNodeInstance.fields
         :return: Node instances.
@@ -229,13 +235,24 @@ class NodeInstancesClient(object):
         params = self._create_filters(**kwargs)
         response = self.api.get('/{self._uri_prefix}'.format(self=self),
                                 params=params,
-                                _include=_include)
+                                _include=_include,
+                                stream=_stream)
+        if _stream:
+            return StreamedListResponse(response, self._wrapper_cls)
 
         return ListResponse(
             [self._wrapper_cls(item) for item in response['items']],
             response['metadata']
         )
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the node instances, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def search(self, ids, all_tenants=False):
         """Search node instances by their IDs.
 
@@ -14,7 +14,7 @@
 #    * limitations under the License.
 import warnings
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class Node(dict):
@@ -198,6 +198,14 @@ class NodesClient(object):
             response['metadata']
         )
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the nodes, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def get(self, deployment_id, node_id, _include=None,
             evaluate_functions=False):
         """
@@ -1,4 +1,8 @@
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import (
+    ListResponse,
+    ListIterator,
+    StreamedListResponse,
+)
 
 
 class Operation(dict):
@@ -48,18 +52,28 @@ class OperationsClient(object):
         self._uri_prefix = 'operations'
         self._wrapper_cls = Operation
 
-    def list(self, graph_id, _offset=None, _size=None):
+    def list(self, graph_id, _offset=None, _size=None, _stream=False):
         params = {'graph_id': graph_id}
         if _offset is not None:
             params['_offset'] = _offset
         if _size is not None:
             params['_size'] = _size
         response = self.api.get('/{self._uri_prefix}'.format(self=self),
-                                params=params)
+                                params=params, stream=_stream)
+        if _stream:
+            return StreamedListResponse(response, self._wrapper_cls)
         return ListResponse(
             [self._wrapper_cls(item) for item in response['items']],
             response['metadata'])
 
+    def iter(self, graph_id, **kwargs):
+        """Lazily iterate over all the operations of a graph, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, graph_id, **kwargs)
+
     def get(self, operation_id):
         response = self.api.get('/{self._uri_prefix}/{id}'
                                 .format(self=self, id=operation_id))
@@ -14,11 +14,10 @@
 #    * limitations under the License.
 
 import os
-import contextlib
 
 from cloudify_rest_client import bytes_stream_utils
 from cloudify_rest_client._compat import urlparse
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.constants import VisibilityState
 
 
@@ -233,6 +232,14 @@ class PluginsClient(object):
                                 params=params)
         return self._wrap_list(response)
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the plugins, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def delete(self, plugin_id, force=False):
         """
         Deletes the plugin whose id matches the provided plugin id.
@@ -294,22 +301,25 @@ class PluginsClient(object):
         else:
             return self._wrapper_cls(response)
 
-    def download(self, plugin_id, output_file, progress_callback=None):
+    def download(self, plugin_id, output_file, progress_callback=None,
+                 workers=1, checksum=None):
         """Downloads a previously uploaded plugin archive from the manager
 
         :param plugin_id: The plugin ID of the plugin to be downloaded.
         :param output_file: The file path of the downloaded plugin file
         :param progress_callback: Callback function - can be used to print
         a progress bar
+        :param workers: download files larger than 64MB in this many
+                        concurrent ranges
+        :param checksum: "<algorithm>:<hexdigest>" (eg. "sha256:ab12..")
+                         to verify the downloaded file against
         :return: The file path of the downloaded plugin.
         """
         assert plugin_id
         uri = '/plugins/{0}/archive'.format(plugin_id)
-        with contextlib.closing(self.api.get(uri, stream=True)) as response:
-            output_file = bytes_stream_utils.write_response_stream_to_file(
-                response, output_file, progress_callback=progress_callback)
-
-            return output_file
+        return bytes_stream_utils.download_file(
+            self.api, uri, output_file, progress_callback=progress_callback,
+            workers=workers, checksum=checksum)
 
     def set_global(self, plugin_id):
         """
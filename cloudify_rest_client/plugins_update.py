@@ -15,7 +15,7 @@
 
 import warnings
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class PluginsUpdate(dict):
@@ -106,6 +106,14 @@ class PluginsUpdateClient(object):
                                 params=params)
         return self._wrap_list(response)
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the plugins updates, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def update_plugins(self, blueprint_id, force=False, plugin_names=None,
                        to_latest=None, all_to_latest=True,
                        to_minor=None, all_to_minor=False,
@@ -13,6 +13,13 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import threading
+
+from cloudify_rest_client.json_stream import iter_list_items
+from cloudify_rest_client.utils import map_concurrently
+
+DEFAULT_LIST_WORKERS = 4
+
 
 class Metadata(dict):
     """
@@ -76,3 +83,216 @@ class ListResponse(object):
         if cmp is not None:
             raise TypeError('cmp is not supported. Use key instead.')
         return self.items.sort(key=key, reverse=reverse)
+
+
+class StreamedListResponse(object):
+    """A list response that is decoded while it is being iterated over.
+
+    Only one item is held in memory at a time, so that huge listings
+    (eg. fetched with _get_all_results) can be processed in constant
+    memory. The response can only be iterated over once.
+    `metadata` is set as soon as it is read: the REST service sends it
+    after the items, so it is available once all the items were read.
+
+    :param response: a StreamedResponse, of a list request
+    :param wrapper: the model class to wrap each item with
+    """
+    chunk_size = 65536
+
+    def __init__(self, response, wrapper=None):
+        self._response = response
+        self._wrapper = wrapper
+        self._iterated = False
+        self.metadata = None
+
+    def _on_member(self, name, value):
+        if name == 'metadata':
+            self.metadata = Metadata(value)
+
+    def __iter__(self):
+        if self._iterated:
+            raise RuntimeError('A streamed list can only be iterated once')
+        self._iterated = True
+        try:
+            for item in iter_list_items(
+                    self._response.bytes_stream(self.chunk_size),
+                    on_member=self._on_member):
+                yield self._wrapper(item) if self._wrapper else item
+        finally:
+            self.close()
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ListIterator(object):
+    """Lazily iterate over all the items of a paginated list endpoint.
+
+    Pages are requested from `list_method` using the `_offset` and `_size`
+    parameters, only once the items of the previous page were consumed,
+    so that at most one page (two, when prefetching) is held in memory.
+
+    `offset` is the position of the next item to be returned, and can be
+    passed back as `_offset` to resume iterating later on. It is advanced
+    both by iterating over the items and by iterating over `pages()`, so
+    the two can be mixed, and a new iteration continues where the
+    previous one stopped.
+
+    The pages are always decoded in full, so `_stream` is not supported.
+
+    :param list_method: the client's list method, eg. `client.nodes.list`
+    :param _offset: the position of the first item to return
+    :param _size: the page size; if not given, the server's default is used
+    :param _prefetch: fetch the next page in a background thread, while
+                      the current page is being processed
+    :param args: positional arguments for `list_method`
+    :param kwargs: additional arguments (filters etc.) for `list_method`
+    """
+
+    def __init__(self, list_method, *args, **kwargs):
+        self._list_method = list_method
+        self._args = args
+        self.offset = kwargs.pop('_offset', None) or 0
+        self.size = kwargs.pop('_size', None)
+        self.prefetch = kwargs.pop('_prefetch', False)
+        if kwargs.pop('_stream', False):
+            raise ValueError('ListIterator does not support _stream')
+        self._kwargs = kwargs
+        self.metadata = None
+
+    def _fetch(self, offset):
+        kwargs = self._kwargs.copy()
+        kwargs['_offset'] = offset
+        if self.size is not None:
+            kwargs['_size'] = self.size
+        return self._list_method(*self._args, **kwargs)
+
+    def pages(self):
+        """Generate the pages (ListResponses), starting at `offset`.
+
+        `offset` is advanced past each page as it is returned.
+        """
+        for page in self._pages():
+            self.offset += len(page.items)
+            yield page
+
+    def _pages(self):
+        offset = self.offset
+        pending = _PageFetch(self._fetch, offset)
+        while pending is not None:
+            page = pending.result()
+            self.metadata = page.metadata
+            if not page.items:
+                return
+            offset += len(page.items)
+            pending = None
+            # endpoints that are not paginated, return everything at once
+            total = page.metadata.pagination.get('total')
+            if total is not None and offset < int(total):
+                pending = _PageFetch(self._fetch, offset)
+                if self.prefetch:
+                    pending.start()
+            yield page
+
+    def __iter__(self):
+        for page in self._pages():
+            for item in page:
+                self.offset += 1
+                yield item
+
+
+class _PageFetch(object):
+    """Call `fetch(offset)`, either in a thread (if started), or when
+    the result is requested.
+    """
+
+    def __init__(self, fetch, offset):
+        self._fetch = fetch
+        self._offset = offset
+        self._thread = None
+        self._done = False
+        self._result = None
+        self._error = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run,
+            name='ListIterator-prefetch-{0}'.format(self._offset))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def run(self):
+        try:
+            self._result = self._fetch(self._offset)
+        except Exception as e:
+            self._error = e
+        self._done = True
+
+    def result(self):
+        if self._thread is not None:
+            self._thread.join()
+        elif not self._done:
+            self.run()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def get_all_results(list_method, *args, **kwargs):
+    """Fetch all the pages of a paginated list, concurrently.
+
+    The first page is fetched to learn the total number of items and the
+    page size, and the remaining pages are then fetched using up to
+    `_workers` threads.
+
+    The pages are separate queries, so they are sorted by `sort` (the id,
+    unless given) for the order to be the same in all of them. If the
+    list changed in the meantime, so that items were returned twice or
+    not at all, the whole list is fetched again in a single response,
+    using `_get_all_results`.
+
+    :param list_method: the client's list method, eg. `client.nodes.list`;
+                        it must accept `sort`
+    :param _size: the page size; if not given, the server's default is used
+    :param _workers: how many pages to fetch at once
+    :param args: positional arguments for `list_method`
+    :param kwargs: additional arguments (filters etc.) for `list_method`
+    :return: a ListResponse with all the items, in order
+    """
+    workers = kwargs.pop('_workers', None) or DEFAULT_LIST_WORKERS
+    kwargs.pop('_offset', None)
+    kwargs.setdefault('sort', 'id')
+    size = kwargs.pop('_size', None)
+    if size is None:
+        first = list_method(*args, _offset=0, **kwargs)
+    else:
+        first = list_method(*args, _offset=0, _size=size, **kwargs)
+
+    pagination = first.metadata.pagination
+    total = pagination.get('total')
+    if not first.items or total is None or len(first.items) >= int(total):
+        return first
+    total = int(total)
+    size = int(size or pagination.get('size') or len(first.items))
+
+    def _fetch_page(offset):
+        return list_method(*args, _offset=offset, _size=size,
+                           **kwargs).items
+
+    offsets = range(len(first.items), total, size)
+    items = list(first.items)
+    for page in map_concurrently(_fetch_page, offsets, workers):
+        items.extend(page)
+    ids = set(item.get('id') for item in items)
+    if len(ids) != len(items) or len(items) != total:
+        return list_method(*args, _get_all_results=True, **kwargs)
+    metadata = dict(first.metadata)
+    metadata['pagination'] = {'offset': 0, 'size': len(items),
+                              'total': total}
+    return ListResponse(items, metadata)
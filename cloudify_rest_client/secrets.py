@@ -13,7 +13,7 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.constants import VisibilityState
 
 
@@ -186,6 +186,14 @@ class SecretsClient(object):
         return ListResponse([Secret(item) for item in response['items']],
                             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the secrets, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def delete(self, key):
         self.api.delete('/secrets/{0}'.format(key))
 
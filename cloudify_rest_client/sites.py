@@ -13,7 +13,7 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 from cloudify_rest_client.constants import VisibilityState
 
 
@@ -138,6 +138,14 @@ class SitesClient(object):
             response['metadata']
         )
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the sites, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def delete(self, name):
         """
         Deletes a site.
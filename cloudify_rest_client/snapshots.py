@@ -14,12 +14,11 @@
 #    * limitations under the License.
 
 import os
-import contextlib
 
 from cloudify_rest_client import bytes_stream_utils
 from cloudify_rest_client._compat import urlparse
 from cloudify_rest_client.executions import Execution
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 
 class Snapshot(dict):
@@ -107,6 +106,14 @@ class SnapshotsClient(object):
         return ListResponse([Snapshot(item) for item in response['items']],
                             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the snapshots, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def create(self,
                snapshot_id,
                include_credentials,
@@ -208,7 +215,8 @@ class SnapshotsClient(object):
                                 expected_status_code=201)
         return Snapshot(response)
 
-    def download(self, snapshot_id, output_file, progress_callback=None):
+    def download(self, snapshot_id, output_file, progress_callback=None,
+                 workers=1, checksum=None):
         """
         Downloads a previously created/uploaded snapshot archive from
         Cloudify's manager.
@@ -217,15 +225,16 @@ class SnapshotsClient(object):
         :param progress_callback: Callback function for printing a progress bar
         :param output_file: The file path of the downloaded snapshot file
          (optional)
+        :param workers: download files larger than 64MB in this many
+                        concurrent ranges
+        :param checksum: "<algorithm>:<hexdigest>" (eg. "sha256:ab12..")
+                         to verify the downloaded file against
         :return: The file path of the downloaded snapshot.
         """
         uri = '/snapshots/{0}/archive'.format(snapshot_id)
-
-        with contextlib.closing(self.api.get(uri, stream=True)) as response:
-            output_file = bytes_stream_utils.write_response_stream_to_file(
-                response, output_file, progress_callback=progress_callback)
-
-            return output_file
+        return bytes_stream_utils.download_file(
+            self.api, uri, output_file, progress_callback=progress_callback,
+            workers=workers, checksum=checksum)
 
     def update_status(self, snapshot_id, status, error=None):
         """
@@ -13,7 +13,7 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from cloudify_rest_client.responses import ListResponse
+from cloudify_rest_client.responses import ListResponse, ListIterator
 
 DEFAULT_TENANT_ROLE = 'user'
 
@@ -109,6 +109,14 @@ class TenantsClient(object):
         return ListResponse([Tenant(item) for item in response['items']],
                             response['metadata'])
 
+    def iter(self, **kwargs):
+        """Lazily iterate over all the tenants, page by page.
+
+        Takes the same arguments as `list`, and the `_offset`, `_size`
+        and `_prefetch` pagination arguments of ``ListIterator``.
+        """
+        return ListIterator(self.list, **kwargs)
+
     def create(self, tenant_name):
         response = self.api.post(
             '/tenants/{0}'.format(tenant_name),
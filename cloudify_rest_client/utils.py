@@ -1,55 +1,338 @@
 import os
 import sys
+import zlib
 import stat
+import shutil
+import hashlib
 import tarfile
+import tempfile
+import threading
+import multiprocessing
 from os.path import expanduser
 
+from cloudify_rest_client._compat import queue, scandir
+
 SUPPORTED_ARCHIVE_TYPES = ['zip', 'tar', 'tar.gz', 'tar.bz2']
+ARCHIVE_CACHE_ENV = 'CFY_BLUEPRINT_ARCHIVE_CACHE'
+ARCHIVE_CACHE_MAX_ENTRIES = 10
+DEFAULT_COMPRESS_LEVEL = 6
+GZIP_BLOCK_SIZE = 1024 * 1024
 
 
-def tar_blueprint(blueprint_path, dest_dir):
+def tar_blueprint(blueprint_path, dest_dir, folder=None, cache_dir=None,
+                  workers=None):
     """
     creates a tar archive out of a blueprint dir.
 
     :param blueprint_path: the path to the blueprint.
     :param dest_dir: destination dir for the path
+    :param folder: the `scan_folder` result of the blueprint dir, if it
+                   was already scanned
+    :param cache_dir: keep archives in this directory, and reuse them when
+                      the blueprint dir didn't change. Defaults to the
+                      CFY_BLUEPRINT_ARCHIVE_CACHE environment variable,
+                      if set.
+    :param workers: how many threads to compress with (default: the number
+                    of CPUs)
     :return: the path for the dir.
     """
     blueprint_path = expanduser(blueprint_path)
     app_name = os.path.basename(os.path.splitext(blueprint_path)[0])
     blueprint_directory = os.path.dirname(blueprint_path) or os.getcwd()
-    return tar_file(blueprint_directory, dest_dir, app_name)
+    if cache_dir is None:
+        cache_dir = os.environ.get(ARCHIVE_CACHE_ENV)
+    return tar_file(blueprint_directory, dest_dir, app_name, folder=folder,
+                    cache_dir=cache_dir, workers=workers)
+
+
+def _reset_tarinfo(tarinfo):
+    """Set all tar'd files to be world-readable, so that other services
+    (nginx) can access the files uploaded by restservice (cfyuser).
+    """
+    tarinfo.mode = tarinfo.mode | stat.S_IROTH
+    if stat.S_ISDIR(tarinfo.mode):
+        # directories must also have u+w so that files can be stored in
+        # them, and have the execute bit set so that permissions can be
+        # exercised for them
+        tarinfo.mode = (tarinfo.mode | stat.S_IWUSR |
+                        stat.S_IXUSR | stat.S_IXOTH)
 
+    return tarinfo
 
-def tar_file(file_to_tar, destination_dir, tar_name=''):
+
+def tar_file(file_to_tar, destination_dir, tar_name='', folder=None,
+             cache_dir=None, workers=None,
+             compresslevel=DEFAULT_COMPRESS_LEVEL):
     """
     tar a file into a desintation dir.
     :param file_to_tar:
     :param destination_dir:
     :param tar_name: optional tar name.
+    :param folder: the `scan_folder` result of file_to_tar, if it's a
+                   directory that was already scanned
+    :param cache_dir: optional directory of archives by the tree hash of
+                      file_to_tar, to reuse if it didn't change
+    :param workers: how many threads to compress with
+    :param compresslevel: the gzip compression level
     :return:
     """
-    def _reset_tarinfo(tarinfo):
-        """Set all tar'd files to be world-readable, so that other services
-        (nginx) can access the files uploaded by restservice (cfyuser).
-        """
-        tarinfo.mode = tarinfo.mode | stat.S_IROTH
-        if stat.S_ISDIR(tarinfo.mode):
-            # directories must also have u+w so that files can be stored in
-            # them, and have the execute bit set so that permissions can be
-            # exercised for them
-            tarinfo.mode = (tarinfo.mode | stat.S_IWUSR |
-                            stat.S_IXUSR | stat.S_IXOTH)
-
-        return tarinfo
-
     tar_name = tar_name or os.path.basename(file_to_tar)
     tar_path = os.path.join(destination_dir, '{0}.tar.gz'.format(tar_name))
-    with tarfile.open(tar_path, "w:gz", dereference=True) as tar:
-        tar.add(file_to_tar, arcname=tar_name, filter=_reset_tarinfo)
+    if not os.path.isdir(file_to_tar):
+        with tarfile.open(tar_path, "w:gz", dereference=True) as tar:
+            tar.add(file_to_tar, arcname=tar_name, filter=_reset_tarinfo)
+        return tar_path
+
+    if folder is None:
+        folder = scan_folder(file_to_tar)
+    cache = ArchiveCache(cache_dir) if cache_dir else None
+    if cache:
+        key = cache.key(folder, tar_name, compresslevel)
+        if cache.get(key, tar_path):
+            return tar_path
+
+    with open(tar_path, 'wb') as f:
+        with ParallelGzipWriter(f, workers=workers,
+                                compresslevel=compresslevel) as gz:
+            with tarfile.open(fileobj=gz, mode='w|',
+                              dereference=True) as tar:
+                tar.add(file_to_tar, arcname=tar_name, recursive=False,
+                        filter=_reset_tarinfo)
+                for entry in folder.entries:
+                    tar.add(entry.path,
+                            arcname=os.path.join(tar_name, entry.relpath),
+                            recursive=False, filter=_reset_tarinfo)
+    if cache:
+        cache.put(key, tar_path)
     return tar_path
 
 
+class ParallelGzipWriter(object):
+    """A file-like object that gzips what's written to it using threads.
+
+    The data is compressed in blocks of block_size, each in a separate
+    thread (zlib releases the GIL), and each into a separate gzip member.
+    A concatenation of gzip members is a valid gzip file, which gzip,
+    tarfile etc. read as a whole.
+    """
+    def __init__(self, fileobj, workers=None, block_size=GZIP_BLOCK_SIZE,
+                 compresslevel=DEFAULT_COMPRESS_LEVEL):
+        self._fileobj = fileobj
+        self._workers = workers or multiprocessing.cpu_count()
+        self._block_size = block_size
+        self._compresslevel = compresslevel
+        self._buffer = []
+        self._buffered = 0
+        self._blocks = []
+        self._closed = False
+
+    def _compress(self, data):
+        compressor = zlib.compressobj(
+            self._compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def _flush_blocks(self):
+        if len(self._blocks) == 1:
+            compressed = [self._compress(self._blocks[0])]
+        else:
+            compressed = map_concurrently(
+                self._compress, self._blocks, self._workers)
+        for block in compressed:
+            self._fileobj.write(block)
+        self._blocks = []
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._block_size:
+            data = b''.join(self._buffer)
+            for offset in range(0, len(data), self._block_size):
+                self._blocks.append(data[offset:offset + self._block_size])
+            self._buffer = []
+            self._buffered = 0
+            if len(self._blocks[-1]) < self._block_size:
+                last = self._blocks.pop()
+                self._buffer = [last]
+                self._buffered = len(last)
+            if len(self._blocks) >= self._workers:
+                self._flush_blocks()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._buffered or not self._blocks:
+            # always write at least one member, so that an empty input
+            # is still a valid gzip file
+            self._blocks.append(b''.join(self._buffer))
+        self._buffer = []
+        self._flush_blocks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FolderEntry(object):
+    """A file or directory found by scan_folder"""
+    __slots__ = ('path', 'relpath', 'size', 'mtime', 'mode', 'is_dir')
+
+    def __init__(self, path, relpath, size, mtime, mode, is_dir):
+        self.path = path
+        self.relpath = relpath
+        self.size = size
+        self.mtime = mtime
+        self.mode = mode
+        self.is_dir = is_dir
+
+
+class ScannedFolder(object):
+    """The result of scan_folder.
+
+    :ivar size: the total size of the directories and the regular
+                (not symlinked) files in the folder
+    :ivar files: the number of files and directories in the folder
+    :ivar entries: FolderEntry objects, in the order to archive them
+    """
+    def __init__(self, path, size, files, entries):
+        self.path = path
+        self.size = size
+        self.files = files
+        self.entries = entries
+
+    def tree_hash(self):
+        """A hash of the names, modes and contents of the entries.
+
+        The file contents are read and hashed, rather than trusting their
+        sizes and mtimes: those are kept by eg. `cp -p` or `rsync -t`, so
+        a changed file could look unchanged.
+        """
+        digest = hashlib.sha256()
+        for entry in self.entries:
+            digest.update(repr((entry.relpath, entry.mode,
+                                entry.is_dir)).encode('utf-8'))
+            if not entry.is_dir and stat.S_ISREG(entry.mode):
+                digest.update(_file_hash(entry.path).encode('ascii'))
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(GZIP_BLOCK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_dir(path):
+    """(name, path, is_dir, is_symlink, stat) for the entries of path"""
+    if scandir is not None:
+        entries = ((entry.name, entry.path, entry.is_dir(),
+                    entry.is_symlink()) for entry in scandir(path))
+    else:
+        entries = ((name, os.path.join(path, name),
+                    os.path.isdir(os.path.join(path, name)),
+                    os.path.islink(os.path.join(path, name)))
+                   for name in os.listdir(path))
+    for name, entry_path, is_dir, is_symlink in entries:
+        try:
+            st = os.stat(entry_path)
+        except OSError:
+            # a broken symlink
+            st = os.lstat(entry_path)
+        yield name, entry_path, is_dir, is_symlink, st
+
+
+def scan_folder(path):
+    """Walk the folder once, collecting what's needed to validate,
+    archive and hash it (see ScannedFolder).
+
+    The entries are in the order tarfile.add would add them in.
+    """
+    entries = []
+    totals = {'size': os.path.getsize(path), 'files': 0}
+
+    def _scan(directory, relative):
+        children = sorted(_iter_dir(directory), key=lambda c: c[0])
+        totals['files'] += len(children)
+        for name, entry_path, is_dir, is_symlink, st in children:
+            relpath = os.path.join(relative, name)
+            entries.append(FolderEntry(entry_path, relpath, st.st_size,
+                                       st.st_mtime, st.st_mode, is_dir))
+            if is_dir:
+                totals['size'] += st.st_size
+                _scan(entry_path, relpath)
+            elif not is_symlink and stat.S_ISREG(st.st_mode):
+                totals['size'] += st.st_size
+
+    _scan(path, '')
+    return ScannedFolder(path, totals['size'], totals['files'], entries)
+
+
+class ArchiveCache(object):
+    """Archives of blueprint folders, by the hash of the folder's
+    contents (see ScannedFolder.tree_hash).
+
+    Keeps up to max_entries archives, evicting the least recently used.
+    """
+    def __init__(self, directory, max_entries=ARCHIVE_CACHE_MAX_ENTRIES):
+        self.directory = expanduser(directory)
+        self.max_entries = max_entries
+
+    def key(self, folder, tar_name, compresslevel):
+        digest = hashlib.sha256(folder.tree_hash().encode('ascii'))
+        digest.update(u'{0}\0{1}'.format(
+            tar_name, compresslevel).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, '{0}.tar.gz'.format(key))
+
+    def get(self, key, destination):
+        """Copy the archive stored at key to destination, if there is one.
+
+        It is copied rather than hard-linked, so that changing the
+        destination in place can't change the cached archive.
+        """
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, destination)
+            os.utime(path, None)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def put(self, key, archive):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                         suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(archive, temp_path)
+        os.rename(temp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        archives = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.tar.gz'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                archives.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        archives.sort(reverse=True)
+        for _, path in archives[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
 def is_supported_archive_type(blueprint_path):
 
     extensions = ['.{0}'.format(ext) for ext in SUPPORTED_ARCHIVE_TYPES]
@@ -63,17 +346,44 @@ def is_kerberos_env():
 
 
 def get_folder_size_and_files(path):
-    size = os.path.getsize(path)
-    files = len(os.listdir(path))
-    for entry in os.listdir(path):
-        entry_path = os.path.join(path, entry)
-        if os.path.isfile(entry_path) and not os.path.islink(entry_path):
-            size += os.path.getsize(entry_path)
-        elif os.path.isdir(entry_path):
-            sub_size, sub_files = get_folder_size_and_files(entry_path)
-            size += sub_size
-            files += sub_files
-    return size, files
+    folder = scan_folder(path)
+    return folder.size, folder.files
+
+
+def map_concurrently(func, items, workers):
+    """Like map(), but run func using up to `workers` threads.
+
+    The results are returned in the order of items. If any of the calls
+    raised, the first error is re-raised once all the threads are done.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    def _worker():
+        while not errors:
+            try:
+                index, item = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = func(item)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=_worker)
+               for _ in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
 
 
 def get_file_content(file_path):
@@ -246,11 +246,12 @@ def execute(script_path, ctx, process):
 
     log_counter = 0
     while True:
-        process_ctx_request(proxy)
+        served = process_ctx_request(proxy, timeout=POLL_LOOP_INTERVAL)
         return_code = process.poll()
         if return_code is not None:
             break
-        time.sleep(POLL_LOOP_INTERVAL)
+        if served:
+            continue
 
         log_counter += 1
         if log_counter == POLL_LOOP_LOG_ITERATIONS:
@@ -319,12 +320,18 @@ def start_ctx_proxy(ctx, process):
                                   .format(ctx_proxy_type))
 
 
-def process_ctx_request(proxy):
-    if isinstance(proxy, StubCtxProxy):
-        return
-    if isinstance(proxy, HTTPCtxProxy):
-        return
-    proxy.poll_and_process(timeout=0)
+def process_ctx_request(proxy, timeout=0):
+    """Serve a request of the script, waiting up to timeout seconds for
+    one. Returns whether a request was served.
+
+    Requests are served as soon as they arrive, so that a script making
+    many ctx calls isn't slowed down by the polling interval.
+    """
+    if isinstance(proxy, (StubCtxProxy, HTTPCtxProxy)):
+        # the http proxy serves the requests in its own thread
+        time.sleep(timeout)
+        return False
+    return proxy.poll_and_process(timeout=timeout)
 
 
 def eval_script(script_path, ctx, process=None):
@@ -32,6 +32,7 @@ BLUEPRINT_DIR = os.path.join(os.path.dirname(__file__), 'wrapper_blueprint')
 
 
 class PythonWrapperTests(testtools.TestCase):
+    in_process = True
 
     @classmethod
     def setUpClass(cls):
@@ -129,6 +130,16 @@ class PythonWrapperTests(testtools.TestCase):
             'illegal path: missing_node_property',
             capture))
 
+    def test_direct_bad_ctx_call_caught(self):
+        script = ('import subprocess\n'
+                  'try:\n'
+                  '    ctx("bad_call")\n'
+                  'except subprocess.CalledProcessError as e:\n'
+                  '    ctx.returns([e.returncode, e.cmd[0],\n'
+                  '                 "bad_call" in e.cmd[-1],\n'
+                  '                 "cannot be processed in" in e.stderr])')
+        self.assertEqual([1, 'ctx', True, True], self._run(script))
+
     @log_capture('ctx')
     def test_logger(self, capture):
         script = ('ctx.logger.debug("debug_message")\n'
@@ -314,3 +325,50 @@ class PythonWrapperTests(testtools.TestCase):
         script = ('ctx.retry_operation("retry_message")')
         ex = self.assertRaises(OperationRetry, self._run, script)
         self.assertIn('retry_message', str(ex))
+
+    def test_many_calls(self):
+        script = ('for i in range(50):\n'
+                  '    ctx.instance.runtime_properties[str(i)] = i\n'
+                  'ctx.returns(sum(ctx.instance.runtime_properties[str(i)]\n'
+                  '                for i in range(50)))')
+        self.assertEqual(sum(range(50)), self._run(script))
+
+    def test_in_process(self):
+        script = ('import ctxwrapper\n'
+                  'client = ctxwrapper._get_client()\n'
+                  'ctx.returns({"in_process": client is not None})')
+        self.assertEqual({'in_process': self.in_process}, self._run(script))
+
+    def test_json_args(self):
+        script = ('ctx.instance.runtime_properties["key"] = "@value"\n'
+                  'ctx("instance runtime-properties other @[1]")\n'
+                  'ctx.returns([ctx.instance.runtime_properties["key"],\n'
+                  '             ctx.instance.runtime_properties["other"]])')
+        self.assertEqual(['@value', [1]], self._run(script))
+
+
+class PythonWrapperHTTPTests(PythonWrapperTests):
+    """The wrapper's requests, sent to the http proxy"""
+
+    def _run(self, script, process=None, **kwargs):
+        process = process or {}
+        process['ctx_proxy_type'] = 'http'
+        return super(PythonWrapperHTTPTests, self)._run(
+            script, process=process, **kwargs)
+
+
+class PythonWrapperSubprocessTests(PythonWrapperTests):
+    """The wrapper's requests, made by running `ctx`"""
+
+    in_process = False
+
+    def _prescript(self):
+        return (
+            '#!/usr/bin/env python\n'
+            'import ctxwrapper\n'
+            'ctxwrapper.IN_PROCESS = False\n'
+            'from ctxwrapper import ctx\n'
+        )
+
+    def test_many_calls(self):
+        self.skipTest('starts a process per call, so is slow')
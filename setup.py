@@ -32,6 +32,11 @@ if sys.version_info[:3] < (2, 7, 9):
 else:
     install_requires += ['pika==1.1.0', 'requests>=2.25.0,<3.0.0', ]
 
+exclude_packages = ['dsl_parser.tests*', 'script_runner.tests*']
+if sys.version_info[0] < 3:
+    # the asyncio client is python 3 only
+    exclude_packages.append('cloudify_async_client*')
+
 try:
     from collections import OrderedDict  # NOQA
 except ImportError:
@@ -53,8 +58,7 @@ setup(
     version='6.3.0.dev1',
     author='Cloudify',
     author_email='cosmo-admin@cloudify.co',
-    packages=find_packages(exclude=('dsl_parser.tests*',
-                                    'script_runner.tests*',)),
+    packages=find_packages(exclude=exclude_packages),
     include_package_data=True,
     license='LICENSE',
     description='Cloudify Common',
@@ -85,6 +89,10 @@ setup(
         ],
         'snmp': [
             'pysnmp==4.4.5'
-        ]
+        ],
+        # for cloudify_async_client, the asyncio client
+        'async': [
+            'aiohttp>=3.7,<4; python_version >= "3.6"',
+        ],
     }
 )